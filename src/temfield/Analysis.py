@@ -0,0 +1,209 @@
+"""
+Bulk loading and analysis of result files written by MainWindow.save_Table.
+
+    temfield-analysis results/*.csv --golden results/golden.csv --bands 30e6,80e6,1e9
+
+Files are parsed in parallel (process pool), stacked onto a common frequency grid and evaluated
+vectorized over all runs: min/max |E| per band, frequency bands with EUT failures, and
+the deviation of every run from a golden run.
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .Table import BASE_HEADER, TARGET_COLUMN, is_passed
+
+E_COLUMNS = tuple(BASE_HEADER[2:6])
+
+
+def read_result_file(path):
+    """
+    Parses one result file. Returns a dict with the header metadata (saved, eut), the column names and
+    NumPy arrays: f (Hz), e (n x 4: Ex, Ey, Ez, |E|), target (V/m or nan), failed (bool) and the status strings.
+    """
+    saved = None
+    eut = []
+    in_eut = False
+    with open(path, newline='') as f:
+        lines = f.readlines()
+    i = 0
+    while i < len(lines) and lines[i].startswith('#'):
+        line = lines[i][1:].strip()
+        if line.startswith('File saved:'):
+            saved = line[len('File saved:'):].strip()
+        elif line == 'EUT Description':
+            in_eut = True
+        elif in_eut:
+            eut.append(line)
+        i += 1
+    reader = csv.reader(lines[i:])
+    header = next(reader)
+    run = table_arrays(header, [row for row in reader if row])
+    run.update(path=path, saved=saved, eut='\n'.join(eut))
+    return run
+
+
+def table_arrays(header, rows):
+    """
+    Converts the result table (column names and rows of cell texts) into NumPy arrays:
+    f (Hz), e (n x 4: Ex, Ey, Ez, |E|), target (V/m or nan), failed (bool) and the status strings.
+    """
+    col = {name: k for k, name in enumerate(header)}
+    freq = np.array([float(row[col['Frequency [MHz]']]) * 1e6 for row in rows])
+    e = np.array([[float(row[col[name]]) for name in E_COLUMNS] for row in rows]).reshape(-1, 4)
+    if TARGET_COLUMN in col:
+        target = np.array([float(row[col[TARGET_COLUMN]]) for row in rows])
+    else:
+        target = np.full(len(rows), np.nan)
+    status = [row[col['Status']] for row in rows]
+    return {'header': header,
+            'f': freq,
+            'e': e,
+            'target': target,
+            'status': status,
+            'failed': np.array([not is_passed(st) for st in status], dtype=bool)}
+
+
+def load_many(paths, workers=None):
+    """
+    Reads many result files in parallel with a process pool.
+    """
+    paths = list(paths)
+    if len(paths) < 2 or workers == 1:
+        return [read_result_file(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(read_result_file, paths, chunksize=max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))))
+
+
+def split_levels(runs):
+    """
+    Multi-level result files hold one row per frequency and level; they are split into one run per level.
+    """
+    out = []
+    for run in runs:
+        levels = np.unique(run['target'][~np.isnan(run['target'])])
+        if len(levels) < 2:
+            out.append(run)
+            continue
+        for level in levels:
+            sel = run['target'] == level
+            part = dict(run, f=run['f'][sel], e=run['e'][sel], target=run['target'][sel],
+                        failed=run['failed'][sel], status=[s for s, k in zip(run['status'], sel) if k])
+            part['path'] = f"{run['path']}@{level:g}V/m"
+            out.append(part)
+    return out
+
+
+def stack(runs, grid=None):
+    """
+    Interpolates all runs onto a common frequency grid (default: union of all frequencies).
+    Returns grid (F,), e (R x F x 4, nan outside a run's range) and failed (R x F, nearest measured point).
+    """
+    if grid is None:
+        grid = np.unique(np.concatenate([run['f'] for run in runs]))
+    grid = np.asarray(grid, dtype=float)
+    e = np.full((len(runs), len(grid), 4), np.nan)
+    failed = np.zeros((len(runs), len(grid)), dtype=bool)
+    logg = np.log(grid)
+    for r, run in enumerate(runs):
+        if len(run['f']) == 0:
+            continue
+        order = np.argsort(run['f'])
+        f = run['f'][order]
+        logf = np.log(f)
+        inside = (grid >= f[0]) & (grid <= f[-1])
+        for c in range(4):
+            e[r, inside, c] = np.interp(logg[inside], logf, run['e'][order, c])
+        nearest = np.clip(np.searchsorted(logf, logg), 1, len(f) - 1) if len(f) > 1 else np.zeros(len(grid), int)
+        if len(f) > 1:
+            left_closer = (logg - logf[nearest - 1]) < (logf[nearest] - logg)
+            nearest = nearest - left_closer
+        failed[r] = run['failed'][order][nearest] & inside
+    return grid, e, failed
+
+
+def band_stats(grid, e, edges):
+    """
+    Min/max of |E| per band and run. `edges` are the band limits in Hz.
+    Returns (bands, emin, emax) with emin/emax of shape (R x B).
+    """
+    edges = np.asarray(sorted(edges), dtype=float)
+    idx = np.searchsorted(grid, edges)
+    bands = [(lo, hi) for lo, hi, i, j in zip(edges[:-1], edges[1:], idx[:-1], idx[1:]) if j > i]
+    starts = np.array([i for i, j in zip(idx[:-1], idx[1:]) if j > i], dtype=int)
+    mag = e[:, :, 3]
+    if len(starts) == 0:
+        return bands, np.empty((len(e), 0)), np.empty((len(e), 0))
+    sel = mag[:, starts[0]:idx[-1]]
+    emin = np.fmin.reduceat(sel, starts - starts[0], axis=1)
+    emax = np.fmax.reduceat(sel, starts - starts[0], axis=1)
+    return bands, emin, emax
+
+
+def failure_bands(grid, failed):
+    """
+    Contiguous frequency ranges with EUT failures for one run: [(f_start, f_stop), ...].
+    """
+    padded = np.concatenate(([False], failed, [False])).astype(np.int8)
+    change = np.flatnonzero(np.diff(padded))
+    return [(grid[a], grid[b - 1]) for a, b in zip(change[::2], change[1::2])]
+
+
+def deltas(e, golden):
+    """
+    Deviation of |E| of every run from the golden run (index) in dB, shape (R x F).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 20 * np.log10(e[:, :, 3] / e[golden, :, 3])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='temfield-analysis', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='+', help='result files or glob patterns')
+    parser.add_argument('--golden', help='golden run to compare against (default: first file)')
+    parser.add_argument('--bands', default=None,
+                        help='comma separated band limits in Hz (default: one band over the whole grid)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    args = parser.parse_args(argv)
+
+    paths = []
+    for pattern in args.files:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    if args.golden and os.path.abspath(args.golden) not in map(os.path.abspath, paths):
+        paths.insert(0, args.golden)
+    runs = split_levels(load_many(paths, args.workers))
+    if not runs:
+        return 1
+    golden = 0
+    if args.golden:
+        golden = next(i for i, run in enumerate(runs)
+                      if os.path.abspath(run['path'].split('@')[0]) == os.path.abspath(args.golden))
+    grid, e, failed = stack(runs, grid=np.unique(runs[golden]['f']) if args.golden else None)
+    edges = [float(x) for x in args.bands.split(',')] if args.bands else [grid[0], np.nextafter(grid[-1], np.inf)]
+    bands, emin, emax = band_stats(grid, e, edges)
+    delta = deltas(e, golden)
+
+    print(f"{len(runs)} runs, {len(grid)} frequencies, golden run: {runs[golden]['path']}")
+    for r, run in enumerate(runs):
+        print(f"\n{run['path']} (saved {run['saved']})")
+        if run['eut']:
+            print(f"  EUT: {run['eut'].splitlines()[0]}")
+        for b, (lo, hi) in enumerate(bands):
+            print(f"  {lo * 1e-6:.3f} - {hi * 1e-6:.3f} MHz: |E| min {emin[r, b]:.2f} V/m, max {emax[r, b]:.2f} V/m")
+        fb = failure_bands(grid, failed[r])
+        if fb:
+            print("  failures: " + ', '.join(f"{a * 1e-6:.3f}-{b * 1e-6:.3f} MHz" for a, b in fb))
+        if r != golden and np.isfinite(delta[r]).any():
+            k = np.nanargmax(np.abs(delta[r]))
+            print(f"  delta to golden: max {delta[r, k]:+.2f} dB at {grid[k] * 1e-6:.3f} MHz, "
+                  f"rms {np.sqrt(np.nanmean(delta[r] ** 2)):.2f} dB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Local automation API for temfield.
+
+A test sequencer can drive a running temfield instance through JSON-RPC 2.0 over HTTP on localhost:
+
+    POST http://127.0.0.1:8765/
+    {"jsonrpc": "2.0", "id": 1, "method": "start", "params": {}}
+
+All methods are executed by the GUI thread on the same `MainWindow` that the operator sees.
+Therefore, a sweep started through the API behaves exactly like one started with the Start button.
+For tests without hardware, load a graph whose device ini files set `virtual: 1`.
+Requests must have the content type application/json (so a web page cannot post to the API),
+setup values are type checked (see Setup.py).
+
+Methods:
+    load_graph(dotfile, searchpath=None)
+    get_setup() / set_setup(**setup)        see MainWindow.SETUP_KEYS
+    start() / pause() / resume() / stop()   pause, resume and stop need a running sweep
+    status()
+    results(since=0, timeout=0)             rows measured after index `since`; waits up to `timeout`
+                                            seconds for new rows (long polling)
+    get_table()                             header and all rows of the result table
+    save_table(path)
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+
+class _Call:
+    def __init__(self, fn, kwargs):
+        self.fn = fn
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Invoker(QObject):
+    """
+    Runs callables in the thread this object lives in (the GUI thread).
+    """
+    call = Signal(object)
+    timeout = 60.0   # s, e.g. for the device initialisation of start()
+
+    def __init__(self):
+        super().__init__()
+        self.call.connect(self._run)
+
+    @Slot(object)
+    def _run(self, call):
+        try:
+            call.result = call.fn(**call.kwargs)
+        except Exception as e:
+            call.error = e
+        finally:
+            call.done.set()
+
+    def invoke(self, fn, **kwargs):
+        call = _Call(fn, kwargs)
+        self.call.emit(call)
+        if not call.done.wait(self.timeout):
+            raise TimeoutError(f"GUI thread busy, {getattr(fn, '__name__', fn)} not done after {self.timeout} s")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AutomationServer:
+    def __init__(self, window, host='127.0.0.1', port=8765):
+        self.window = window
+        self.invoker = _Invoker()
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+        self._rows = []
+        self._rows_changed = threading.Condition()
+        window.row_added.connect(self._row_added)
+
+    @property
+    def address(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type != 'application/json':
+                    self.send_error(415, "Content-Type must be application/json")
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                reply = server.handle(self.rfile.read(length))
+                body = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def _row_added(self, row):
+        with self._rows_changed:
+            self._rows.append(row)
+            self._rows_changed.notify_all()
+
+    def handle(self, data):
+        req_id = None
+        try:
+            request = json.loads(data)
+        except ValueError as e:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': f"Parse error: {e}"}}
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str) \
+                or not isinstance(request.get('params', {}), (dict, type(None))):
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': "Invalid Request"}}
+        try:
+            req_id = request.get('id')
+            method = request['method']
+            params = request.get('params') or {}
+            fn = getattr(self, f"rpc_{method}", None)
+            if fn is None:
+                return {'jsonrpc': '2.0', 'id': req_id,
+                        'error': {'code': -32601, 'message': f"Method not found: {method}"}}
+            result = fn(**params)
+        except (ValueError, KeyError, TypeError) as e:
+            return {'jsonrpc': '2.0', 'id': req_id, 'error': {'code': -32602, 'message': str(e)}}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': req_id, 'error': {'code': -32000, 'message': repr(e)}}
+        return {'jsonrpc': '2.0', 'id': req_id, 'result': result}
+
+    # RPC methods. They run in the server thread and hand everything that touches the window
+    # over to the GUI thread.
+
+    def rpc_load_graph(self, dotfile, searchpath=None):
+        dotpath, dotname = os.path.split(os.path.abspath(dotfile))
+        if searchpath is None:
+            searchpath = ['.', dotpath]
+        self.invoker.invoke(self.window.apply_setup, setup={'dotfile': dotname, 'searchpath': str(searchpath)})
+        return True
+
+    def rpc_get_setup(self):
+        return self.invoker.invoke(self.window.setup_dict)
+
+    def rpc_set_setup(self, **setup):
+        self.invoker.invoke(self.window.apply_setup, setup=setup)
+        return self.rpc_get_setup()
+
+    def rpc_start(self):
+        def _start():
+            # check and start in one call of the GUI thread, so two clients cannot both start
+            if self.window.sweep_running:
+                raise ValueError("sweep is already running")
+            with self._rows_changed:
+                self._rows = []
+            self.window.start_test(ask=False)
+        self.invoker.invoke(_start)
+        return True
+
+    def _running(self, method):
+        # check and act in one call of the GUI thread, like rpc_start
+        def _call():
+            if not self.window.sweep_running:
+                raise ValueError("no sweep is running")
+            method()
+        self.invoker.invoke(_call)
+        return True
+
+    def rpc_pause(self):
+        return self._running(self.window.pause_test)
+
+    def rpc_resume(self):
+        return self._running(self.window.continue_test)
+
+    def rpc_stop(self):
+        return self._running(self.window.stop_test)
+
+    def rpc_status(self):
+        def _status():
+            w = self.window
+            return {'running': w.sweep_running,
+                    'paused': w.sweep_running and w.pause_processing,
+                    'current_f': getattr(w, 'current_f', None) if w.sweep_running else None,
+                    'n_freqs': len(w.freqs),
+                    'n_remaining': len(getattr(w, 'remaining_freqs', [])) if w.sweep_running else 0,
+                    'n_rows': len(w.result_rows)}
+        return self.invoker.invoke(_status)
+
+    def rpc_results(self, since=0, timeout=0):
+        with self._rows_changed:
+            if len(self._rows) <= since and timeout > 0:
+                self._rows_changed.wait_for(lambda: len(self._rows) > since, timeout=timeout)
+            return {'next': len(self._rows), 'rows': self._rows[since:]}
+
+    def rpc_get_table(self):
+        return self.invoker.invoke(lambda: {'header': self.window.table_header(),
+                                            'rows': self.window.table_rows()})
+
+    def rpc_save_table(self, path):
+        self.invoker.invoke(self.window.write_table, path=path)
+        return True
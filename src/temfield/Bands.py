@@ -0,0 +1,111 @@
+import bisect
+
+from mpylab.tools.mgraph import safe_condition_eval
+
+
+def _unquote(s):
+    s = str(s).strip()
+    return s[1:-1] if len(s) >= 2 and s[0] == s[-1] and s[0] in '"\'' else s
+
+
+def node_attributes(mg):
+    """
+    Returns {node name: attrs} of the graph parsed by mgraph.MGraph, without the quotes of the dot file.
+    """
+    return {_unquote(name): {key: _unquote(value) for key, value in node['gnode'].get_attributes().items()}
+            for name, node in mg.nodes.items()}
+
+
+def graph_conditions(mg):
+    """
+    Returns all distinct `condition` attributes of nodes and edges of the graph parsed by mgraph.MGraph.
+    """
+    attrs = [node['gnode'].get_attributes() for node in mg.nodes.values()]
+    attrs += [edge.get_attributes() for edge in mg.edges]
+    return sorted({_unquote(a['condition']) for a in attrs if 'condition' in a})
+
+
+class BandIndex:
+    """
+    Interval index of the graph state over a frequency plan.
+
+    All graph conditions are evaluated once per planned frequency. Consecutive frequencies with the same
+    set of true conditions form an interval; intervals with the same set share a band id.
+    `lookup(f)` then costs a bisection instead of a graph evaluation. `names[band]` is the set of true
+    conditions as text of 0 and 1, which (unlike the id) does not depend on the frequency plan.
+    The conditions are evaluated like in mgraph (safe_condition_eval, `condition_map` maps dot names to 'f').
+    """
+    def __init__(self, freqs, conditions, condition_map=None):
+        self.conditions = list(conditions)
+        self._names = [dot for dot, name in (condition_map or {}).items() if name == 'f']
+        self._ids = {}
+        self.names = []
+        self.starts = []
+        self.stops = []
+        self.bands = []
+        for f in sorted(set(freqs)):
+            band = self.band_of(f)
+            if self.bands and self.bands[-1] == band:
+                self.stops[-1] = f
+            else:
+                self.starts.append(f)
+                self.stops.append(f)
+                self.bands.append(band)
+
+    def signature(self, f):
+        names = dict.fromkeys(self._names, f)
+        names['f'] = f
+        return tuple(bool(safe_condition_eval(c, names)) for c in self.conditions)
+
+    def band_of(self, f):
+        signature = self.signature(f)
+        if signature not in self._ids:
+            self._ids[signature] = len(self._ids)
+            self.names.append(''.join('1' if c else '0' for c in signature))
+        return self._ids[signature]
+
+    def lookup(self, f):
+        i = bisect.bisect_right(self.starts, f) - 1
+        if i >= 0 and f <= self.stops[i]:
+            return self.bands[i]
+        return self.band_of(f)
+
+    def __len__(self):
+        return len(self.bands)
+
+    @classmethod
+    def from_graph(cls, freqs, mg):
+        return cls(freqs, graph_conditions(mg), getattr(mg, 'condition_map', None))
+
+
+def band_order(freqs, band_index, current=None):
+    """
+    Orders a frequency plan so that each band (graph path) is measured in one go, starting with band `current`
+    (the band the graph is in right now, if known). The bands follow in ascending frequency order, or in
+    descending order if the sweep starts in the topmost band (serpentine over consecutive sweeps).
+
+    Returns (freqs, switches, ascending_switches): the number of band changes of the new order and of the plain
+    ascending sweep, both including the change from `current` to the first band.
+    """
+    def switches(seq):
+        bands = [band_index.lookup(f) for f in seq]
+        n = sum(1 for a, b in zip(bands, bands[1:]) if a != b)
+        if current is not None and bands and bands[0] != current:
+            n += 1
+        return n
+
+    ascending = sorted(freqs)
+    groups = {}
+    for f in ascending:
+        groups.setdefault(band_index.lookup(f), []).append(f)
+    order = list(groups)    # by lowest frequency
+    descending = current is not None and len(order) > 1 and order[-1] == current
+    if descending:
+        order.reverse()
+    if current in groups:
+        order.remove(current)
+        order.insert(0, current)
+    ordered = []
+    for band in order:
+        ordered.extend(reversed(groups[band]) if descending else groups[band])
+    return ordered, switches(ordered), switches(ascending)
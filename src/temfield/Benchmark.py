@@ -0,0 +1,70 @@
+"""
+Startup time benchmark for the `temfield` entry point (temfield.TEMField:main).
+
+    temfield-benchmark --runs 5 --max 2.0       (or python -m temfield.Benchmark)
+
+Starts temfield `runs` times in a fresh interpreter with the offscreen Qt platform, quitting as soon as
+the main window is shown, and reports the wall time per start. The exit code is 1 if the median exceeds `--max`,
+so the benchmark can guard against startup regressions (e.g. a heavy module imported at load time again).
+It also lists the modules of DEFERRED that such a start loads although they are imported on first use;
+any of them is an error as well. test/test_Benchmark.py runs both checks.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# imported on first use by temfield.TEMField, not at startup
+# (mpylab.tools.spacing for the frequency list and the Metrics objects for the watchdog are cheap)
+DEFERRED = ('numpy', 'matplotlib', 'scuq', 'mpylab.tools.mgraph', 'mpylab.tools.sin_fit', 'http.server',
+            'temfield.TestSusceptibility', 'temfield.TestPlan', 'temfield.Checkpoint', 'temfield.ResultsPlot')
+START_ARGS = ['--quit-after-show', '--api-port', '0', '--metrics-port', '0']
+
+
+def eager_imports(modules=DEFERRED, platform='offscreen', timeout=60):
+    """
+    Returns the `modules` loaded by a temfield start (up to the shown main window) in a fresh interpreter.
+    """
+    code = ('import sys\nfrom temfield.TEMField import main\n'
+            'try:\n    main()\nexcept SystemExit:\n    pass\n'
+            f'print(" ".join(m for m in {tuple(modules)!r} if m in sys.modules))')
+    out = subprocess.run([sys.executable, '-c', code] + START_ARGS, env=dict(os.environ, QT_QPA_PLATFORM=platform),
+                         check=True, capture_output=True, text=True, timeout=timeout).stdout
+    return out.split()
+
+
+def startup_times(runs=5, platform='offscreen', timeout=60):
+    env = dict(os.environ)
+    env['QT_QPA_PLATFORM'] = platform
+    cmd = [sys.executable, '-c', 'import sys; from temfield.TEMField import main; sys.exit(main())'] + START_ARGS
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, timeout=timeout)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='temfield-benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max', type=float, default=None, help='maximum allowed median startup time in s')
+    parser.add_argument('--platform', default='offscreen', help='Qt platform plugin (QT_QPA_PLATFORM)')
+    args = parser.parse_args(argv)
+    eager = eager_imports()
+    if eager:
+        print("imported at startup: " + ', '.join(eager))
+    times = startup_times(args.runs, args.platform)
+    median = statistics.median(times)
+    print(f"startup time: median {median:.3f} s, min {min(times):.3f} s, max {max(times):.3f} s ({args.runs} runs)")
+    if args.max is not None and median > args.max:
+        print(f"startup time exceeds {args.max:.3f} s")
+        return 1
+    return 1 if eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import json
+import os
+
+
+class SweepJournal:
+    """
+    Append-only journal of a running sweep (JSON lines).
+
+    The first line holds the setup and the frequency list, followed by one line per result table row.
+    A row line with `done` set marks its frequency as completed (all levels measured).
+    Each line is flushed to disk immediately, so the state survives a crash or power loss.
+    The journal is removed when the sweep finishes regularly.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def begin(self, setup, freqs, header, extra=None):
+        self.close()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, 'w')
+        self._write({'type': 'setup', 'setup': setup, 'freqs': freqs, 'header': header, 'extra': extra or {}})
+
+    def resume(self):
+        """
+        Continues an existing journal, dropping rows of frequencies that have not been completed.
+        Returns the loaded state (see `load`).
+        """
+        state = self.load()
+        self.begin(state['setup'], state['freqs'], state['header'], state['extra'])
+        for f, row in state['rows']:
+            self._write({'type': 'row', 'f': f, 'row': row, 'done': True})
+        return state
+
+    def add_row(self, f, row, done=True):
+        self._write({'type': 'row', 'f': f, 'row': row, 'done': done})
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def load(self):
+        """
+        Returns a dict with keys setup, freqs, header, extra, rows ((f, row) of completed frequencies)
+        and remaining_freqs.
+        """
+        state = None
+        rows = []
+        done = set()
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # incomplete last line
+                if entry['type'] == 'setup':
+                    state = entry
+                elif entry['type'] == 'row':
+                    rows.append((entry['f'], entry['row']))
+                    if entry['done']:
+                        done.add(entry['f'])
+        if state is None:
+            raise ValueError(f"{self.path} is not a sweep journal")
+        return {'setup': state['setup'],
+                'freqs': state['freqs'],
+                'header': state['header'],
+                'extra': state.get('extra', {}),
+                'rows': [(f, row) for f, row in rows if f in done],
+                'remaining_freqs': [f for f in state['freqs'] if f not in done]}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        self.close()
+        if self.exists():
+            os.remove(self.path)
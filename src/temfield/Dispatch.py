@@ -0,0 +1,130 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .Bands import node_attributes
+
+
+def graph_devices(mg):
+    """
+    Returns {node name: driver instance} of all devices created by mg.CreateDevices().
+    """
+    return {name: node['inst'] for name, node in mg.nodes.items() if node.get('inst') is not None}
+
+
+def capability_index(devices, commands=None):
+    """
+    Maps each command to the names of the devices that implement it: {cmd: [name, ...]}.
+    With `commands` None, all public methods of the drivers are indexed.
+    """
+    index = {}
+    for name, inst in devices.items():
+        cmds = commands if commands is not None else [c for c in dir(type(inst)) if not c.startswith('_')]
+        for cmd in cmds:
+            if callable(getattr(inst, cmd, None)):
+                index.setdefault(cmd, []).append(name)
+    return index
+
+
+def dispatch_stages(devices, nodes):
+    """
+    Groups device names into stages from the `after` attributes of the graph nodes,
+    e.g. `amp1 [ini="..." after="sw"]` (several names separated by commas).
+    Devices of a stage only depend on devices of earlier stages and can be commanded in parallel.
+    """
+    deps = {}
+    for name in devices:
+        after = nodes.get(name, {}).get('after', '')
+        deps[name] = {d.strip() for d in after.split(',') if d.strip() in devices}
+    stages = []
+    done = set()
+    while len(done) < len(deps):
+        stage = sorted(name for name, d in deps.items() if name not in done and d <= done)
+        if not stage:
+            raise ValueError(f"cyclic 'after' constraints between {', '.join(sorted(set(deps) - done))}")
+        stages.append(stage)
+        done.update(stage)
+    return stages
+
+
+class DeviceDispatcher:
+    """
+    Sends the same command to several instruments in parallel through a thread pool.
+
+    Ordering constraints come from the graph (see `dispatch_stages`). Like the *_Devices methods of mgraph,
+    commands only go to the active nodes (`active()` returns their names, e.g. mg.activenodes).
+    The latency of every call is recorded per device and command, together with the wall time of the
+    whole dispatch, so the speedup against sequential dispatch can be checked with `report()`.
+    """
+    def __init__(self, devices, nodes=None, max_workers=None, capabilities=None, active=None):
+        self.devices = devices
+        self.capabilities = capability_index(devices) if capabilities is None else capabilities
+        self.active = active
+        self.stages = dispatch_stages(devices, nodes or {})
+        self.pool = ThreadPoolExecutor(max_workers=max_workers or max(1, len(devices)),
+                                       thread_name_prefix='temfield-dispatch')
+        self.latency = {}   # (device, cmd) -> [n, total, last]
+        self.wall = {}      # cmd -> [n, total wall time, total device time]
+
+    @classmethod
+    def from_graph(cls, mg, max_workers=None, capabilities=None):
+        return cls(graph_devices(mg), node_attributes(mg), max_workers, capabilities,
+                   active=lambda: getattr(mg, 'activenodes', None))
+
+    def _call(self, name, cmd, args):
+        start = time.perf_counter()
+        try:
+            return getattr(self.devices[name], cmd)(*args)
+        finally:
+            dt = time.perf_counter() - start
+            stat = self.latency.setdefault((name, cmd), [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += dt
+            stat[2] = dt
+
+    def dispatch(self, cmd, *args, names=None, active_only=True):
+        """
+        Calls `cmd(*args)` on all active devices (or `names`) that implement it; with `active_only` False
+        on the inactive ones as well. Returns {device: result}.
+        """
+        start = time.perf_counter()
+        results = {}
+        capable = self.capabilities.get(cmd, ())
+        active = None if self.active is None or not active_only else self.active()
+        for stage in self.stages:
+            targets = [name for name in stage if name in capable and (names is None or name in names)
+                       and (active is None or name in active)]
+            futures = {name: self.pool.submit(self._call, name, cmd, args) for name in targets}
+            for name, future in futures.items():
+                results[name] = future.result()
+        wall = time.perf_counter() - start
+        stat = self.wall.setdefault(cmd, [0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += wall
+        stat[2] += sum(self.latency[(name, cmd)][2] for name in results)
+        return results
+
+    @staticmethod
+    def status(results):
+        """
+        mpylab convention: negative error codes (alone or first element of a tuple) are errors.
+        Returns 0 if all calls succeeded, -1 otherwise.
+        """
+        for res in results.values():
+            err = res[0] if isinstance(res, tuple) else res
+            if isinstance(err, (int, float)) and err < 0:
+                return -1
+        return 0
+
+    def report(self):
+        lines = []
+        for cmd, (n, wall, serial) in sorted(self.wall.items()):
+            speedup = serial / wall if wall > 0 else float('nan')
+            lines.append(f"{cmd}: {n} dispatches, mean {wall / n * 1e3:.1f} ms "
+                         f"(sequential {serial / n * 1e3:.1f} ms, speedup {speedup:.2f})")
+            for (name, _cmd), (m, total, last) in sorted(self.latency.items()):
+                if _cmd == cmd:
+                    lines.append(f"    {name}: mean {total / m * 1e3:.1f} ms")
+        return '\n'.join(lines)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
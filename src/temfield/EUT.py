@@ -1,5 +1,10 @@
 from PySide6.QtCore import QRunnable, Slot, Signal, QObject
 
+import asyncio
+import importlib
+import os
+import re
+import subprocess
 import sys
 import time
 import traceback
@@ -7,14 +12,333 @@ import traceback
 
 def simple_eut_status(progress_callback, dw=1):
     # print("Dwell-Time: ", dw)
-    start = now = time.time()
+    return monitor_eut(progress_callback, monitor=DwellMonitor(), dw=dw)
+
+
+def monitor_eut(progress_callback, monitor=None, dw=1, progress_interval=0.1):
+    """
+    Runs `monitor` for the dwell time `dw` (in s) and returns its verdict.
+
+    The monitor gets the remaining dwell time in slices of at most `progress_interval` seconds.
+    Progress is emitted once per slice only, i.e. at display rate instead of at loop rate.
+    The dwell ends early as soon as the monitor reports a failure.
+    """
+    if monitor is None:
+        monitor = DwellMonitor()
+    start = time.monotonic()
     end = start + dw
-    while now < end:
-        time.sleep(0.01)
-        now = time.time()
-        percentage = round((now - start)/dw, 2) * 100
-        progress_callback.emit(percentage)
-    return "Passed"
+    monitor.start(dw)
+    try:
+        now = start
+        while now < end:
+            status = monitor.check(min(progress_interval, end - now))
+            now = time.monotonic()
+            if status is not None:
+                progress_callback.emit(100)
+                return status
+            progress_callback.emit(int((now - start) / dw * 100) if dw > 0 else 100)
+        return monitor.passed
+    finally:
+        monitor.stop()
+
+
+class EUTMonitor:
+    """
+    Base class for EUT monitors.
+
+    A monitor is started once per dwell with `start(dwell_time)` and stopped with `stop()`.
+    In between, `check(timeout)` is called repeatedly. It may block for at most `timeout` seconds and
+    returns None as long as the EUT behaves, or a status string (e.g. 'Failed: ...') to end the dwell.
+    Resources kept open over the dwells (e.g. a serial port) are released by `close()` at the end of the
+    sweep; a monitor can also be used as context manager.
+    The base class simply waits, i.e. it never detects a failure.
+    """
+    name = 'EUT'
+    passed = 'Passed'
+
+    def __init__(self, name=None):
+        if name is not None:
+            self.name = name
+
+    def start(self, dwell_time):
+        pass
+
+    def check(self, timeout):
+        time.sleep(timeout)
+        return None
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def failed(self, reason):
+        return f"Failed: {reason}"
+
+
+class DwellMonitor(EUTMonitor):
+    """
+    Waits for the dwell time and reports 'Passed'. This is the behaviour of `simple_eut_status`.
+    """
+    pass
+
+
+class BlockingMonitor(EUTMonitor):
+    """
+    Monitor for sources with a blocking read that supports a timeout (serial ports, sockets, pipes).
+    Subclasses implement `read(timeout)` returning one message or None if nothing was received, and
+    `is_failure(message)`.
+    """
+    def __init__(self, name=None, fail_pattern=None):
+        super().__init__(name)
+        self.fail_pattern = re.compile(fail_pattern) if fail_pattern else None
+
+    def read(self, timeout):
+        raise NotImplementedError
+
+    def is_failure(self, message):
+        if self.fail_pattern is None:
+            return False
+        return self.fail_pattern.search(message) is not None
+
+    def check(self, timeout):
+        deadline = time.monotonic() + timeout
+        remaining = timeout
+        while remaining > 0:
+            message = self.read(remaining)
+            if message and self.is_failure(message):
+                return self.failed(message.strip())
+            remaining = deadline - time.monotonic()
+        return None
+
+
+class PollingMonitor(EUTMonitor):
+    """
+    Monitor that asks the EUT for its state every `poll_interval` seconds.
+    Subclasses implement `poll()` returning None if the EUT is ok, or a failure reason.
+    """
+    def __init__(self, name=None, poll_interval=0.1):
+        super().__init__(name)
+        self.poll_interval = poll_interval
+
+    def poll(self):
+        raise NotImplementedError
+
+    def check(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            reason = self.poll()
+            if reason is not None:
+                return self.failed(reason)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(self.poll_interval, remaining))
+
+
+class AsyncMonitor(EUTMonitor):
+    """
+    Monitor implemented as coroutine. Subclasses implement `async watch()` which runs for the
+    whole dwell and returns a failure reason (or None if the watch ended without a failure).
+    The coroutine runs on a private event loop in the worker thread.
+    """
+    def start(self, dwell_time):
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self.watch())
+
+    async def watch(self):
+        raise NotImplementedError
+
+    def check(self, timeout):
+        if self._task.done():
+            time.sleep(timeout)
+        else:
+            self._loop.run_until_complete(asyncio.wait({self._task}, timeout=timeout))
+            if not self._task.done():
+                return None
+        if self._task.cancelled():
+            return None
+        if self._task.exception() is not None:
+            return self.failed(repr(self._task.exception()))
+        reason = self._task.result()
+        return None if reason is None else self.failed(reason)
+
+    def stop(self):
+        if not self._task.done():
+            self._task.cancel()
+            try:
+                self._loop.run_until_complete(self._task)
+            except asyncio.CancelledError:
+                pass
+        self._loop.close()
+
+
+class SerialMonitor(BlockingMonitor):
+    """
+    Reads lines from a serial port (needs pyserial). A line matching `fail_pattern` is a failure.
+    """
+    def __init__(self, name=None, port=None, baudrate=9600, fail_pattern='FAIL|ERROR'):
+        super().__init__(name, fail_pattern)
+        self.port = port
+        self.baudrate = baudrate
+        self._serial = None
+
+    def start(self, dwell_time):
+        if self._serial is None:
+            import serial  # optional dependency
+            self._serial = serial.Serial(self.port, self.baudrate)
+        self._serial.reset_input_buffer()
+
+    def read(self, timeout):
+        self._serial.timeout = timeout
+        line = self._serial.readline()
+        return line.decode(errors='replace') if line else None
+
+    def close(self):
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+
+class TCPMonitor(AsyncMonitor):
+    """
+    Reads lines from a TCP connection. A line matching `fail_pattern` or a closed connection is a failure.
+    """
+    def __init__(self, name=None, host='localhost', port=5025, fail_pattern='FAIL|ERROR'):
+        super().__init__(name)
+        self.host = host
+        self.port = port
+        self.fail_pattern = re.compile(fail_pattern)
+
+    async def watch(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return "connection closed by EUT"
+                line = line.decode(errors='replace').strip()
+                if self.fail_pattern.search(line):
+                    return line
+        finally:
+            writer.close()
+
+
+class SubprocessMonitor(PollingMonitor):
+    """
+    Runs `command` once per poll. A non-zero exit code is a failure.
+    """
+    def __init__(self, name=None, command=None, poll_interval=1.0):
+        super().__init__(name, poll_interval)
+        self.command = command
+
+    def poll(self):
+        proc = subprocess.run(self.command, shell=isinstance(self.command, str),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return f"exit code {proc.returncode}: {(proc.stdout + proc.stderr).strip()}"
+        return None
+
+
+class FileWatchMonitor(PollingMonitor):
+    """
+    Watches a (log) file written by the EUT. New lines matching `fail_pattern` are a failure.
+    """
+    def __init__(self, name=None, path=None, fail_pattern='FAIL|ERROR', poll_interval=0.1):
+        super().__init__(name, poll_interval)
+        self.path = path
+        self.fail_pattern = re.compile(fail_pattern)
+        self._pos = 0
+
+    def start(self, dwell_time):
+        try:
+            self._pos = os.path.getsize(self.path)
+        except OSError:
+            self._pos = 0
+
+    def poll(self):
+        try:
+            with open(self.path, errors='replace') as f:
+                f.seek(self._pos)
+                lines = f.readlines()
+                self._pos = f.tell()
+        except OSError:
+            return None
+        for line in lines:
+            if self.fail_pattern.search(line):
+                return line.strip()
+        return None
+
+
+MONITORS = {
+    'dwell': DwellMonitor,
+    'serial': SerialMonitor,
+    'tcp': TCPMonitor,
+    'subprocess': SubprocessMonitor,
+    'file': FileWatchMonitor,
+}
+
+
+def make_monitor(spec=None):
+    """
+    Creates a monitor from a spec dict, e.g. {'type': 'serial', 'port': 'COM3'}.
+    `type` is either a key of MONITORS or a plugin given as 'package.module:ClassName'.
+    All other keys are passed to the constructor.
+    """
+    if spec is None:
+        return DwellMonitor()
+    spec = dict(spec)
+    typ = spec.pop('type', 'dwell')
+    if ':' in typ:
+        modname, clsname = typ.split(':', 1)
+        cls = getattr(importlib.import_module(modname), clsname)
+    else:
+        cls = MONITORS[typ]
+    return cls(**spec)
+
+
+def make_monitors(specs=None):
+    """
+    Creates one monitor per spec (see `make_monitor`). Each monitor is a channel of the result table,
+    so unnamed or duplicate names are made unique: 'EUT1', 'EUT2', ...
+    """
+    if not specs:
+        specs = [None]
+    elif isinstance(specs, dict):
+        specs = [specs]
+    monitors = [make_monitor(spec) for spec in specs]
+    names = [m.name for m in monitors]
+    taken = set(names)
+    for i, m in enumerate(monitors):
+        if names.count(names[i]) > 1:
+            n = i + 1
+            while f"{names[i]}{n}" in taken:
+                n += 1
+            m.name = f"{names[i]}{n}"
+            taken.add(m.name)
+    return monitors
+
+
+def close_monitors(monitors):
+    """
+    Closes the monitors at the end of a sweep (see EUTMonitor.close).
+    """
+    for m in monitors or ():
+        m.close()
+
+
+def passed_texts(monitors):
+    """
+    {channel: passed text} of the monitors, for the status checks of the result table (see Table.py).
+    """
+    return {m.name: m.passed for m in monitors}
 
 class EUT_status_Signal(QObject):
     """
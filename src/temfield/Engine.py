@@ -0,0 +1,243 @@
+"""
+Headless measurement engine for one cell, used by the multi-cell supervisor (see Supervisor.py).
+
+The engine runs the sweep of MainWindow (leveling, dwell with EUT monitoring, one table row per
+frequency and level) without Qt widgets or plots. `run_cell` is the target of one process per cell,
+so every cell has its own graph and device session. Events go to the supervisor through a
+multiprocessing queue as (cell, kind, payload) tuples:
+
+    ('log', text), ('state', 'running'|'paused'|'finished'|'stopped'|'failed'), ('progress', percent),
+    ('row', [cell texts]), ('run', run directory)
+
+With a results database (see ResultsDB.py) every finished or stopped run is indexed there with its cell.
+Like the GUI, the engine measures the frequencies band by band (setup key 'band_order') and feeds the
+metrics of Metrics.py, which a cell serves on its own "metrics_port" (see Supervisor.py).
+The setup defaults, the frequency plan and the row format are shared with MainWindow (Setup.py, Table.py).
+
+Uniformity mode, waveform recording and reports are only available in the single-cell GUI.
+"""
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .EUT import close_monitors, monitor_eut, make_monitors, passed_texts
+from .RunStore import RunStore
+from .Setup import DEFAULT_SETUP, field_levels, searchpath_list, sweep_frequencies
+from .Table import BASE_HEADER, TARGET_COLUMN, channel_columns, extra_columns, row_texts, timestamp
+from . import Metrics
+
+
+class _Progress:
+    def emit(self, value):
+        pass
+
+
+class SweepEngine:
+    def __init__(self, cell, setup, store, emit=None, stop=None, pause=None, results_db=None):
+        self.cell = cell
+        self.setup = dict(DEFAULT_SETUP, **setup)
+        self.store = store
+        self.results_db = results_db
+        self.emit = emit or (lambda kind, payload: None)
+        self.stop = stop
+        self.pause = pause
+        self.meas = None
+        self._busy_mark = None   # start of the sweep time not yet added to Metrics.SWEEP_BUSY
+        self.monitors = make_monitors(self.setup['eut_monitor_specs'])
+        self.monitor_pool = ThreadPoolExecutor(max_workers=len(self.monitors), thread_name_prefix='temfield-eut')
+
+    def log(self, text):
+        self.emit('log', text)
+
+    def header(self):
+        levels = field_levels(self.setup['levels'], self.setup['cw'])
+        return BASE_HEADER + extra_columns(len(levels), [m.name for m in self.monitors])
+
+    def init_devices(self):
+        from .TestSusceptibility import TestSusceptibiliy
+
+        setup = self.setup
+        self.meas = TestSusceptibiliy()
+        self.meas.Init(dwell_time=setup['dwell_time'],
+                       e_target=setup['cw'],
+                       names=dict(setup['names']),
+                       dotfile=setup['dotfile'],
+                       SearchPath=searchpath_list(setup['searchpath']),
+                       adjust_to_setting=setup['adjust_to_setting'],
+                       concurrent=setup['concurrent_devices'],
+                       read_tolerance=setup['read_tolerance'],
+                       max_reads=setup['max_reads'],
+                       shadow_state=setup['shadow_state'],
+                       settling_times=setup['settling_times'])
+        self.meas.init_measurement(setup['am'])
+
+    def release_devices(self, initialised):
+        """
+        Switches RF off and the devices to standby (if they were initialised) and closes the device session.
+        """
+        if self.meas is None:
+            return
+        try:
+            if initialised:
+                self.meas.rf_off()
+                Metrics.RF_ON.set(0)
+                self.meas.am_off()
+                self.meas.cmd_devices('Standby', active_only=False)
+        finally:
+            self.meas.quit_measurement()
+
+    def dwell(self):
+        """
+        Runs all EUT monitors concurrently for the dwell time. Returns {channel: status}.
+        """
+        futures = {m.name: self.monitor_pool.submit(monitor_eut, _Progress(), monitor=m, dw=self.setup['dwell_time'])
+                   for m in self.monitors}
+        return {name: future.result() for name, future in futures.items()}
+
+    def row(self, result, status):
+        extra = dict({TARGET_COLUMN: result.target}, **channel_columns(status))
+        return row_texts(timestamp(), result, status, passed_texts(self.monitors)) + [str(extra.get(h)) for h in self.header()[len(BASE_HEADER):]]
+
+    def _mark_busy(self):
+        if self._busy_mark is not None:
+            now = time.perf_counter()
+            Metrics.SWEEP_BUSY.inc(now - self._busy_mark)
+            self._busy_mark = now
+
+    def _wait_while_paused(self):
+        if self.pause is None or not self.pause.is_set():
+            return
+        self.meas.rf_off()
+        Metrics.RF_ON.set(0)
+        self._mark_busy()
+        self._busy_mark = None
+        self.emit('state', 'paused')
+        while self.pause.is_set() and not self._stopped():
+            time.sleep(0.1)
+        if self._stopped():
+            return
+        self._busy_mark = time.perf_counter()
+        self.meas.resync()
+        self.meas.rf_on()
+        self.emit('state', 'running')
+
+    def _stopped(self):
+        return self.stop is not None and self.stop.is_set()
+
+    def run(self):
+        freqs = sweep_frequencies(self.setup['start_freq'], self.setup['stop_freq'], self.setup['step_freq'],
+                                  self.setup['log_sweep'])
+        levels = field_levels(self.setup['levels'], self.setup['cw'])
+        run = self.store.create(self.cell, self.setup)
+        self.emit('run', run.path)
+        run.start(self.header(), self.setup['eut_description'])
+        status = 'failed'
+        initialised = False
+        error = None
+        try:
+            self.log("init devices")
+            self.init_devices()
+            initialised = True
+            n_bands = self.meas.prepare_sweep(freqs)
+            if n_bands is not None:
+                self.log(f"{n_bands} graph condition intervals in the frequency plan")
+            if self.setup['band_order']:
+                # results.csv is sorted by frequency and level when the run finishes
+                freqs, switches, ascending = self.meas.plan_order(freqs)
+                if switches is not None:
+                    self.log(f"band ordered sweep: {switches} band switches, {ascending - switches} avoided")
+            self._busy_mark = time.perf_counter()
+            Metrics.SWEEP_RUNNING.set(1)
+            Metrics.SWEEP_PROGRESS.set(0)
+            self.emit('state', 'running')
+            for i, f in enumerate(freqs):
+                if self._stopped():
+                    break
+                self.log(f"set freq to {f} Hz")
+                Metrics.FREQUENCIES.inc()
+                with Metrics.PHASE_SECONDS.time(phase='set_freq'):
+                    self.meas.set_freq(f)
+                result = None
+                for level in levels:
+                    # pause and stop between the levels too, RF is off during a pause
+                    self._wait_while_paused()
+                    if self._stopped():
+                        break
+                    self.meas.am_off()
+                    self.meas.rf_on()
+                    Metrics.RF_ON.set(1)
+                    with Metrics.PHASE_SECONDS.time(phase='leveling'):
+                        if result is None:
+                            result = self.meas.adjust_level(level)
+                        else:
+                            result = self.meas.scale_level(level, self.meas.field_value(result))
+                    self.meas.am_on()
+                    with Metrics.PHASE_SECONDS.time(phase='dwell'):
+                        eut = self.dwell()
+                    self.meas.am_off()
+                    row = self.row(result, eut)
+                    run.add_row(row, key=(f, level))
+                    Metrics.count_row(eut, passed_texts(self.monitors))
+                    self._mark_busy()
+                    self.emit('row', row)
+                Metrics.SWEEP_PROGRESS.set((i + 1) / len(freqs))
+                self.emit('progress', int((i + 1) / len(freqs) * 100))
+            status = 'stopped' if self._stopped() else 'finished'
+        except Exception as e:
+            error = e
+            self.log(traceback.format_exc())
+            raise
+        finally:
+            release_error = None
+            try:
+                self.release_devices(initialised)
+            except Exception as e:
+                # logged, so it does not hide the exception of the sweep
+                release_error = e
+                self.log(f"releasing the devices failed:\n{traceback.format_exc()}")
+            self._mark_busy()
+            self._busy_mark = None
+            Metrics.SWEEP_RUNNING.set(0)
+            if self.meas is not None:
+                run.finish(status, suppressed_commands=self.meas.suppressed,
+                           settling_times=None if self.meas.settling is None else self.meas.settling.to_setting())
+            else:
+                run.finish(status)
+            self.monitor_pool.shutdown(wait=False)
+            close_monitors(self.monitors)
+            if status != 'failed':
+                self.index_results(run)
+            self.emit('state', status)
+            if release_error is not None and error is None:
+                raise release_error
+
+    def index_results(self, run):
+        import sqlite3
+        from .ResultsDB import ResultsDB
+
+        if not self.results_db:
+            return
+        try:
+            db = ResultsDB(self.results_db)
+            try:
+                db.register(run.results, setup=self.setup, cell=self.cell)
+            finally:
+                db.close()
+        except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+            self.log(f"run not indexed in {self.results_db}: {e!r}")
+
+
+def run_cell(cell, setup, store_root, events, stop=None, pause=None, results_db=None, metrics_port=None):
+    """
+    Process target: runs one sweep of `cell` and reports through the `events` queue.
+    Errors end the process with a non-zero exit code after the traceback has been sent as 'log' event.
+    With `metrics_port` the metrics of the cell (see Metrics.py) are served on that port during the run.
+    """
+    if metrics_port:
+        server = Metrics.MetricsServer(metrics_port)
+        server.start()
+        events.put((cell, 'log', f"metrics at {server.address}"))
+    engine = SweepEngine(cell, setup, RunStore(store_root),
+                         emit=lambda kind, payload: events.put((cell, kind, payload)), stop=stop, pause=pause,
+                         results_db=results_db)
+    engine.run()
@@ -0,0 +1,266 @@
+"""
+Live metrics in the Prometheus text format for lab dashboards.
+
+    settings/metrics_port = 9464    (or temfield --metrics-port 9464)
+    curl http://127.0.0.1:9464/metrics
+
+The metrics below are module level objects, fed from the sweep loop (MainWindow) and TestSusceptibiliy.
+Updating a metric is a lock, a dict lookup and an addition, i.e. negligible against the instrument I/O
+of a frequency step. Rendering happens only when the endpoint is scraped, in the server thread.
+http.server is imported only when a MetricsServer is started, the metrics themselves are cheap to import.
+"""
+import bisect
+import math
+import threading
+import time
+
+from .Table import is_passed
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self.labels()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        # metric without labels: a single child
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = float(value)
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _Buckets:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self, **labels):
+        return _Timer(self.labels(**labels) if labels else self._default())
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+SWEEP_RUNNING = Gauge('temfield_sweep_running', 'A sweep is running (1) or not (0).')
+SWEEP_PROGRESS = Gauge('temfield_sweep_progress_ratio', 'Fraction of the frequencies of the current sweep done.')
+SWEEP_BUSY = Counter('temfield_sweep_busy_seconds_total', 'Time spent in sweeps (cell utilization: rate of this).')
+RF_ON = Gauge('temfield_rf_on', 'RF is switched on (1) or off (0).')
+FREQUENCIES = Counter('temfield_frequencies_total', 'Frequencies set during sweeps.')
+ROWS = Counter('temfield_rows_total', 'Result rows (frequency and level) measured.')
+PHASE_SECONDS = Histogram('temfield_phase_seconds', 'Duration of the phases of a frequency step.', ['phase'])
+LEVELINGS = Counter('temfield_levelings_total', 'Level settings by mode (adjust: Leveler, scale: from the previous level, '
+                    'scale_fallback: scaling missed the tolerance).', ['mode'])
+PROBE_READ_SECONDS = Histogram('temfield_probe_read_seconds', 'Latency of a single field probe read.',
+                               buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0))
+PROBE_READS = Histogram('temfield_probe_reads', 'Probe reads averaged per measured field value.',
+                        buckets=(1, 2, 3, 5, 10, 20, 50))
+EUT_FAILURES = Counter('temfield_eut_failures_total', 'Dwells with an EUT failure, per monitor channel.', ['channel'])
+EVENT_LOOP_LATENCY = Histogram('temfield_event_loop_latency_seconds', 'Delay of the GUI event loop heartbeat.',
+                               buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0))
+EVENT_LOOP_STALLS = Histogram('temfield_event_loop_stall_seconds', 'GUI event loop stalls over the watchdog threshold.',
+                              buckets=(0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0))
+SUPPRESSED_COMMANDS = Counter('temfield_suppressed_commands_total', 'Redundant device commands suppressed by the shadow state.')
+
+
+def count_row(status, passed=None):
+    """
+    Per result row: row count and EUT failures per channel of {channel: status}; `passed` as for
+    Table.overall_status.
+    """
+    ROWS.inc()
+    passed = passed or {}
+    for channel, st in status.items():
+        if not is_passed(st, passed.get(channel)):
+            EUT_FAILURES.labels(channel=channel).inc()
+
+
+def _handler():
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = self.server.registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class MetricsServer:
+    """
+    Serves GET /metrics from a daemon thread, by default on localhost only.
+    """
+    def __init__(self, port, host='127.0.0.1', registry=None):
+        from http.server import ThreadingHTTPServer
+        self.httpd = ThreadingHTTPServer((host, port), _handler())
+        self.httpd.daemon_threads = True
+        self.httpd.registry = REGISTRY if registry is None else registry
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='temfield-metrics', daemon=True)
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
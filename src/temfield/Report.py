@@ -0,0 +1,134 @@
+"""
+Test report generation (HTML, PDF and PNG).
+
+`build_report` only takes plain data (table header and rows, setup dict, EUT description), so it can run in a
+separate process (see MainWindow.start_report) without blocking the GUI or the next queued test.
+"""
+import base64
+import datetime
+import html
+import io
+import os
+
+import numpy as np
+
+from .Analysis import table_arrays, failure_bands
+
+
+def _timing(rows, header):
+    """
+    Durations (s) between consecutive table rows, from the Time column.
+    """
+    col = header.index('Time')
+    stamps = []
+    for row in rows:
+        try:
+            stamps.append(datetime.datetime.strptime(row[col], "%Y-%m-%dT%H:%M:%S.%f%z").timestamp())
+        except ValueError:
+            pass
+    return np.diff(np.array(stamps))
+
+
+def summarize(header, rows):
+    run = table_arrays(header, rows)
+    order = np.argsort(run['f'], kind='stable')
+    f = run['f'][order]
+    steps = _timing(rows, header)
+    summary = {'n_rows': len(rows),
+               'n_failed': int(run['failed'].sum()),
+               'f_min': float(f.min()) if len(f) else float('nan'),
+               'f_max': float(f.max()) if len(f) else float('nan'),
+               'e_min': float(np.nanmin(run['e'][:, 3])) if len(f) else float('nan'),
+               'e_max': float(np.nanmax(run['e'][:, 3])) if len(f) else float('nan'),
+               'failure_bands': failure_bands(f, run['failed'][order]),
+               'duration': float(steps.sum()) if len(steps) else 0.0,
+               'step_mean': float(steps.mean()) if len(steps) else float('nan'),
+               'step_median': float(np.median(steps)) if len(steps) else float('nan'),
+               'step_max': float(steps.max()) if len(steps) else float('nan')}
+    return run, summary
+
+
+def _figure(run):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 4.5))
+    ax = fig.subplots()
+    # one line set per target level, like ResultsPlot: colour per component, line style per level
+    target = run['target']
+    levels = [float(level) for level in np.unique(target[~np.isnan(target)])]
+    if np.isnan(target).any():
+        levels.append(None)
+    for k, level in enumerate(levels):
+        rows = np.flatnonzero(np.isnan(target) if level is None else target == level)
+        rows = rows[np.argsort(run['f'][rows], kind='stable')]
+        style = ('-', '--', ':', '-.')[k % 4]
+        suffix = '' if level is None else f" {level:g} V/m"
+        for c, label in enumerate(('Ex', 'Ey', 'Ez', '|E|')):
+            ax.plot(run['f'][rows], run['e'][rows, c], color=f"C{c}", ls=style, label=label + suffix)
+    failed = run['failed']
+    if failed.any():
+        ax.plot(run['f'][failed], run['e'][failed, 3], ls='', marker='x', color='red', label='EUT failed')
+    ax.set_xscale('log')
+    ax.set_xlabel("Frequency in Hz")
+    ax.set_ylabel("E-Field in V/m")
+    ax.grid(True, which='both')
+    ax.legend(loc='upper right')
+    fig.tight_layout()
+    return fig
+
+
+def _summary_lines(summary, setup, eut_description):
+    lines = [f"Frequencies: {summary['n_rows']} rows, {summary['f_min'] * 1e-6:.3f} - {summary['f_max'] * 1e-6:.3f} MHz",
+             f"|E|: {summary['e_min']:.2f} - {summary['e_max']:.2f} V/m",
+             f"EUT failures: {summary['n_failed']}"]
+    for a, b in summary['failure_bands']:
+        lines.append(f"    failing band: {a * 1e-6:.3f} - {b * 1e-6:.3f} MHz")
+    lines.append(f"Test duration: {datetime.timedelta(seconds=round(summary['duration']))} (hh:mm:ss), "
+                 f"per step: mean {summary['step_mean']:.2f} s, median {summary['step_median']:.2f} s, "
+                 f"max {summary['step_max']:.2f} s")
+    lines.append("Setup:")
+    lines.extend(f"    {key}: {value}" for key, value in setup.items())
+    lines.append("EUT:")
+    lines.extend(f"    {line}" for line in eut_description.splitlines())
+    return lines
+
+
+def build_report(header, rows, setup, eut_description, outdir, basename='report', formats=('html', 'pdf', 'png')):
+    """
+    Writes the report files to `outdir` and returns their paths.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    run, summary = summarize(header, rows)
+    lines = _summary_lines(summary, setup, eut_description)
+    fig = _figure(run)
+    paths = []
+    png = io.BytesIO()
+    fig.savefig(png, format='png', dpi=120)
+    if 'png' in formats:
+        path = os.path.join(outdir, basename + '.png')
+        with open(path, 'wb') as f:
+            f.write(png.getvalue())
+        paths.append(path)
+    if 'pdf' in formats:
+        from matplotlib.backends.backend_pdf import PdfPages
+        from matplotlib.figure import Figure
+
+        path = os.path.join(outdir, basename + '.pdf')
+        with PdfPages(path) as pdf:
+            page = Figure(figsize=(8.27, 11.69))
+            page.text(0.05, 0.95, '\n'.join(lines), va='top', family='monospace', fontsize=8)
+            pdf.savefig(page)
+            pdf.savefig(fig)
+        paths.append(path)
+    if 'html' in formats:
+        path = os.path.join(outdir, basename + '.html')
+        img = base64.b64encode(png.getvalue()).decode()
+        table = ''.join('<tr>' + ''.join(f'<td>{html.escape(c)}</td>' for c in row) + '</tr>' for row in rows)
+        with open(path, 'w') as f:
+            f.write(f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>TEMField Report</title></head><body>\n"
+                    f"<h1>TEMField Report</h1>\n<pre>{html.escape(chr(10).join(lines))}</pre>\n"
+                    f"<img src='data:image/png;base64,{img}'>\n"
+                    f"<table border='1'><tr>{''.join(f'<th>{html.escape(h)}</th>' for h in header)}</tr>{table}</table>\n"
+                    f"</body></html>\n")
+        paths.append(path)
+    return paths
@@ -0,0 +1,315 @@
+"""
+SQLite index over all result files.
+
+Every saved result table (MainWindow.write_table, test plans, the run store of the supervisor) is registered
+with its setup, EUT description, per-band summaries, the EUT failures and pointers to the result, waveform,
+uniformity and report files. Queries by EUT, date, frequency, field level or failure then run on the index
+only:
+
+    temfield-results-db import results/**/*.csv
+    temfield-results-db failures --eut "family X" --fmin 380e6 --fmax 420e6 --limit 1
+    temfield-results-db runs --since 2024-01-01 --level 10
+
+Bands are fixed frequency ranges (BAND_EDGES), so summaries of different runs and setups are comparable.
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+from .Analysis import read_result_file
+
+BAND_EDGES = (0., 30e6, 80e6, 200e6, 400e6, 1e9, 2e9, 3e9, 6e9, 18e9, np.inf)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    saved TEXT,
+    registered TEXT,
+    cell TEXT,
+    eut TEXT,
+    setup TEXT,
+    f_min REAL,
+    f_max REAL,
+    n_rows INTEGER,
+    n_failed INTEGER,
+    waveforms TEXT,
+    uniformity TEXT,
+    report TEXT
+);
+CREATE TABLE IF NOT EXISTS bands (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    f_start REAL,
+    f_stop REAL,
+    level REAL,
+    n_points INTEGER,
+    n_failed INTEGER,
+    e_min REAL,
+    e_max REAL
+);
+CREATE TABLE IF NOT EXISTS failures (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    f REAL,
+    level REAL,
+    e REAL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_saved ON runs(saved);
+CREATE INDEX IF NOT EXISTS runs_eut ON runs(eut);
+CREATE INDEX IF NOT EXISTS bands_run ON bands(run_id);
+CREATE INDEX IF NOT EXISTS bands_freq ON bands(f_start, f_stop, level);
+CREATE INDEX IF NOT EXISTS failures_freq ON failures(f, level);
+CREATE INDEX IF NOT EXISTS failures_run ON failures(run_id);
+"""
+
+
+def _iso(saved):
+    """
+    'File saved' stamps are "%Y-%m-%dT%H:%M:%S.%f%z"; stored as ISO text so dates compare as strings.
+    """
+    try:
+        return datetime.datetime.strptime(saved, "%Y-%m-%dT%H:%M:%S.%f%z").isoformat()
+    except (TypeError, ValueError):
+        return saved
+
+
+def _real(value):
+    # nan (no target level, no field value) is stored as NULL
+    return None if np.isnan(value) else float(value)
+
+
+def band_summaries(f, e, level, failed, edges=BAND_EDGES):
+    """
+    Min/max |E| and failures per band and level. Returns [(f_start, f_stop, level, n, n_failed, e_min, e_max)].
+    """
+    out = []
+    band = np.searchsorted(edges, f, side='right') - 1
+    for lev in np.unique(level):
+        same = np.isnan(level) if np.isnan(lev) else level == lev
+        for b in np.unique(band[same]):
+            sel = (band == b) & same
+            out.append((float(edges[b]), float(edges[b + 1]), _real(lev), int(sel.sum()), int(failed[sel].sum()),
+                        _real(np.nanmin(e[sel])), _real(np.nanmax(e[sel]))))
+    return out
+
+
+class ResultsDB:
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.con = sqlite3.connect(path)
+        self.con.row_factory = sqlite3.Row
+        self.con.execute("PRAGMA foreign_keys = ON")
+        self.con.executescript(SCHEMA)
+
+    def close(self):
+        self.con.close()
+
+    def has(self, path):
+        return self.con.execute("SELECT 1 FROM runs WHERE path = ?", (os.path.abspath(path),)).fetchone() is not None
+
+    def register(self, path, setup=None, eut=None, cell=None, waveforms=None, uniformity=None, report=None):
+        """
+        Adds (or replaces) the result file `path`. `eut` defaults to the EUT description of the file header.
+        Returns the run id.
+        """
+        run = read_result_file(path)
+        status = np.array(run['status'], dtype=object)
+        failed = run['failed']
+        e = run['e'][:, 3]
+        level = run['target']
+        if setup and np.isnan(level).all():
+            # not leveled: the field level of the setup
+            level = np.full(len(e), float(setup.get('cw') or np.nan))
+        path = os.path.abspath(path)
+        with self.con:
+            self.con.execute("DELETE FROM runs WHERE path = ?", (path,))
+            cur = self.con.execute(
+                "INSERT INTO runs (path, saved, registered, cell, eut, setup, f_min, f_max, n_rows, n_failed, "
+                "waveforms, uniformity, report) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, _iso(run['saved']), datetime.datetime.now().astimezone().isoformat(), cell,
+                 run['eut'] if eut is None else eut, None if setup is None else json.dumps(setup, default=str),
+                 float(run['f'].min()) if len(e) else None, float(run['f'].max()) if len(e) else None,
+                 len(e), int(failed.sum()), waveforms, uniformity, report))
+            run_id = cur.lastrowid
+            self.con.executemany("INSERT INTO bands VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 [(run_id,) + b for b in band_summaries(run['f'], e, level, failed)])
+            self.con.executemany("INSERT INTO failures VALUES (?, ?, ?, ?, ?)",
+                                 [(run_id, float(run['f'][i]), _real(level[i]), _real(e[i]), status[i])
+                                  for i in np.flatnonzero(failed)])
+        return run_id
+
+    def import_files(self, paths, force=False):
+        """
+        Registers existing result files (e.g. years of loose CSVs). Returns (imported, skipped, errors).
+        """
+        imported, skipped, errors = 0, 0, []
+        for path in paths:
+            if not force and self.has(path):
+                skipped += 1
+                continue
+            try:
+                self.register(path)
+                imported += 1
+            except (OSError, ValueError, KeyError, StopIteration) as e:
+                errors.append((path, e))
+        return imported, skipped, errors
+
+    @staticmethod
+    def _where(eut=None, since=None, until=None, cell=None):
+        clauses, args = [], []
+        if eut:
+            clauses.append("runs.eut LIKE ?")
+            args.append(f"%{eut}%")
+        if since:
+            clauses.append("runs.saved >= ?")
+            args.append(since)
+        if until:
+            clauses.append("runs.saved < ?")
+            args.append(until)
+        if cell:
+            clauses.append("runs.cell = ?")
+            args.append(cell)
+        return clauses, args
+
+    def runs(self, eut=None, since=None, until=None, cell=None, f_min=None, f_max=None, level=None,
+             failed=None, limit=100):
+        """
+        Runs (newest first) matching all given criteria. With a frequency range and/or level, only runs with
+        a band summary in that range count; `failed` True/False selects runs with/without EUT failures in
+        exactly that range and level (failures table, not the band summaries).
+        """
+        clauses, args = self._where(eut, since, until, cell)
+        band, band_args = ["bands.run_id = runs.id"], []
+        fail, fail_args = ["failures.run_id = runs.id"], []
+        if f_min is not None:
+            band.append("bands.f_stop > ?")
+            band_args.append(f_min)
+            fail.append("failures.f >= ?")
+            fail_args.append(f_min)
+        if f_max is not None:
+            band.append("bands.f_start <= ?")
+            band_args.append(f_max)
+            fail.append("failures.f <= ?")
+            fail_args.append(f_max)
+        if level is not None:
+            band.append("bands.level = ?")
+            band_args.append(level)
+            fail.append("failures.level = ?")
+            fail_args.append(level)
+        if len(band) > 1:
+            clauses.append(f"EXISTS (SELECT 1 FROM bands WHERE {' AND '.join(band)})")
+            args.extend(band_args)
+        if failed is not None:
+            clauses.append(f"{'' if failed else 'NOT '}EXISTS (SELECT 1 FROM failures WHERE {' AND '.join(fail)})")
+            args.extend(fail_args)
+        sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        sql += " ORDER BY saved DESC LIMIT ?"
+        return [dict(row) for row in self.con.execute(sql, args + [limit])]
+
+    def failures(self, eut=None, since=None, until=None, cell=None, f_min=None, f_max=None, level=None, limit=100):
+        """
+        EUT failures (newest run first) with the run's saved date, EUT and result file.
+        """
+        clauses, args = self._where(eut, since, until, cell)
+        if f_min is not None:
+            clauses.append("failures.f >= ?")
+            args.append(f_min)
+        if f_max is not None:
+            clauses.append("failures.f <= ?")
+            args.append(f_max)
+        if level is not None:
+            clauses.append("failures.level = ?")
+            args.append(level)
+        sql = ("SELECT failures.f, failures.level, failures.e, failures.status, runs.saved, runs.eut, runs.path, "
+               "runs.id AS run_id FROM failures JOIN runs ON runs.id = failures.run_id")
+        sql += (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY runs.saved DESC, failures.f LIMIT ?"
+        return [dict(row) for row in self.con.execute(sql, args + [limit])]
+
+    def bands(self, run_id):
+        """
+        Per-band summaries of one run.
+        """
+        return [dict(row) for row in self.con.execute(
+            "SELECT f_start, f_stop, level, n_points, n_failed, e_min, e_max FROM bands WHERE run_id = ? "
+            "ORDER BY level, f_start", (run_id,))]
+
+
+def default_path():
+    """
+    Same location as the sweep journal of the GUI (AppDataLocation of TEMField), without Qt.
+    """
+    if sys.platform.startswith('win'):
+        base = os.environ.get('APPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share'))
+    return os.path.join(base, 'TUD-TETEMV', 'TEMField', 'results.sqlite')
+
+
+def _level(level):
+    # failures of runs without target or setup level have no level
+    return '-' if level is None else f"{level:g}"
+
+
+def _first_line(text):
+    return (text or '').strip().splitlines()[0] if (text or '').strip() else ''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='temfield-results-db', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default=None, help=f'database file (default: {default_path()})')
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help='register result files')
+    imp.add_argument('files', nargs='+', help='result files or glob patterns (** allowed)')
+    imp.add_argument('--force', action='store_true', help='re-register files that are already in the index')
+    for name in ('runs', 'failures'):
+        q = sub.add_parser(name)
+        q.add_argument('--eut', help='substring of the EUT description')
+        q.add_argument('--since', help='ISO date, e.g. 2024-01-01')
+        q.add_argument('--until', help='ISO date')
+        q.add_argument('--cell')
+        q.add_argument('--fmin', type=float, help='Hz')
+        q.add_argument('--fmax', type=float, help='Hz')
+        q.add_argument('--level', type=float, help='field level (V/m)')
+        q.add_argument('--limit', type=int, default=20)
+        if name == 'runs':
+            q.add_argument('--failed', action='store_true', help='only runs with failures in the range')
+    args = parser.parse_args(argv)
+
+    db = ResultsDB(args.db or default_path())
+    try:
+        if args.command == 'import':
+            paths = []
+            for pattern in args.files:
+                paths.extend(sorted(glob.glob(pattern, recursive=True)) or [pattern])
+            imported, skipped, errors = db.import_files(paths, force=args.force)
+            for path, e in errors:
+                print(f"{path}: {e}", file=sys.stderr)
+            print(f"{imported} imported, {skipped} already registered, {len(errors)} errors")
+            return 1 if errors else 0
+        if args.command == 'runs':
+            for run in db.runs(args.eut, args.since, args.until, args.cell, args.fmin, args.fmax, args.level,
+                               True if args.failed else None, args.limit):
+                print(f"{run['saved']}  {run['n_rows']:5d} rows  {run['n_failed']:4d} failed  "
+                      f"{_first_line(run['eut'])[:40]:40s}  {run['path']}")
+        else:
+            for fail in db.failures(args.eut, args.since, args.until, args.cell, args.fmin, args.fmax, args.level,
+                                    args.limit):
+                print(f"{fail['saved']}  {fail['f'] * 1e-6:10.3f} MHz  {_level(fail['level'])} V/m  {fail['status']}  "
+                      f"{_first_line(fail['eut'])[:40]:40s}  {fail['path']}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
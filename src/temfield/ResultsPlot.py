@@ -0,0 +1,167 @@
+from PySide6.QtWidgets import QVBoxLayout, QWidget
+
+
+class ResultsPlot:
+    """
+    Leveled field (Ex, Ey, Ez, |E|) and EUT failures vs. frequency, updated incrementally during the sweep.
+    A multi-level sweep gets one set of lines per target level (same colour per component, own line style).
+
+    The data lives in preallocated arrays (grown by doubling if necessary) and the lines are animated artists:
+    a new point only restores the cached background and redraws the lines (blitting).
+    The whole figure is redrawn only if the y-range has to grow, a new level appears or the canvas is resized.
+    The canvas is built on `show()`, points added before are kept and drawn then.
+    """
+    labels = ('Ex', 'Ey', 'Ez', '|E|')
+    linestyles = ('-', '--', ':', '-.')
+
+    def __init__(self, container):
+        self.container = container
+        self.canvas = None
+        self._background = None
+        self.n = 0
+        self.n_failed = 0
+        self._series = {}
+        self._lines = {}
+        self._capacity = 1024
+        self._failed = None
+        self.frange = None
+        self.ymax = 1.0
+
+    def reset(self, fmin, fmax, capacity):
+        """
+        `capacity`: expected number of points per level.
+        """
+        import numpy as np
+        self.n = 0
+        self.n_failed = 0
+        self._series = {}
+        self._capacity = max(1, capacity)
+        self._failed = np.empty((self._capacity, 2))  # f, |E|
+        self.frange = (fmin, fmax)
+        self.ymax = 1.0
+        if self.canvas is not None:
+            for lines in self._lines.values():
+                for line in lines:
+                    line.remove()
+            self._lines = {}
+            self._ax.set_xlim(*self.frange)
+            self._ax.set_ylim(0, self.ymax)
+            self._set_line_data()
+            self._legend()
+            self.canvas.draw_idle()
+
+    def _grow(self, arr):
+        import numpy as np
+        new = np.empty((2 * len(arr), arr.shape[1]))
+        new[:len(arr)] = arr
+        return new
+
+    def add(self, f, ex, ey, ez, magnitude, failed=False, level=None):
+        """
+        Adds a point of the lines of target `level` (V/m, None for a single level sweep).
+        """
+        import numpy as np
+        if self._failed is None:
+            self.reset(f, f * 1.1, 1024)
+        series = self._series.get(level)
+        new_level = series is None
+        if new_level:
+            series = self._series[level] = [np.empty((self._capacity, 5)), 0]  # f, ex, ey, ez, |E|; n
+        data, n = series
+        if n == len(data):
+            data = series[0] = self._grow(data)
+        # keep the points sorted by frequency, the sweep may run band by band (see Bands.band_order)
+        i = n
+        if i and f < data[i - 1, 0]:
+            i = int(data[:n, 0].searchsorted(f, side='right'))
+            data[i + 1:n + 1] = data[i:n]
+        data[i] = (f, ex, ey, ez, magnitude)
+        series[1] = n + 1
+        self.n += 1
+        if failed:
+            if self.n_failed == len(self._failed):
+                self._failed = self._grow(self._failed)
+            self._failed[self.n_failed] = (f, magnitude)
+            self.n_failed += 1
+        if self.canvas is None:
+            return
+        if new_level:
+            self._add_lines(level)
+        self._set_line_data()
+        if new_level or magnitude > self.ymax or not (self.frange[0] <= f <= self.frange[1]):
+            # full redraw only when the axes or the legend have to change
+            self.ymax = max(self.ymax, 1.5 * magnitude)
+            self.frange = (min(self.frange[0], f), max(self.frange[1], f))
+            self._ax.set_xlim(*self.frange)
+            self._ax.set_ylim(0, self.ymax)
+            self.canvas.draw_idle()
+        else:
+            self._blit()
+
+    def show(self):
+        if self.canvas is not None:
+            return
+        from matplotlib.backends.backend_qtagg import (FigureCanvasQTAgg as FigureCanvas,
+                                                       NavigationToolbar2QT as NavigationToolbar)
+        from matplotlib.figure import Figure
+
+        self.canvas = FigureCanvas(Figure(figsize=(5, 4)))
+        layout = QVBoxLayout()
+        layout.addWidget(NavigationToolbar(self.canvas, self.container))
+        layout.addWidget(self.canvas)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.container.setWidget(widget)
+        self._ax = self.canvas.figure.subplots()
+        self._ax.set_xscale('log')
+        self._ax.set_xlabel("Frequency in Hz")
+        self._ax.set_ylabel("E-Field in V/m")
+        self._ax.grid(True, which='both')
+        self._fail_line, = self._ax.plot([], [], ls='', marker='x', color='red', label='EUT failed', animated=True)
+        for level in self._series:
+            self._add_lines(level)
+        if self.frange is not None:
+            self._ax.set_xlim(*self.frange)
+            if self.n:
+                self.ymax = max(self.ymax, 1.5 * max(data[:n, 4].max() for data, n in self._series.values() if n))
+        self._ax.set_ylim(0, self.ymax)
+        self._set_line_data()
+        self._legend()
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.draw_idle()
+
+    def _add_lines(self, level):
+        style = self.linestyles[len(self._lines) % len(self.linestyles)]
+        suffix = '' if level is None else f" {level:g} V/m"
+        self._lines[level] = [self._ax.plot([], [], color=f"C{i}", ls=style, label=label + suffix, animated=True)[0]
+                              for i, label in enumerate(self.labels)]
+        self._legend()
+
+    def _legend(self):
+        self._ax.legend(loc='upper right')
+
+    def _set_line_data(self):
+        for level, lines in self._lines.items():
+            data, n = self._series[level]
+            for i, line in enumerate(lines):
+                line.set_data(data[:n, 0], data[:n, i + 1])
+        if self._failed is not None:
+            self._fail_line.set_data(self._failed[:self.n_failed, 0], self._failed[:self.n_failed, 1])
+
+    def _draw_animated(self):
+        for lines in self._lines.values():
+            for line in lines:
+                self._ax.draw_artist(line)
+        self._ax.draw_artist(self._fail_line)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _blit(self):
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_animated()
+        self.canvas.blit(self.canvas.figure.bbox)
@@ -0,0 +1,128 @@
+"""
+Run store shared by several measurement cells (see Supervisor.py).
+
+Every run gets its own directory below the store root:
+
+    <root>/<YYYYmmdd-HHMMSS>-<cell>/results.csv      result table, same format as MainWindow.write_table
+    <root>/<YYYYmmdd-HHMMSS>-<cell>/metadata.json    cell, setup, host, start/finish time, status, number of rows
+
+Rows are appended and flushed one by one, so an aborted run still leaves a readable result file
+(temfield-analysis reads it like any other saved table). Rows added with a sort key (frequency and level,
+the sweep may run band by band) are written in key order when the run finishes.
+"""
+import csv
+import datetime
+import json
+import os
+import re
+import socket
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).astimezone().strftime("%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+class Run:
+    def __init__(self, path, metadata):
+        self.path = path
+        self.metadata = metadata
+        self.results = os.path.join(path, 'results.csv')
+        self._csv = None
+        self._writer = None
+        self._preamble = ''
+        self._rows = []   # (key, row)
+
+    def start(self, header, eut_description=''):
+        self._preamble = f"# File saved: {self.metadata['started']}\n#\n# EUT Description\n"
+        self._preamble += ''.join(f"# {eut_line}\n" for eut_line in eut_description.splitlines())
+        self._csv = open(self.results, 'w', newline='')
+        self._csv.write(self._preamble)
+        self._writer = csv.writer(self._csv, dialect='excel', lineterminator='\n')
+        self._writer.writerow(header)
+        self._csv.flush()
+        self.metadata['header'] = list(header)
+        self.save()
+
+    def add_row(self, row, key=None):
+        """
+        Appends `row` to the result file; `key` (e.g. (f, level)) is its place in the finished file.
+        """
+        self._writer.writerow(row)
+        self._csv.flush()
+        self._rows.append((key, row))
+        self.metadata['n_rows'] += 1
+
+    def finish(self, status, **extra):
+        if self._csv is not None:
+            self._csv.close()
+            self._csv = None
+            self._sort_rows()
+        self.metadata.update(extra, status=status, finished=_now())
+        self.save()
+
+    def _sort_rows(self):
+        keys = [key for key, row in self._rows]
+        if None in keys or keys == sorted(keys):
+            return
+        tmp = self.results + '.tmp'
+        with open(tmp, 'w', newline='') as f:
+            f.write(self._preamble)
+            writer = csv.writer(f, dialect='excel', lineterminator='\n')
+            writer.writerow(self.metadata['header'])
+            writer.writerows(row for key, row in sorted(self._rows, key=lambda item: item[0]))
+        os.replace(tmp, self.results)
+
+    def save(self):
+        tmp = os.path.join(self.path, 'metadata.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.metadata, f, indent=1, default=str)
+        os.replace(tmp, os.path.join(self.path, 'metadata.json'))
+
+
+class RunStore:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, cell, setup):
+        """
+        Creates the directory of a new run of `cell` and returns the Run.
+        """
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', cell).strip('_') or 'cell'
+        base = os.path.join(self.root, f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{slug}")
+        path = base
+        n = 1
+        while True:
+            try:
+                os.makedirs(path)
+                break
+            except FileExistsError:
+                n += 1
+                path = f"{base}-{n}"
+        metadata = {'cell': cell,
+                    'host': socket.gethostname(),
+                    'pid': os.getpid(),
+                    'started': _now(),
+                    'finished': None,
+                    'status': 'running',
+                    'n_rows': 0,
+                    'setup': setup}
+        run = Run(path, metadata)
+        run.save()
+        return run
+
+    def runs(self):
+        """
+        Metadata of all runs in the store, oldest first. The run directory is added as 'path'.
+        """
+        out = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name, 'metadata.json')
+            try:
+                with open(path) as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            metadata['path'] = os.path.dirname(path)
+            out.append(metadata)
+        return out
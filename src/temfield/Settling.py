@@ -0,0 +1,83 @@
+"""
+Settling times learned from the field probe.
+
+After a change (new frequency, RF switched on) the field needs some time until it is stable, e.g. for relay
+settling, amplifier warm-up or the ALC of the signal generator. Instead of a fixed conservative wait,
+the time is learned per device, event and band: the probe is read repeatedly after the change until two
+consecutive reads agree within `tolerance`. The estimate is a moving average over the observations;
+later changes just wait `margin` times the estimate (the largest one of all devices involved).
+A key is learned `learn_count` times and then re-checked every `relearn_every` changes.
+
+The times are kept with the setup as {key: [seconds, observations]}, key = 'device/event/band'.
+"""
+import time
+
+
+class SettlingTimes:
+    def __init__(self, times=None, margin=1.2, alpha=0.3, learn_count=3, relearn_every=50,
+                 tolerance=0.02, floor=0.01, max_time=5.0):
+        self.times = {key: [float(t), int(n)] for key, (t, n) in (times or {}).items()}
+        self.margin = margin
+        self.alpha = alpha
+        self.learn_count = learn_count
+        self.relearn_every = relearn_every
+        self.tolerance = tolerance
+        self.floor = floor          # V/m, below that the tolerance is absolute
+        self.max_time = max_time
+        self._changes = 0
+
+    @staticmethod
+    def key(device, event, band):
+        return f"{device}/{event}/{band}"
+
+    def wait_time(self, keys):
+        known = [self.times[key][0] for key in keys if key in self.times]
+        return self.margin * max(known) if known else 0.0
+
+    def needs_learning(self, keys):
+        self._changes += 1
+        if any(self.times.get(key, (0, 0))[1] < self.learn_count for key in keys):
+            return True
+        return bool(self.relearn_every) and self._changes % self.relearn_every == 0
+
+    def observe(self, keys, seconds):
+        for key in keys:
+            t, n = self.times.get(key, (seconds, 0))
+            self.times[key] = [seconds if n == 0 else (1 - self.alpha) * t + self.alpha * seconds, n + 1]
+
+    def measure(self, read, start):
+        """
+        Reads the field (`read()` returns V/m) until two consecutive values agree.
+        Returns the time from `start` (time.perf_counter()) to the first of them, None if the field did not
+        settle within `max_time`.
+        """
+        prev = read()
+        t_prev = time.perf_counter()
+        while t_prev - start < self.max_time:
+            value = read()
+            now = time.perf_counter()
+            if abs(value - prev) <= self.tolerance * max(abs(value), self.floor):
+                return t_prev - start
+            prev, t_prev = value, now
+        return None
+
+    def settle(self, keys, read, start):
+        """
+        Waits until the field has settled after a change at `start`: measures and learns the settling time
+        if needed, otherwise sleeps for the rest of the learned time. Returns the time waited (s).
+        """
+        if not keys:
+            return 0.0
+        if self.needs_learning(keys):
+            seconds = self.measure(read, start)
+            # a timeout (unstable field, EUT influence) is not a settling time
+            if seconds is not None:
+                self.observe(keys, seconds)
+        else:
+            rest = self.wait_time(keys) - (time.perf_counter() - start)
+            if rest > 0:
+                time.sleep(rest)
+        return time.perf_counter() - start
+
+    def to_setting(self):
+        return {key: list(value) for key, value in sorted(self.times.items())}
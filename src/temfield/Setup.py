@@ -0,0 +1,156 @@
+"""
+Defaults and types of the setup attributes that can be changed without the GUI (MainWindow.SETUP_KEYS:
+automation API, test plans, resumed sweeps, supervisor cells), and the frequencies and field levels of a
+setup. Shared by MainWindow and the headless engine (Engine.py).
+
+Values from outside are checked before they are set, so a test plan or an API client cannot put
+anything but plain data into the setup. The search path is kept as the text of a list (as shown in the
+GUI and stored in the settings) and is only ever parsed as a literal. EUT monitors from outside are limited
+to the built-in types of MONITOR_TYPES, which run no command and import no code; subprocess and plugin
+monitors ('package.module:Class') can only be configured locally (settings, supervisor cell file).
+"""
+import ast
+
+ADJUST_SETTINGS = ('auto', 'x', 'y', 'z', 'mag', 'largest')
+
+# EUT monitor types (see EUT.MONITORS) accepted from the automation API and from test plans
+MONITOR_TYPES = ('dwell', 'serial', 'tcp', 'file')
+
+DEFAULT_SETUP = {'start_freq': 30.,
+                 'stop_freq': 1000.,
+                 'step_freq': 1.,
+                 'log_sweep': True,
+                 'cw': 1.,
+                 'levels': [],
+                 'am': 80.,
+                 'dwell_time': 1.,
+                 'dotfile': './conf/gtem.dot',
+                 'searchpath': "['.', './conf']",
+                 'names': {'sg': 'sg', 'a1': 'amp1', 'a2': 'amp2', 'tem': 'gtem', 'fp': 'prb'},
+                 'eut_description': '',
+                 'adjust_to_setting': 'auto',
+                 'eut_monitor_specs': [{'type': 'dwell'}],
+                 'concurrent_devices': False,
+                 'shadow_state': True,
+                 'band_order': True,
+                 'read_tolerance': 0.01,
+                 'max_reads': 1,
+                 'settling_times': {}}
+
+
+def sweep_frequencies(start_freq, stop_freq, step_freq, log_sweep):
+    """
+    Frequencies (Hz) of a sweep: start/stop in MHz, step in MHz or in % for a log sweep.
+    """
+    from mpylab.tools.spacing import logspace, linspace
+
+    if log_sweep:
+        freqs = logspace(start_freq, stop_freq, 1 + step_freq * 0.01, endpoint=True)
+    else:
+        freqs = linspace(start_freq, stop_freq, step_freq, endpoint=True)
+    return [f * 1e6 for f in freqs]
+
+
+def field_levels(levels, cw):
+    """
+    Field levels (V/m) tested at each frequency: `levels` in ascending order if set, otherwise just `cw`.
+    """
+    if levels:
+        return sorted(float(l) for l in levels)
+    return [cw]
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _str_list(value):
+    return isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value)
+
+
+def searchpath_list(searchpath):
+    """
+    Search path as list of directories, from a list or the text of a list, e.g. "['.', 'conf']".
+    """
+    if isinstance(searchpath, str):
+        try:
+            searchpath = ast.literal_eval(searchpath)
+        except (ValueError, SyntaxError):
+            raise ValueError(f"searchpath is not a list of directories: {searchpath!r}") from None
+    if not _str_list(searchpath):
+        raise ValueError(f"searchpath is not a list of directories: {searchpath!r}")
+    return list(searchpath)
+
+
+def _searchpath(value):
+    try:
+        searchpath_list(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _monitor_specs(value):
+    return isinstance(value, (list, tuple)) and all(isinstance(spec, dict) for spec in value)
+
+
+def _builtin_monitor_specs(value):
+    return _monitor_specs(value) and all(spec.get('type', 'dwell') in MONITOR_TYPES and 'command' not in spec
+                                         for spec in value)
+
+
+def _settling_times(value):
+    return isinstance(value, dict) and all(isinstance(k, str) and isinstance(v, (list, tuple)) and len(v) == 2
+                                           and _number(v[0]) and _number(v[1]) for k, v in value.items())
+
+
+SETUP_TYPES = {
+    'start_freq': ('a number (MHz)', _number),
+    'stop_freq': ('a number (MHz)', _number),
+    'step_freq': ('a number (MHz or %)', _number),
+    'log_sweep': ('true or false', lambda v: isinstance(v, bool)),
+    'cw': ('a number (V/m)', _number),
+    'levels': ('a list of numbers (V/m)', lambda v: isinstance(v, (list, tuple)) and all(_number(l) for l in v)),
+    'am': ('a number (%)', _number),
+    'dwell_time': ('a number (s)', _number),
+    'dotfile': ('a file name', lambda v: isinstance(v, str)),
+    'searchpath': ('a list of directories', _searchpath),
+    'names': ('a mapping of node names', lambda v: isinstance(v, dict) and all(
+        isinstance(k, str) and isinstance(n, str) for k, n in v.items())),
+    'eut_description': ('a text', lambda v: isinstance(v, str)),
+    'adjust_to_setting': (f"one of {', '.join(ADJUST_SETTINGS)}", lambda v: v in ADJUST_SETTINGS),
+    'eut_monitor_specs': (f"a list of monitor specs of type {', '.join(MONITOR_TYPES)}", _builtin_monitor_specs),
+    'concurrent_devices': ('true or false', lambda v: isinstance(v, bool)),
+    'shadow_state': ('true or false', lambda v: isinstance(v, bool)),
+    'band_order': ('true or false', lambda v: isinstance(v, bool)),
+    'read_tolerance': ('a number', _number),
+    'max_reads': ('an integer', lambda v: isinstance(v, int) and not isinstance(v, bool)),
+    'record_waveforms': ('true or false', lambda v: isinstance(v, bool)),
+    'waveform_captures': ('a positive integer (per dwell)', _count),
+    'waveform_samples': ('a positive integer', _count),
+    'uniformity_probes': ('a list of node names', _str_list),
+    'settling_times': ('a mapping of settling times', _settling_times),
+}
+
+
+# local configuration (`trusted`): any monitor, see EUT.make_monitor
+TRUSTED_TYPES = {'eut_monitor_specs': ('a list of monitor specs', _monitor_specs)}
+
+
+def check_setup(setup, keys=None, trusted=False):
+    """
+    Raises KeyError for keys not in `keys` (default: all of SETUP_TYPES) and TypeError for values
+    of the wrong type. Only a `trusted` setup (local configuration) may hold any EUT monitor.
+    """
+    keys = SETUP_TYPES if keys is None else keys
+    unknown = set(setup) - set(keys)
+    if unknown:
+        raise KeyError(f"unknown setup keys: {', '.join(sorted(unknown))}")
+    for key, value in setup.items():
+        expected, check = (TRUSTED_TYPES if trusted and key in TRUSTED_TYPES else SETUP_TYPES)[key]
+        if not check(value):
+            raise TypeError(f"setup key {key!r} must be {expected}, not {value!r}")
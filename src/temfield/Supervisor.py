@@ -0,0 +1,194 @@
+"""
+Supervisor for several (G)TEM cells on one host.
+
+    temfield-supervisor cells.json
+
+    {"store": "runs", "results_db": "results.sqlite",
+     "cells": [{"name": "GTEM 1", "setup": {"dotfile": "conf/gtem1.dot", "cw": 10, ...}, "metrics_port": 9465},
+               {"name": "GTEM 2", "setup": {"dotfile": "conf/gtem2.dot", "cw": 10, ...}}]}
+
+Each cell runs in its own process (see Engine.run_cell) with its own graph and device session, so a
+hanging instrument or a crash in one cell does not affect the others. The supervisor window is a plain
+Qt widget without plots; all results go to the common run store (see RunStore.py) and, with "results_db", to the results index
+(see ResultsDB.py).
+Setup keys are those of Setup.SETUP_TYPES and are checked on start-up; missing keys take the defaults of
+Setup.DEFAULT_SETUP. A cell with "metrics_port" serves its metrics (see Metrics.py) on that port.
+On close, running cells are stopped; a cell that has not released its devices after `close_timeout`
+seconds is terminated.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import (QApplication, QGroupBox, QHBoxLayout, QLabel, QPlainTextEdit,
+                               QProgressBar, QPushButton, QVBoxLayout, QWidget)
+
+from .Engine import run_cell
+from .Setup import check_setup
+
+
+class CellPanel(QGroupBox):
+    def __init__(self, name, parent=None):
+        super().__init__(name, parent)
+        self.state_label = QLabel('idle')
+        self.run_label = QLabel('')
+        self.row_label = QLabel('')
+        self.progress = QProgressBar()
+        self.start_button = QPushButton('Start')
+        self.pause_button = QPushButton('Pause')
+        self.pause_button.setCheckable(True)
+        self.stop_button = QPushButton('Stop')
+        self.log = QPlainTextEdit()
+        self.log.setReadOnly(True)
+        self.log.setMaximumBlockCount(1000)
+        buttons = QHBoxLayout()
+        for button in (self.start_button, self.pause_button, self.stop_button):
+            buttons.addWidget(button)
+        layout = QVBoxLayout(self)
+        for widget in (self.state_label, self.run_label, self.progress, self.row_label):
+            layout.addWidget(widget)
+        layout.addLayout(buttons)
+        layout.addWidget(self.log)
+        self.set_running(False)
+
+    def set_running(self, running):
+        self.start_button.setEnabled(not running)
+        self.pause_button.setEnabled(running)
+        self.stop_button.setEnabled(running)
+        if not running:
+            self.pause_button.setChecked(False)
+
+
+class Supervisor(QWidget):
+    close_timeout = 30.0   # s for the cells to finish the dwell and release the devices
+
+    def __init__(self, cells, store_root, results_db=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('TEMField Supervisor')
+        self.cells = {cell['name']: cell.get('setup', {}) for cell in cells}
+        for name, setup in self.cells.items():
+            try:
+                check_setup(setup, trusted=True)   # the local cell file
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"cell '{name}': {e}") from None
+        self.metrics_ports = {cell['name']: cell.get('metrics_port') for cell in cells}
+        self.store_root = store_root
+        self.results_db = results_db
+        self.ctx = multiprocessing.get_context('spawn')
+        self.events = self.ctx.Queue()
+        self.processes = {}
+        self.stop_events = {}
+        self.pause_events = {}
+        self.panels = {}
+        layout = QHBoxLayout(self)
+        for name in self.cells:
+            panel = CellPanel(name)
+            panel.start_button.clicked.connect(lambda checked=False, n=name: self.start_cell(n))
+            panel.pause_button.toggled.connect(lambda checked, n=name: self.pause_cell(n, checked))
+            panel.stop_button.clicked.connect(lambda checked=False, n=name: self.stop_cell(n))
+            layout.addWidget(panel)
+            self.panels[name] = panel
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll_events)
+        self.timer.start(100)
+
+    def start_cell(self, name):
+        if name in self.processes and self.processes[name].is_alive():
+            return
+        self.stop_events[name] = self.ctx.Event()
+        self.pause_events[name] = self.ctx.Event()
+        process = self.ctx.Process(target=run_cell, name=f"temfield-{name}",
+                                   args=(name, self.cells[name], self.store_root, self.events,
+                                         self.stop_events[name], self.pause_events[name], self.results_db,
+                                         self.metrics_ports[name]))
+        process.start()
+        self.processes[name] = process
+        panel = self.panels[name]
+        panel.progress.setValue(0)
+        panel.state_label.setText('starting')
+        panel.set_running(True)
+
+    def pause_cell(self, name, pause):
+        event = self.pause_events.get(name)
+        if event is None:
+            return
+        if pause:
+            event.set()
+        else:
+            event.clear()
+
+    def stop_cell(self, name):
+        event = self.stop_events.get(name)
+        if event is not None:
+            event.set()
+            self.pause_events[name].clear()
+
+    def poll_events(self):
+        while True:
+            try:
+                name, kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            panel = self.panels.get(name)
+            if panel is None:
+                continue
+            if kind == 'log':
+                panel.log.appendPlainText(payload)
+            elif kind == 'state':
+                panel.state_label.setText(payload)
+            elif kind == 'progress':
+                panel.progress.setValue(payload)
+            elif kind == 'row':
+                panel.row_label.setText(f"{payload[1]} MHz: |E| = {payload[5]} V/m, {payload[6]}")
+            elif kind == 'run':
+                panel.run_label.setText(payload)
+        for name, process in self.processes.items():
+            if not process.is_alive() and self.panels[name].stop_button.isEnabled():
+                process.join()
+                panel = self.panels[name]
+                panel.set_running(False)
+                if process.exitcode:
+                    panel.state_label.setText(f"failed (exit code {process.exitcode})")
+
+    def closeEvent(self, event):
+        for name in self.processes:
+            self.stop_cell(name)
+        deadline = time.monotonic() + self.close_timeout
+        for process in self.processes.values():
+            # a cell process only exits when its events have been read from the queue
+            while process.is_alive() and time.monotonic() < deadline:
+                self.poll_events()
+                process.join(0.1)
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.poll_events()
+        event.accept()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='temfield-supervisor', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('config', help='JSON file with the cells and their setups')
+    parser.add_argument('--store', default=None, help='run store directory (default: "store" of the config file)')
+    args, qt_args = parser.parse_known_args(argv)
+    with open(args.config) as f:
+        config = json.load(f)
+    store = args.store or os.path.join(os.path.dirname(os.path.abspath(args.config)), config.get('store', 'runs'))
+    results_db = config.get('results_db')
+    if results_db:
+        results_db = os.path.join(os.path.dirname(os.path.abspath(args.config)), results_db)
+    app = QApplication.instance() or QApplication(sys.argv[:1] + qt_args)
+    app.setApplicationName("TEMField Supervisor")
+    widget = Supervisor(config['cells'], store, results_db)
+    widget.show()
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,24 @@
 # This Python file uses the following encoding: utf-8
+import argparse
+import bisect
 import os.path
 import sys
 import csv
 import datetime
+import json
 import time
 
-import numpy as np
-
-from matplotlib.backends.backend_qtagg import (FigureCanvasQTAgg as FigureCanvas,
-                                               NavigationToolbar2QT as NavigationToolbar)
-from matplotlib.figure import Figure
-
-from PySide6.QtCore import Qt, QLocale, QSettings, QTimer, QThreadPool
+from PySide6.QtCore import Qt, QLocale, QSettings, QStandardPaths, QTimer, QThreadPool, Signal
+from PySide6.QtGui import QAction
 from PySide6.QtWidgets import (QApplication, QMainWindow, QMessageBox,
-                               QFileDialog, QTableWidgetItem, QVBoxLayout, QWidget)
+                               QFileDialog, QScrollArea, QTableWidgetItem, QVBoxLayout, QWidget)
 
-from .EUT import EUT_status, simple_eut_status
+from .EUT import EUT_status, close_monitors, monitor_eut, make_monitors, passed_texts
 
-from mpylab.tools.spacing import logspace, linspace
-from mpylab.tools.util import tstamp
-from mpylab.tools.sin_fit import fit_sin
-
-from .TestSusceptibility import TestSusceptibiliy
+# numpy, matplotlib, scuq, the mpylab measurement classes and the temfield modules not needed for
+# the empty main window are imported on first use to get it on the screen fast (see Benchmark.py)
+from .Setup import DEFAULT_SETUP, check_setup, field_levels, searchpath_list, sweep_frequencies
+from .Table import channel_columns, extra_columns, is_passed, row_texts, timestamp
 
 # Important:
 # You need to run the following command to generate the mainwindow.py file
@@ -29,11 +26,28 @@ from .TestSusceptibility import TestSusceptibiliy
 from .mainwindow import Ui_MainWindow
 
 
+def _settings_list(value):
+    """
+    A list read from QSettings: lists with one element come back as the element, empty lists as None.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
 class MainWindow(QMainWindow):
+    # emitted with the list of cell texts for every new row of the result table
+    row_added = Signal(list)
+    # emitted (from a worker thread) with the future of a finished report process
+    report_done = Signal(object)
+
     def __init__(self, settings, parent=None):
         super().__init__(parent)
         self.threadpool = QThreadPool()
-        self.eut_status = "Unknown"
+        self.eut_status = {}
+        self.eut_monitors = None
         self.eut_finished = False
         self.settings = settings
         self.ready_for_next_freq = True
@@ -41,6 +55,23 @@ class MainWindow(QMainWindow):
         self.ui.setupUi(self)
 
         self.table_is_unsaved = False
+        self.sweep_running = False
+        self.sweep_stopped = False   # Stop pressed: the sweep ends early and a test plan queue is aborted
+        self._busy_mark = None   # start of the sweep time not yet added to Metrics.SWEEP_BUSY
+        self._dwell_start = None
+        self.replay_trace = None   # (trace path, realtime): devices are replayed from a trace, see Trace.py
+        self.pause_processing = False
+        self.result_rows = []
+        self.row_keys = []   # (f, target) of the table rows, in table order
+        self.extra_columns = []
+        self.remaining_freqs = []
+        self.remaining_levels = []
+        self.current_level = None
+        self.previous_level = None   # level of the last leveling at the current frequency
+        self.row_extra = None
+        self.uniformity_data = []
+        self.plan_queue = None
+        self._journal = None
         self.disable_update = True
         self._read_setup()
         self.disable_update = False
@@ -59,6 +90,9 @@ class MainWindow(QMainWindow):
         self.ui.actionQuit.triggered.connect(MainWindow.close)
         # File Dialog
         self.ui.actionLoad_Graph.triggered.connect(self.load_graph)
+        self.actionRun_Test_Plan = QAction("Run Test Plan...", self)
+        self.actionRun_Test_Plan.triggered.connect(lambda: self.run_test_plan())
+        self.ui.menuFile.insertAction(self.ui.actionQuit, self.actionRun_Test_Plan)
 
         # cw field strength
         self.ui.cw_doubleSpinBox.valueChanged.connect(self.cw_doubleSpinBox_changed)
@@ -76,7 +110,72 @@ class MainWindow(QMainWindow):
         self.ui.EUT_plainTextEdit.textChanged.connect(self.EUT_plainTextEdit_changed)
         self.ui.save_table_pushButton.clicked.connect(self.save_Table)
         self.ui.clear_table_pushButton.clicked.connect(self.clear_Table)
-        # waveform
+        # waveform canvas is built when the waveform tab is shown for the first time
+        self.efield_canvas = None
+        self.ui.centralwidget_tabWidget.currentChanged.connect(self._tab_changed)
+        # results vs. frequency, same lazy canvas
+        self.results_scrollArea = QScrollArea()
+        self.results_scrollArea.setWidgetResizable(True)
+        self.ui.centralwidget_tabWidget.insertTab(
+            self.ui.centralwidget_tabWidget.indexOf(self.ui.waveform_tab) + 1, self.results_scrollArea, "Results")
+        self._results_plot = None
+        # optional waveform recording during the dwells, see Waveforms.py
+        self.waveform_recorder = None
+        self.waveform_path = None
+        self.uniformity_path = None
+        self.report_dir = None
+        self.results_path = None   # last result file written, indexed in the results database
+        self.report_pool = None
+        self.report_done.connect(self._report_done)
+        self._meas = None
+        self.ui.start_pause_pushButton.setDisabled(False)
+        self.ui.rf_pushButton.clicked.connect(self.toggle_rf)
+        self.rf_isON = False
+        self.ui.modulation_pushButton.clicked.connect(self.toggle_am)
+        self.am_isON = False
+        # reports stalls of the event loop (late Pause button) with the blocking code path, see Watchdog.py
+        self.watchdog = None
+        if self.watchdog_threshold > 0:
+            from .Watchdog import EventLoopWatchdog
+            self.watchdog = EventLoopWatchdog(self, threshold=self.watchdog_threshold)
+            self.watchdog.stalled.connect(self._event_loop_stalled)
+            self.watchdog.start()
+
+    @property
+    def meas(self):
+        if self._meas is None:
+            from .TestSusceptibility import TestSusceptibiliy
+            self._meas = TestSusceptibiliy()
+        return self._meas
+
+    @property
+    def journal(self):
+        if self._journal is None:
+            from .Checkpoint import SweepJournal
+            journal_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+            self._journal = SweepJournal(os.path.join(journal_dir, 'sweep-journal.jsonl'))
+        return self._journal
+
+    @property
+    def results_plot(self):
+        if self._results_plot is None:
+            from .ResultsPlot import ResultsPlot
+            self._results_plot = ResultsPlot(self.results_scrollArea)
+        return self._results_plot
+
+    def _tab_changed(self, index):
+        if self.efield_canvas is None and index == self.ui.centralwidget_tabWidget.indexOf(self.ui.waveform_tab):
+            self._setup_efield_canvas()
+        elif index == self.ui.centralwidget_tabWidget.indexOf(self.results_scrollArea):
+            self.results_plot.show()
+
+    def _setup_efield_canvas(self):
+        import numpy as np
+        from mpylab.tools.sin_fit import fit_sin
+        from matplotlib.backends.backend_qtagg import (FigureCanvasQTAgg as FigureCanvas,
+                                                       NavigationToolbar2QT as NavigationToolbar)
+        from matplotlib.figure import Figure
+
         self.efield_canvas = FigureCanvas(Figure(figsize=(5, 4)))
         self.efield_toolbar = NavigationToolbar(self.efield_canvas, self)
 
@@ -87,6 +186,9 @@ class MainWindow(QMainWindow):
         widget.setLayout(layout)
         self.ui.waveform_scrollArea.setWidget(widget)
         self._efield_ax = self.efield_canvas.figure.subplots()
+        # for _update_efield, which runs every 50 ms
+        self._np = np
+        self._fit_sin = fit_sin
         t = np.linspace(0, 10, 101)
         self.lineEx, = self._efield_ax.plot(t, np.sin(t + time.time()), marker=',', label='Ex')
         self.lineEy, = self._efield_ax.plot(t, np.sin(t + time.time()*2), marker=',', label='Ey')
@@ -102,38 +204,55 @@ class MainWindow(QMainWindow):
         self._timer.add_callback(self._update_efield)
         self._timer.start()
 
-        self.meas = TestSusceptibiliy()
-        self.ui.start_pause_pushButton.setDisabled(False)
-        self.ui.rf_pushButton.clicked.connect(self.toggle_rf)
-        self.rf_isON = False
-        self.ui.modulation_pushButton.clicked.connect(self.toggle_am)
-        self.am_isON = False
-
     def check_EUT(self):
+        self._dwell_start = time.perf_counter()
         self.eut_finished = False
-        self.eut_status = "Unknown"
-        self.eut_progress = 0
         self.ready_for_next_freq = False
-        worker = EUT_status(simple_eut_status, dw=self.dwell_time)
-        worker.signals.result.connect(self.EUT_result)
-        worker.signals.finished.connect(self.EUT_finished)
-        worker.signals.progress.connect(self.EUT_progress)
-        self.threadpool.start(worker)
+        if self.eut_monitors is None:
+            self.eut_monitors = make_monitors(self.eut_monitor_specs)
+            self.threadpool.setMaxThreadCount(max(self.threadpool.maxThreadCount(), len(self.eut_monitors) + 1))
+        self.eut_status = {m.name: "Unknown" for m in self.eut_monitors}
+        self.eut_progress = {m.name: 0 for m in self.eut_monitors}
+        self.eut_running = len(self.eut_monitors)
+        for monitor in self.eut_monitors:
+            worker = EUT_status(monitor_eut, monitor=monitor, dw=self.dwell_time)
+            worker.signals.result.connect(lambda result, name=monitor.name: self.EUT_result(name, result))
+            worker.signals.error.connect(lambda err, name=monitor.name: self.EUT_result(name, f"Error: {err[1]}"))
+            worker.signals.finished.connect(self.EUT_finished)
+            worker.signals.progress.connect(lambda progress, name=monitor.name: self.EUT_progress(name, progress))
+            self.threadpool.start(worker)
 
-    def EUT_result(self, result):
-        self.eut_status = result
-        #print("EUT result:", result)
+    def EUT_result(self, name, result):
+        self.eut_status[name] = result
+        #print("EUT result:", name, result)
 
-    def EUT_progress(self, progress):
-        self.eut_progress = min(100,progress)
-        self.ui.EUT_progressBar.setValue(self.eut_progress)
+    def EUT_progress(self, name, progress):
+        self.eut_progress[name] = min(100, progress)
+        self.ui.EUT_progressBar.setValue(min(self.eut_progress.values()))
 
     def EUT_finished(self):
-        self.eut_finished = True
+        # the dwell is over when all channels have a verdict
+        self.eut_running -= 1
+        if self.eut_running <= 0:
+            self.eut_finished = True
         #print("EUT finished")
 
+    def eut_channels(self):
+        if self.eut_monitors is None:
+            self.eut_monitors = make_monitors(self.eut_monitor_specs)
+        return [m.name for m in self.eut_monitors]
+
     def _update_efield(self):
-        err, t, ex, ey, ez = self.meas.get_waveform()
+        np = self._np
+        fit_sin = self._fit_sin
+        if self._meas is None:
+            err, t, ex, ey, ez = -1, None, None, None, None
+        elif self.waveform_recorder is not None and self.waveform_recorder.capturing:
+            # the probe is read by the capture thread, show its last waveform
+            latest = self.waveform_recorder.latest
+            err, t, ex, ey, ez = (-1, None, None, None, None) if latest is None else (0, *latest)
+        else:
+            err, t, ex, ey, ez = self.meas.get_waveform()
         # print(err)
         if err < 0:
             t = np.linspace(0, 10, 101)
@@ -179,80 +298,344 @@ class MainWindow(QMainWindow):
         self.ui.logtab_log_plainTextEdit.appendPlainText(longtext)
         self.ui.permanent_log_plainTextEdit.appendPlainText(short)
 
-    def do_fill_table(self, freq=None, cw=(None,None,None), status=None):
+    def do_fill_table(self, result, status=None, extra=None):
         self.table_is_unsaved = True
         table = self.ui.table_tableWidget
-        rowposition = table.rowCount()
+        rowposition = self._sorted_row_position(result.f, result.target)
         table.insertRow(rowposition)
-        val = QTableWidgetItem(self.get_time_as_string(format=''))
-        val.setFlags(val.flags() & ~Qt.ItemFlag.ItemIsEditable)
-        table.setItem(rowposition, 0, val)
-        val = QTableWidgetItem(str(freq*1e-6))
-        val.setFlags(val.flags() & ~Qt.ItemFlag.ItemIsEditable)
-        table.setItem(rowposition, 1, val)
-        magnitude = 0.0
-        for _r,_cw in enumerate(cw):
-            val = QTableWidgetItem(str(round(_cw,2)))
+        texts = row_texts(self.get_time_as_string(format=''), result, status, passed_texts(self.eut_monitors or ()))
+        for column, text in enumerate(texts[:6]):
+            val = QTableWidgetItem(text)
             val.setFlags(val.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            table.setItem(rowposition, 2+_r, val)
-            magnitude += _cw*_cw
-        magnitude = np.sqrt(magnitude)
-        val = QTableWidgetItem(str(round(magnitude, 2)))
-        val.setFlags(val.flags() & ~Qt.ItemFlag.ItemIsEditable)
-        table.setItem(rowposition, 5, val)
-        table.setItem(rowposition, 6, QTableWidgetItem(str(status)))
-        table.verticalScrollBar().setSliderPosition(table.verticalScrollBar().maximum())
+            table.setItem(rowposition, column, val)
+        overall = texts[6]
+        table.setItem(rowposition, 6, QTableWidgetItem(overall))
+        extra = dict(extra or {}, **{'Target [V/m]': result.target}, **channel_columns(status))
+        for _c, header in enumerate(self.extra_columns):
+            table.setItem(rowposition, 7+_c, QTableWidgetItem(str(extra.get(header))))
+        table.scrollToItem(table.item(rowposition, 0))
+        row = self.table_row(rowposition)
+        self.results_plot.add(result.f, result.ex, result.ey, result.ez, result.magnitude,
+                              failed=not is_passed(overall), level=self._row_level(row))
+        self.result_rows.append(row)
+        self.row_added.emit(row)
+
+    def table_header(self):
+        table = self.ui.table_tableWidget
+        return [table.horizontalHeaderItem(column).text() for column in range(table.columnCount())]
+
+    def table_row(self, row):
+        table = self.ui.table_tableWidget
+        items = (table.item(row, column) for column in range(table.columnCount()))
+        return [item.text() if item is not None else '' for item in items]
+
+    def table_rows(self):
+        return [self.table_row(row) for row in range(self.ui.table_tableWidget.rowCount())]
+
+    def _row_level(self, row):
+        """
+        Target level (V/m) of a table row of a multi-level test, None otherwise.
+        """
+        if 'Target [V/m]' in self.extra_columns:
+            try:
+                return float(row[7 + self.extra_columns.index('Target [V/m]')])
+            except (IndexError, ValueError):
+                pass
+        return None
+
+    def restore_table_row(self, row):
+        table = self.ui.table_tableWidget
+        rowposition = self._sorted_row_position(float(row[1]) * 1e6, self._row_level(row))
+        table.insertRow(rowposition)
+        for column, text in enumerate(row):
+            val = QTableWidgetItem(text)
+            val.setFlags(val.flags() & ~Qt.ItemFlag.ItemIsEditable)
+            table.setItem(rowposition, column, val)
+        self.result_rows.append(row)
+        self.table_is_unsaved = True
+
+    def _sorted_row_position(self, f, level):
+        """
+        Table position of a new row: the table (and the export) stays in frequency and level order,
+        whatever order the frequencies are measured in (see settings/band_order).
+        """
+        key = (f, level or 0.)
+        rowposition = bisect.bisect_right(self.row_keys, key)
+        self.row_keys.insert(rowposition, key)
+        return rowposition
+
+    def _setup_table_columns(self):
+        """
+        Adds a target field strength column for multi-level tests and
+        one status column per EUT channel if more than one monitor is configured.
+        """
+        table = self.ui.table_tableWidget
+        extra = extra_columns(len(self.field_levels()), self.eut_channels(), self.uniformity_probes)
+        self.extra_columns = extra
+        table.setColumnCount(7 + len(extra))
+        for _c, header in enumerate(extra):
+            table.setHorizontalHeaderItem(7+_c, QTableWidgetItem(header))
+
+    def field_levels(self):
+        """
+        Field levels (V/m) tested at each frequency: `levels` in ascending order if set, otherwise just `cw`.
+        """
+        return field_levels(self.levels, self.cw)
 
     def clear_Table(self):
         table = self.ui.table_tableWidget
         table.clearContents()
         table.setRowCount(0)
+        self.result_rows = []
+        self.row_keys = []
         self.table_is_unsaved = False
 
     def process_frequencies(self):
+        from . import Metrics
         if self.eut_finished:
-            self.do_fill_table(freq=self.current_f, cw=(_e.get_expectation_value_as_float() for _e in self.e_field), status=self.eut_status)
+            Metrics.PHASE_SECONDS.labels(phase='dwell').observe(time.perf_counter() - self._dwell_start)
+            with Metrics.PHASE_SECONDS.time(phase='table'):
+                self.do_fill_table(self.e_field, status=self.eut_status, extra=self.row_extra)
+                self.journal.add_row(self.current_f, self.result_rows[-1], done=not self.remaining_levels)
+            self._update_metrics()
+            if self.waveform_recorder is not None:
+                self.waveform_recorder.stop_capture()
             self.eut_finished = False
-            # process next freq
+            # process next level / freq
             self.ready_for_next_freq = True
             QTimer.singleShot(100, self.process_frequencies)
         elif self.pause_processing or not self.ready_for_next_freq:
             # stay responsive but don't proceed with next freq
             QTimer.singleShot(100, self.process_frequencies)
         elif self.ready_for_next_freq:
-            try:
+            if self.remaining_levels:
+                # next level at the same frequency
+                self.process_level(self.remaining_levels.pop(0))
+            elif self.remaining_freqs:
                 self.table_is_unsaved = True
                 self.current_f = f = self.remaining_freqs.pop(0)
                 Nf = len(self.freqs)
                 Nr = len(self.remaining_freqs)
                 self.ui.test_progressBar.setValue(int((Nf-Nr) / Nf * 100))
+                Metrics.SWEEP_PROGRESS.set((Nf-Nr-1) / Nf)
+                Metrics.FREQUENCIES.inc()
                 self.log(f"set freq to {f} MHz", short = f'Freq: {round(f*1e-6,2)} MHz')
-                self.meas.mg.SetFreq_Devices(f)
-                self.meas.mg.EvaluateConditions()
-                self.am_off()
-                self.rf_on()
-                self.log('adjust Level...')
-                self.e_field = self.meas.adjust_level()
-                self.log(f"E-Field: Ex = {self.e_field[0]}, Ey = {self.e_field[1]}, Ez = {self.e_field[2]},",
-                         short = f'Ex = {round(self.e_field[0].get_expectation_value_as_float(),2)} V/m, Ey = {round(self.e_field[1].get_expectation_value_as_float(),2)} V/m, Ez = {round(self.e_field[2].get_expectation_value_as_float(),2)} V/m')
-                self.am_on()
-                self.check_EUT()
-                #self.eut_timer = QTimer()
-                #self.eut_timer.setInterval(10)
-                #self.eut_timer.timeout.connect(self.check_EUT)
-                #self.eut_timer.start()
-                # process next freq
-                QTimer.singleShot(100, self.process_frequencies)
-            except IndexError:
+                with Metrics.PHASE_SECONDS.time(phase='set_freq'):
+                    self.meas.set_freq(f)
+                self.remaining_levels = self.field_levels()
+                self.previous_level = None
+                self.process_level(self.remaining_levels.pop(0))
+            else:
                 # all freqs processed
-                self.rf_off()
-                self.am_off()
-                self.meas.mg.CmdDevices(False, 'Standby')
-                self.meas.mg.Quit_Devices()
-                self.log("all frequencies processed")
-                self.ui.rf_pushButton.setChecked(False)
-                self.ui.start_pause_pushButton.setText("Start Test")
-                self.ready_for_next_freq = True
+                self.finish_sweep()
+
+    def process_level(self, level):
+        from . import Metrics
+        self.current_level = level
+        self.am_off()
+        self.rf_on()
+        leveling_start = time.perf_counter()
+        if self.previous_level is None:
+            self.log(f'adjust Level to {level} V/m...')
+            self.e_field = self.meas.adjust_level(level)
+        else:
+            # derive the drive level from the result at the previous (lower) level
+            self.log(f'scale Level from {self.previous_level} V/m to {level} V/m...')
+            self.e_field = self.meas.scale_level(level, self.meas.field_value(self.e_field))
+        Metrics.PHASE_SECONDS.labels(phase='leveling').observe(time.perf_counter() - leveling_start)
+        self.previous_level = level
+        self.log(f"E-Field: {self.e_field}", short=self.e_field.short())
+        if self.uniformity_probes:
+            with Metrics.PHASE_SECONDS.time(phase='uniformity'):
+                self.measure_uniformity()
+            self._update_metrics()
+            QTimer.singleShot(0, self.process_frequencies)
+            return
+        self.am_on()
+        self.check_EUT()
+        if self.waveform_recorder is not None:
+            self.waveform_recorder.begin(self.current_f, level)
+            self.waveform_recorder.start_capture(self.meas.get_waveform, self.waveform_interval)
+        #self.eut_timer = QTimer()
+        #self.eut_timer.setInterval(10)
+        #self.eut_timer.timeout.connect(self.check_EUT)
+        #self.eut_timer.start()
+        QTimer.singleShot(100, self.process_frequencies)
+
+    def measure_uniformity(self):
+        """
+        Uniformity mode: reads all probes of `uniformity_probes` concurrently instead of the EUT dwell.
+        The criteria are evaluated for this frequency right away (table status) and for the whole
+        frequency-by-point matrix at the end of the sweep.
+        """
+        import numpy as np
+        from .Uniformity import evaluate_uniformity
+
+        fields = self.meas.read_probes(self.uniformity_probes)
+        e = np.array([fields[node] for node in self.uniformity_probes])
+        missing = [node for p, node in enumerate(self.uniformity_probes) if np.isnan(e[p]).any()]
+        if missing:
+            self.log(f"no reading of {', '.join(missing)} at {self.current_f} Hz")
+        self.uniformity_data.append((self.current_f, self.current_level, e))
+        res = evaluate_uniformity(e[None])
+        self.row_extra = {f"|E| {node} [V/m]": round(float(np.linalg.norm(e[p])), 2)
+                          for p, node in enumerate(self.uniformity_probes)}
+        self.eut_status = {'Uniformity': 'Uniform' if res['uniform'][0] else
+                           f"Not uniform ({res['spread_db'][0]:.1f} dB)"}
+        self.eut_finished = True
+
+    def _finish_uniformity(self):
+        import numpy as np
+        from .Uniformity import evaluate_uniformity
+
+        if not self.uniformity_data:
+            return
+        data = sorted(self.uniformity_data, key=lambda d: (d[0], d[1]))
+        f = np.array([d[0] for d in data])
+        level = np.array([d[1] for d in data])
+        e = np.array([d[2] for d in data])
+        res = evaluate_uniformity(e)
+        path = os.path.join(self.table_save_dir,
+                            f"uniformity-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}.npz")
+        np.savez(path, f=f, level=level, e=e, probes=np.array(self.uniformity_probes), **res)
+        self.uniformity_path = path
+        n_ok = int(res['uniform'].sum())
+        self.log(f"uniformity: {n_ok} of {len(f)} frequencies uniform, "
+                 f"max spread {np.nanmax(res['spread_db']):.1f} dB; data saved to {path}")
+        self.uniformity_data = []
+
+    def _start_waveform_recording(self, n_records):
+        from .Waveforms import WaveformStore, WaveformRecorder
+        self.waveform_path = os.path.join(self.table_save_dir,
+                                          f"waveforms-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}.dat")
+        store = WaveformStore(self.waveform_path, n_records,
+                              captures=self.waveform_captures, samples=self.waveform_samples)
+        self.waveform_recorder = WaveformRecorder(store)
+        self.log(f"recording waveforms to {self.waveform_path}")
+
+    def _stop_waveform_recording(self):
+        if self.waveform_recorder is not None:
+            self.waveform_recorder.close()
+            self.waveform_recorder = None
+            self.log(f"waveforms saved to {self.waveform_path}")
+
+    def start_report(self, outdir=None, basename='report'):
+        """
+        Builds the test report from the current table in a separate process (see Report.py).
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from .Report import build_report
+
+        if outdir is None:
+            outdir = os.path.join(self.table_save_dir,
+                                  f"report-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}")
+        if self.report_pool is None:
+            self.report_pool = ProcessPoolExecutor(max_workers=1)
+        future = self.report_pool.submit(build_report, self.table_header(), self.table_rows(), self.setup_dict(),
+                                         self.eut_description, outdir, basename, tuple(self.report_formats))
+        future.add_done_callback(lambda fut: self.report_done.emit(fut))
+        self.report_dir = outdir
+        self.log(f"building report in {outdir}")
+
+    def _report_done(self, future):
+        try:
+            self.log(f"report written: {', '.join(future.result())}")
+        except Exception as e:
+            self.log(f"report failed: {e!r}")
+            return
+        if self.results_path:
+            # the table may have been saved before the report was done
+            self.index_results(self.results_path)
+
+    def index_results(self, path):
+        """
+        Registers the result file with setup, EUT and the waveform, uniformity and report files of the run
+        in the results database (see ResultsDB.py).
+        """
+        import sqlite3
+        from .ResultsDB import ResultsDB
+
+        if not self.results_db:
+            return
+        try:
+            db = ResultsDB(self.results_db)
+            try:
+                db.register(path, setup=self.setup_dict(), eut=self.eut_description, waveforms=self.waveform_path,
+                            uniformity=self.uniformity_path, report=self.report_dir)
+            finally:
+                db.close()
+        except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+            self.log(f"result file not indexed in {self.results_db}: {e!r}")
+
+    def finish_sweep(self):
+        from . import Metrics
+        self.journal.clear()
+        self._stop_waveform_recording()
+        close_monitors(self.eut_monitors)
+        self._finish_uniformity()
+        if self.auto_report and self.result_rows:
+            if self.plan_queue is not None:
+                plan = self.plan_queue.plans[self.plan_queue.current]
+                self.start_report(os.path.dirname(self.plan_queue.result_path(plan)), f"{plan['name']}-report")
+            else:
+                self.start_report()
+        if self.plan_queue is not None:
+            if self.sweep_stopped:
+                self.abort_plan()
+            elif self.finish_plan():
+                return
+        self.rf_off()
+        self.am_off()
+        self.meas.cmd_devices('Standby', active_only=False)
+        self.meas.mg.Quit_Devices()
+        if self.meas.settling is not None:
+            self.settling_times = self.meas.settling.to_setting()
+            self.settings.setValue("settings/settling_times", json.dumps(self.settling_times))
+            self.log(f"{len(self.settling_times)} learned settling times: "
+                     + ', '.join(f"{key} {t * 1e3:.0f} ms" for key, (t, n) in self.settling_times.items()))
+        trace = self.meas.close_trace()
+        if trace:
+            self.log(f"instrument traffic recorded to {trace}")
+        if self.meas.replay is not None and self.meas.replay.remaining():
+            self.log(f"calls of the trace not replayed: {self.meas.replay.remaining()}")
+        self._mark_busy()
+        self._busy_mark = None
+        Metrics.SWEEP_RUNNING.set(0)
+        Metrics.SWEEP_PROGRESS.set(1)
+        report = self.meas.latency_report()
+        if report:
+            self.log(f"device latencies:\n{report}")
+        self.log(f"{self.meas.suppressed} redundant device commands suppressed")
+        self.log("all frequencies processed")
+        self.ui.rf_pushButton.setChecked(False)
+        self.ui.start_pause_pushButton.setText("Start Test")
+        self.ready_for_next_freq = True
+        self.sweep_running = False
+
+    def _event_loop_stalled(self, duration, stack):
+        self.log(f"event loop stalled for {duration * 1e3:.0f} ms, {stack}",
+                 short=f"GUI stalled {duration:.1f} s")
+        recorder = getattr(self._meas, 'recorder', None)
+        if recorder is not None:
+            recorder.note('gui', 'stall', stack, time.perf_counter() - duration, duration)
+
+    def _mark_busy(self):
+        from . import Metrics
+        if self._busy_mark is not None:
+            now = time.perf_counter()
+            Metrics.SWEEP_BUSY.inc(now - self._busy_mark)
+            self._busy_mark = now
+
+    def _update_metrics(self):
+        """
+        Per result row: row count, EUT failures per channel and busy time.
+        """
+        from . import Metrics
+        if not self.uniformity_probes and isinstance(self.eut_status, dict):
+            Metrics.count_row(self.eut_status, passed_texts(self.eut_monitors or ()))
+        else:
+            Metrics.count_row({})
+        self._mark_busy()
 
     def toggle_rf(self):
         if self.rf_isON is False:
@@ -261,17 +644,21 @@ class MainWindow(QMainWindow):
             self.rf_off()
 
     def rf_on(self):
+        from . import Metrics
         status = self.meas.rf_on()
         if status is True:
             self.log("RF On")
             self.rf_isON = True
+            Metrics.RF_ON.set(1)
         self.ui.rf_pushButton.setChecked(self.rf_isON)
 
     def rf_off(self):
+        from . import Metrics
         status = self.meas.rf_off()
         if status is True:
             self.log("RF Off")
             self.rf_isON = False
+            Metrics.RF_ON.set(0)
         self.ui.rf_pushButton.setChecked(self.rf_isON)
 
     def toggle_am(self):
@@ -296,43 +683,238 @@ class MainWindow(QMainWindow):
 
     def start_pause_pushButton_clicked(self):
         if self.ui.start_pause_pushButton.text() == "Start Test":
-            if self.table_is_unsaved:
-                ret = QMessageBox.question(self, "Unsaved Table detected",
-                                              "Do you want to save the table?", QMessageBox.StandardButton.No,
-                                           QMessageBox.StandardButton.Yes)
-                if ret == QMessageBox.StandardButton.Yes:
-                    self.save_Table()
-
-            self.clear_Table()
-            self.ui.test_progressBar.setValue(0)
-            self.log("Start Test")
-            self.log(f"EUT description: {self.eut_description}")
-            self.pause_processing = False
-            self.ui.start_pause_pushButton.setText("Pause Test")
-            err = self.meas.Init(dwell_time=self.dwell_time,
-                    e_target=self.cw,
-                    names=self.names,
-                    dotfile=self.dotfile,
-                    SearchPath=eval(self.searchpath),
-                    adjust_to_setting=self.adjust_to_setting)
-            self.meas.init_measurement(self.am)
-            self.remaining_freqs = self.freqs.copy()
-            self.ui.rf_pushButton.setChecked(True)
-            self.process_frequencies()
+            self.start_test()
         elif self.ui.start_pause_pushButton.text() == "Pause Test":
-            self.rf_off()
-            self.log("Pause Test")
-            self.ui.start_pause_pushButton.setText("Cont. Test")
-            self.ui.rf_pushButton.setChecked(False)
-            self.pause_processing = True
+            self.pause_test()
         else:
+            self.continue_test()
+
+    def start_test(self, ask=True):
+        if self.table_is_unsaved and ask:
+            ret = QMessageBox.question(self, "Unsaved Table detected",
+                                          "Do you want to save the table?", QMessageBox.StandardButton.No,
+                                       QMessageBox.StandardButton.Yes)
+            if ret == QMessageBox.StandardButton.Yes:
+                self.save_Table()
+
+        self.log("Start Test")
+        self.init_devices()
+        self.start_sweep()
+
+    def _new_trace_path(self):
+        if not self.trace_dir:
+            return None
+        os.makedirs(self.trace_dir, exist_ok=True)
+        return os.path.join(self.trace_dir, f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.trace.gz")
+
+    def init_devices(self):
+        replay = None
+        if self.replay_trace is not None:
+            from .Trace import ReplayBackend
+            replay = ReplayBackend(*self.replay_trace)
+            self.log(f"replaying devices from {self.replay_trace[0]}")
+        err = self.meas.Init(dwell_time=self.dwell_time,
+                e_target=self.cw,
+                names=self.names,
+                dotfile=self.dotfile,
+                SearchPath=searchpath_list(self.searchpath),
+                adjust_to_setting=self.adjust_to_setting,
+                concurrent=self.concurrent_devices,
+                read_tolerance=self.read_tolerance,
+                max_reads=self.max_reads,
+                shadow_state=self.shadow_state,
+                trace_path=self._new_trace_path(),
+                replay=replay,
+                settling_times=self.settling_times if self.adaptive_settling else None)
+        self.meas.init_measurement(self.am)
+
+    def start_sweep(self, remaining_freqs=None, rows=()):
+        from . import Metrics
+        self.clear_Table()
+        close_monitors(self.eut_monitors)
+        self.eut_monitors = None
+        self._setup_table_columns()
+        self.results_plot.reset(min(self.freqs), max(self.freqs), len(self.freqs))
+        for f, row in rows:
+            self.restore_table_row(row)
+            self.results_plot.add(f, *(float(_v) for _v in row[2:6]), failed=not is_passed(row[6]),
+                                  level=self._row_level(row))
+        self.ui.test_progressBar.setValue(0)
+        self.log(f"EUT description: {self.eut_description}")
+        self.pause_processing = False
+        self.sweep_running = True
+        self.sweep_stopped = False
+        if self._busy_mark is None:
+            self._busy_mark = time.perf_counter()
+        Metrics.SWEEP_RUNNING.set(1)
+        Metrics.SWEEP_PROGRESS.set(0)
+        self.ui.start_pause_pushButton.setText("Pause Test")
+        self.remaining_freqs = self.freqs.copy() if remaining_freqs is None else list(remaining_freqs)
+        self.remaining_levels = []
+        self.uniformity_data = []
+        self.row_extra = None
+        self._stop_waveform_recording()
+        self.waveform_path = self.uniformity_path = self.report_dir = self.results_path = None
+        if self.record_waveforms:
+            self._start_waveform_recording(len(self.remaining_freqs) * len(self.field_levels()))
+        n_bands = self.meas.prepare_sweep(self.remaining_freqs)
+        if n_bands is not None:
+            self.log(f"{n_bands} graph condition intervals in the frequency plan")
+        if self.band_order:
+            # the table stays in frequency order, see do_fill_table
+            self.remaining_freqs, switches, ascending = self.meas.plan_order(self.remaining_freqs)
+            if switches is not None:
+                self.log(f"band ordered sweep: {switches} band switches, {ascending - switches} avoided")
+        if remaining_freqs is None:
+            extra = {}
+            if self.plan_queue is not None:
+                extra = {'plan_queue': self.plan_queue.path, 'plan': self.plan_queue.current}
+            self.journal.begin(self.setup_dict(), self.freqs, self.table_header(), extra)
+        self.ui.rf_pushButton.setChecked(True)
+        self.process_frequencies()
+
+    def offer_resume(self):
+        """
+        Offers to resume a sweep that has been interrupted (crash, reboot, ...), see Checkpoint.SweepJournal.
+        """
+        if self.sweep_running or not self.journal.exists():
+            return
+        try:
+            state = self.journal.load()
+        except (OSError, ValueError, KeyError) as e:
+            self.log(f"cannot read sweep journal {self.journal.path}: {e}")
+            return
+        ret = QMessageBox.question(self, "Interrupted Test detected",
+                                   f"A test has been interrupted with {len(state['remaining_freqs'])} of "
+                                   f"{len(state['freqs'])} frequencies remaining. Resume the test?",
+                                   QMessageBox.StandardButton.Yes, QMessageBox.StandardButton.No)
+        if ret == QMessageBox.StandardButton.Yes:
+            self.resume_sweep()
+        else:
+            self.journal.clear()
+
+    def resume_sweep(self):
+        from .TestPlan import TestPlanQueue
+        state = self.journal.resume()
+        self.apply_setup(state['setup'], trusted=True)
+        self.freqs = state['freqs']
+        plan_path = state['extra'].get('plan_queue')
+        if plan_path is not None:
+            self.plan_queue = TestPlanQueue(plan_path)
+            self.plan_queue.current = state['extra']['plan']
+        self.log(f"Resume Test at {state['remaining_freqs'][0] if state['remaining_freqs'] else '-'} Hz")
+        self.init_devices()
+        self.start_sweep(remaining_freqs=state['remaining_freqs'], rows=state['rows'])
+
+    def run_test_plan(self, path=None, ask=True):
+        """
+        Runs all plans of a test plan file (see TestPlan.TestPlanQueue) on one device session.
+        """
+        from .TestPlan import TestPlanQueue
+        if path is None:
+            path, _ = QFileDialog.getOpenFileName(self, "Open Test Plan", self.table_save_dir, "test plans (*.json)")
+            if not path:
+                return
+        queue = TestPlanQueue(path)
+        if queue.started and not queue.finished and ask:
+            ret = QMessageBox.question(self, "Interrupted Test Plan",
+                                       f"{len(queue.done)} of {len(queue)} plans are done. Resume the test plan?",
+                                       QMessageBox.StandardButton.Yes, QMessageBox.StandardButton.No)
+            if ret != QMessageBox.StandardButton.Yes:
+                queue.reset()
+        elif queue.finished:
+            queue.reset()
+        self.plan_queue = queue
+        self.log(f"Start Test Plan {path}")
+        plan = queue.next_plan()
+        self.apply_setup(plan['setup'])
+        self.init_devices()
+        self.start_plan(plan)
+
+    def start_plan(self, plan):
+        self.apply_setup(plan['setup'])
+        # learned settling times are kept unless the plan sets its own
+        settling_times = plan['setup'].get('settling_times') if self.adaptive_settling else None
+        self.meas.configure(dwell_time=self.dwell_time, e_target=self.cw, am=self.am,
+                            adjust_to_setting=self.adjust_to_setting,
+                            read_tolerance=self.read_tolerance,
+                            max_reads=self.max_reads,
+                            shadow_state=self.shadow_state,
+                            concurrent=self.concurrent_devices,
+                            settling_times=settling_times)
+        self.log(f"Test Plan '{plan['name']}' ({self.plan_queue.current + 1}/{len(self.plan_queue)})")
+        if plan.get('prompt'):
+            self.rf_off()
+            QMessageBox.information(self, f"Test Plan '{plan['name']}'", plan['prompt'])
             self.rf_on()
-            self.log("Continue Test")
+        self.start_sweep()
+
+    def finish_plan(self):
+        """
+        Saves the result of the current plan and starts the next one.
+        Returns False if the queue is done, i.e. the devices have to be released.
+        """
+        plan = self.plan_queue.plans[self.plan_queue.current]
+        path = self.plan_queue.result_path(plan)
+        self.write_table(path)
+        self.plan_queue.mark_done()
+        self.log(f"Test Plan '{plan['name']}' saved to {path}")
+        plan = self.plan_queue.next_plan()
+        if plan is None:
+            self.log("all test plans processed")
+            self.plan_queue = None
+            return False
+        QTimer.singleShot(0, lambda: self.start_plan(plan))
+        return True
+
+    def abort_plan(self):
+        """
+        Ends the queue after Stop. The current plan is not marked done, so the queue resumes with it
+        when the plan file is loaded again.
+        """
+        plan = self.plan_queue.plans[self.plan_queue.current]
+        self.log(f"Test Plan '{plan['name']}' stopped, {len(self.plan_queue.done)} of {len(self.plan_queue)} "
+                 f"plans done; load the test plan again to resume")
+        self.plan_queue = None
+
+    def pause_test(self):
+        if not self.sweep_running or self.pause_processing:
+            return
+        self._mark_busy()
+        self._busy_mark = None
+        self.rf_off()
+        self.log("Pause Test")
+        self.ui.start_pause_pushButton.setText("Cont. Test")
+        self.ui.rf_pushButton.setChecked(False)
+        self.pause_processing = True
+
+    def continue_test(self):
+        if not self.sweep_running or not self.pause_processing:
+            return
+        # the instruments may have been operated manually during the pause
+        self.meas.resync()
+        self._busy_mark = time.perf_counter()
+        self.rf_on()
+        self.log("Continue Test")
+        self.ui.start_pause_pushButton.setText("Pause Test")
+        self.ui.rf_pushButton.setChecked(True)
+        self.pause_processing = False
+
+    def stop_test(self):
+        """
+        Skips all remaining frequencies. The running dwell is completed, then the sweep is finished as usual;
+        a test plan queue is aborted, with the current plan left to be resumed.
+        """
+        if not self.sweep_running:
+            return
+        self.log("Stop Test")
+        self.sweep_stopped = True
+        self.remaining_freqs = []
+        self.remaining_levels = []
+        if self.pause_processing:
             self.ui.start_pause_pushButton.setText("Pause Test")
-            self.ui.rf_pushButton.setChecked(True)
             self.pause_processing = False
 
-
     def node_names_table_cellChanged(self):
         names = {'sg': None, 'a1': None, 'a2': None, 'tem': None, 'fp': None}
         for row,key in enumerate(['sg', 'a1', 'a2', 'tem', 'fp']):
@@ -375,7 +957,13 @@ class MainWindow(QMainWindow):
                 if ret == QMessageBox.StandardButton.Yes:
                     self.save_Table()
             self._save_setup()
-            self.meas.quit_measurement()
+            if self.watchdog is not None:
+                self.watchdog.stop()
+            close_monitors(self.eut_monitors)
+            if self._meas is not None:
+                self.meas.quit_measurement()
+            if self.report_pool is not None:
+                self.report_pool.shutdown(wait=True)
             self.log("Exit Application")
             event.accept()
         else:
@@ -384,23 +972,60 @@ class MainWindow(QMainWindow):
 
     def _read_setup(self):
         self.log("read setup")
-        self.start_freq = float(self.settings.value("frequencies/start_freq", 30.))
-        self.stop_freq = float(self.settings.value("frequencies/stop_freq", 1000.))
-        self.step_freq = float(self.settings.value("frequencies/step_freq", 1.))
-        self.log_sweep = (True if self.settings.value("frequencies/log_sweep", True) in (True, 'true', 'True') else False)
-        self.cw = float(self.settings.value("fieldstrength/cw", 1.))
-        self.am = float(self.settings.value("fieldstrength/am", 80.))
-        self.dwell_time = float(self.settings.value("settings/dwell_time", 1.))
-        self.dotfile = self.settings.value("settings/dotfile", os.path.abspath('./conf/gtem.dot'))
+        self.start_freq = float(self.settings.value("frequencies/start_freq", DEFAULT_SETUP['start_freq']))
+        self.stop_freq = float(self.settings.value("frequencies/stop_freq", DEFAULT_SETUP['stop_freq']))
+        self.step_freq = float(self.settings.value("frequencies/step_freq", DEFAULT_SETUP['step_freq']))
+        self.log_sweep = (True if self.settings.value("frequencies/log_sweep", DEFAULT_SETUP['log_sweep']) in (True, 'true', 'True') else False)
+        self.cw = float(self.settings.value("fieldstrength/cw", DEFAULT_SETUP['cw']))
+        self.am = float(self.settings.value("fieldstrength/am", DEFAULT_SETUP['am']))
+        self.levels = []   # multi-level test if set
+        for level in _settings_list(self.settings.value("fieldstrength/levels", [])):
+            try:
+                self.levels.append(float(level))
+            except (TypeError, ValueError):
+                self.log(f"ignoring field level {level!r} of the settings")
+        self.dwell_time = float(self.settings.value("settings/dwell_time", DEFAULT_SETUP['dwell_time']))
+        self.dotfile = self.settings.value("settings/dotfile", os.path.abspath(DEFAULT_SETUP['dotfile']))
         self.searchpath = self.settings.value("settings/searchpath", str(['.', os.path.abspath('./conf')]))
-        self.names = self.settings.value("settings/names", {'sg': 'sg', 'a1': 'amp1', 'a2': 'amp2',
-                                                            'tem': 'gtem', 'fp': 'prb'})
-        self.eut_description = self.settings.value("settings/eut-description", '')
+        self.names = self.settings.value("settings/names", dict(DEFAULT_SETUP['names']))
+        self.eut_description = self.settings.value("settings/eut-description", DEFAULT_SETUP['eut_description'])
         self.table_save_dir = self.settings.value("settings/table-save-dir", '.')
         self.table_save_dir = os.path.abspath(self.table_save_dir)
-        self.adjust_to_setting = self.settings.value("settings/adjust_to_setting", 'auto')   # 'x', 'y', 'z', 'mag', 'largest', 'auto'
+        self.adjust_to_setting = self.settings.value("settings/adjust_to_setting", DEFAULT_SETUP['adjust_to_setting'])   # 'x', 'y', 'z', 'mag', 'largest', 'auto'
+        self.read_tolerance = float(self.settings.value("settings/read_tolerance", DEFAULT_SETUP['read_tolerance']))   # relative
+        self.max_reads = int(self.settings.value("settings/max_reads", DEFAULT_SETUP['max_reads']))   # 1: single probe read after leveling
+        self.record_waveforms = self.settings.value("settings/record_waveforms", False) in (True, 'true', 'True')
+        self.waveform_captures = int(self.settings.value("settings/waveform_captures", 8))   # per dwell
+        self.waveform_samples = int(self.settings.value("settings/waveform_samples", 1024))
+        self.waveform_interval = float(self.settings.value("settings/waveform_interval", 0.2))   # s
+        self.auto_report = self.settings.value("settings/auto_report", True) in (True, 'true', 'True')
+        self.report_formats = self.settings.value("settings/report_formats", ['html', 'pdf', 'png'])
+        if isinstance(self.report_formats, str):
+            self.report_formats = [self.report_formats]
+        self.uniformity_probes = self.settings.value("settings/uniformity_probes", [])   # probe nodes, uniformity mode if set
+        if isinstance(self.uniformity_probes, str):
+            self.uniformity_probes = [self.uniformity_probes]
+        self.concurrent_devices = self.settings.value("settings/concurrent_devices", DEFAULT_SETUP['concurrent_devices']) in (True, 'true', 'True')
+        self.shadow_state = self.settings.value("settings/shadow_state", DEFAULT_SETUP['shadow_state']) in (True, 'true', 'True')
+        self.band_order = self.settings.value("settings/band_order", DEFAULT_SETUP['band_order']) in (True, 'true', 'True')
+        self.watchdog_threshold = float(self.settings.value("settings/watchdog_threshold", 0.2))   # s, 0: off
+        self.adaptive_settling = self.settings.value("settings/adaptive_settling", True) in (True, 'true', 'True')
+        try:
+            self.settling_times = json.loads(self.settings.value("settings/settling_times", '{}'))   # see Settling.py
+        except (TypeError, ValueError):
+            self.settling_times = {}
+        self.trace_dir = self.settings.value("settings/trace_dir", '')   # record the instrument traffic if set
+        self.results_db = self.settings.value("settings/results_db", os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation),
+            'results.sqlite'))   # index of all saved result files, '' disables it
+        self.eut_monitor_specs = self.settings.value("settings/eut_monitors", list(DEFAULT_SETUP['eut_monitor_specs']))   # see EUT.make_monitors
+        if isinstance(self.eut_monitor_specs, dict):
+            self.eut_monitor_specs = [self.eut_monitor_specs]
         # print("Init: ", self.log_sweep)
         # print(type(self.log_sweep), self.log_sweep)
+        self._show_setup()
+
+    def _show_setup(self):
         self.ui.log_sweep_checkBox.setChecked(self.log_sweep)
         self.ui.freq_start_doubleSpinBox.setValue(self.start_freq)
         self.ui.freq_stop_doubleSpinBox.setValue(self.stop_freq)
@@ -426,7 +1051,30 @@ class MainWindow(QMainWindow):
         elif self.adjust_to_setting == 'largest':
                 self.ui.radioButton_Largest_E.setChecked(True)
 
+    # setup attributes that can be changed without the GUI (automation API, test plans)
+    SETUP_KEYS = ('start_freq', 'stop_freq', 'step_freq', 'log_sweep', 'cw', 'levels', 'am', 'dwell_time',
+                  'dotfile', 'searchpath', 'names', 'eut_description', 'adjust_to_setting', 'eut_monitor_specs',
+                  'concurrent_devices', 'shadow_state', 'band_order', 'read_tolerance', 'max_reads',
+                  'record_waveforms', 'waveform_captures', 'waveform_samples', 'uniformity_probes', 'settling_times')
 
+    def setup_dict(self):
+        return {key: getattr(self, key) for key in self.SETUP_KEYS}
+
+    def apply_setup(self, setup, trusted=False):
+        """
+        Sets the given setup attributes (see SETUP_KEYS) and updates the GUI and the frequency list.
+        Unknown keys raise KeyError, values of the wrong type TypeError (see Setup.py).
+        `trusted` is for setups written by this application (sweep journal), which may hold any EUT monitor.
+        """
+        check_setup(setup, self.SETUP_KEYS, trusted)
+        for key, value in setup.items():
+            setattr(self, key, value)
+        if 'names' in setup:
+            self.names = dict(self.names)
+        self.disable_update = True
+        self._show_setup()
+        self.disable_update = False
+        self.update()
 
     def _save_setup(self):
         self.log("save setup")
@@ -436,6 +1084,7 @@ class MainWindow(QMainWindow):
         self.settings.setValue("frequencies/log_sweep", self.log_sweep)
         self.settings.setValue("fieldstrength/cw", self.cw)
         self.settings.setValue("fieldstrength/am", self.am)
+        self.settings.setValue("fieldstrength/levels", self.levels)
         self.settings.setValue("settings/dwell_time", self.dwell_time)
         self.settings.setValue("settings/searchpath", self.searchpath)
         self.settings.setValue("settings/dotfile", self.dotfile)
@@ -443,6 +1092,24 @@ class MainWindow(QMainWindow):
         self.settings.setValue("settings/eut-description", self.eut_description)
         self.settings.setValue("settings/table-save-dir", self.table_save_dir)
         self.settings.setValue("settings/adjust_to_setting", self.adjust_to_setting)
+        self.settings.setValue("settings/eut_monitors", self.eut_monitor_specs)
+        self.settings.setValue("settings/concurrent_devices", self.concurrent_devices)
+        self.settings.setValue("settings/shadow_state", self.shadow_state)
+        self.settings.setValue("settings/band_order", self.band_order)
+        self.settings.setValue("settings/watchdog_threshold", self.watchdog_threshold)
+        self.settings.setValue("settings/adaptive_settling", self.adaptive_settling)
+        self.settings.setValue("settings/settling_times", json.dumps(self.settling_times))
+        self.settings.setValue("settings/trace_dir", self.trace_dir)
+        self.settings.setValue("settings/results_db", self.results_db)
+        self.settings.setValue("settings/read_tolerance", self.read_tolerance)
+        self.settings.setValue("settings/uniformity_probes", self.uniformity_probes)
+        self.settings.setValue("settings/auto_report", self.auto_report)
+        self.settings.setValue("settings/report_formats", self.report_formats)
+        self.settings.setValue("settings/record_waveforms", self.record_waveforms)
+        self.settings.setValue("settings/waveform_captures", self.waveform_captures)
+        self.settings.setValue("settings/waveform_samples", self.waveform_samples)
+        self.settings.setValue("settings/waveform_interval", self.waveform_interval)
+        self.settings.setValue("settings/max_reads", self.max_reads)
         # print("Exit: ", self.log_sweep)
         self.settings.sync()
 
@@ -464,25 +1131,20 @@ class MainWindow(QMainWindow):
         self.start_freq = self.ui.freq_start_doubleSpinBox.value()
         self.stop_freq = self.ui.freq_stop_doubleSpinBox.value()
         self.step_freq = self.ui.freq_step_doubleSpinBox.value()
-        if not self.log_sweep:
-            self.freqs = linspace(self.start_freq, self.stop_freq, self.step_freq, endpoint=True)
-        else:
-            self.freqs = logspace(self.start_freq, self.stop_freq, 1+self.step_freq*0.01, endpoint=True)
-        self.freqs = [f*1e6 for f in self.freqs]  # convert to Hz
+        self.freqs = sweep_frequencies(self.start_freq, self.stop_freq, self.step_freq, self.log_sweep)   # Hz
         self.ui.nr_freqs_lineEdit.setText(str(len(self.freqs)))
         self.ui.freqs_plainTextEdit.setPlainText('\n'.join(map(str, self.freqs)))
 
         self.dwell_time = self.ui.dwell_time_doubleSpinBox.value()
-        time_s = (self.dwell_time + 0.9) * len(self.freqs)  # 0.9 s offset per freq
+        time_s = (self.dwell_time + 0.9) * len(self.freqs) * len(self.field_levels())  # 0.9 s offset per freq
         self.ui.est_time_lineEdit.setText(' '+str(datetime.timedelta(seconds=round(time_s,0)))+' (hh:mm:ss)')
 
     def get_time_as_string(self, format=None):
         if format is None:
+            from mpylab.tools.util import tstamp
             tstr = tstamp()   # default format from Mpy
         elif format == '':
-            format = "%Y-%m-%dT%H:%M:%S.%f%z"
-            tz = datetime.datetime.now(datetime.timezone.utc).astimezone().tzinfo
-            tstr = datetime.datetime.now(tz=tz).strftime(format)
+            tstr = timestamp()
         return tstr
 
     def save_Table(self):
@@ -491,29 +1153,40 @@ class MainWindow(QMainWindow):
                                               options=QFileDialog.Option.DontUseNativeDialog)
         self.table_save_dir = os.path.dirname(path)
         if path:
-            columns = range(self.ui.table_tableWidget.columnCount())
-            header = [self.ui.table_tableWidget.horizontalHeaderItem(column).text()
-                      for column in columns]
-            with open(path, 'w') as csvfile:
-                t = self.get_time_as_string(format='')
-                csvfile.write(f"# File saved: {t}\n#\n")
-                csvfile.write('# EUT Description\n')
-                plaintext_EUT = self.eut_description
-                for eut_line in plaintext_EUT.splitlines():
-                    csvfile.write(f"# {eut_line}\n")
-
-                writer = csv.writer(
-                    csvfile, dialect='excel', lineterminator='\n')
-                writer.writerow(header)
-                for row in range(self.ui.table_tableWidget.rowCount()):
-                    writer.writerow(
-                        self.ui.table_tableWidget.item(row, column).text()
-                        for column in columns)
-                self.table_is_unsaved = False
+            self.write_table(path)
+
+    def write_table(self, path):
+        with open(path, 'w') as csvfile:
+            t = self.get_time_as_string(format='')
+            csvfile.write(f"# File saved: {t}\n#\n")
+            csvfile.write('# EUT Description\n')
+            plaintext_EUT = self.eut_description
+            for eut_line in plaintext_EUT.splitlines():
+                csvfile.write(f"# {eut_line}\n")
+
+            writer = csv.writer(
+                csvfile, dialect='excel', lineterminator='\n')
+            writer.writerow(self.table_header())
+            writer.writerows(self.table_rows())
+            self.table_is_unsaved = False
+        self.results_path = path
+        self.index_results(path)
 
 def main():
+    parser = argparse.ArgumentParser(prog='temfield')
+    parser.add_argument('--api-port', type=int, default=None,
+                        help='serve the local automation API (JSON-RPC over HTTP) on this port; 0 disables it')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='serve live metrics (Prometheus text format) on this port; 0 disables it')
+    parser.add_argument('--replay', metavar='TRACE', default=None,
+                        help='replay the instruments from a recorded trace instead of creating the devices')
+    parser.add_argument('--replay-realtime', action='store_true',
+                        help='replay every call with its recorded latency')
+    parser.add_argument('--quit-after-show', action='store_true',
+                        help='quit as soon as the main window is shown (used by the startup benchmark)')
+    args, qt_args = parser.parse_known_args()
     if not QApplication.instance():
-        app = QApplication(sys.argv)
+        app = QApplication(sys.argv[:1] + qt_args)
     else:
         app = QApplication.instance()
     app.setOrganizationName("TUD-TETEMV")
@@ -524,8 +1197,27 @@ def main():
     QLocale.setDefault(QLocale.Language.English)
 
     widget = MainWindow(settings)
+    if args.replay:
+        widget.replay_trace = (args.replay, args.replay_realtime)
+    api_port = args.api_port if args.api_port is not None else int(settings.value("settings/api_port", 0))
+    if api_port:
+        from .Automation import AutomationServer
+        widget.automation = AutomationServer(widget, port=api_port)
+        widget.automation.start()
+        widget.log(f"automation API listening on {widget.automation.address}")
+    metrics_port = args.metrics_port if args.metrics_port is not None else int(settings.value("settings/metrics_port", 0))
+    if metrics_port:
+        from .Metrics import MetricsServer
+        widget.metrics_server = MetricsServer(metrics_port)
+        widget.metrics_server.start()
+        widget.log(f"metrics at {widget.metrics_server.address}")
     widget.show()
+    if args.quit_after_show:
+        # exit() instead of quit(): quit() closes the window, which asks for confirmation
+        QTimer.singleShot(0, lambda: app.exit(0))
+        sys.exit(app.exec())
+    QTimer.singleShot(0, widget.offer_resume)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,74 @@
+"""
+Format of the result table, shared by the GUI, the headless engine and the analysis tools.
+
+Kept free of Qt and NumPy, so that importing it costs nothing at start-up.
+"""
+import datetime
+
+BASE_HEADER = ['Time', 'Frequency [MHz]', 'CW Ex [V/m]', 'CW Ey [V/m]', 'CW Ez [V/m]', 'CW |E| [V/m]', 'Status']
+TARGET_COLUMN = 'Target [V/m]'
+
+# status texts of a passed point: EUT monitors ('Passed') and uniformity measurements ('Uniform')
+PASSED = ('Passed', 'Uniform')
+
+
+def is_passed(status, passed=None):
+    """
+    `passed`: the passed text of the monitor that reported `status`, if it has its own (EUT.EUTMonitor.passed).
+    """
+    return status in PASSED or (passed is not None and status == passed)
+
+
+def timestamp():
+    tz = datetime.datetime.now(datetime.timezone.utc).astimezone().tzinfo
+    return datetime.datetime.now(tz=tz).strftime("%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def extra_columns(n_levels, channels, probes=()):
+    """
+    Columns after BASE_HEADER: the target field strength for multi-level tests, |E| of every probe in
+    uniformity mode, otherwise one status column per EUT channel if there is more than one.
+    """
+    extra = []
+    if n_levels > 1:
+        extra.append(TARGET_COLUMN)
+    extra.extend(f"|E| {node} [V/m]" for node in probes)
+    if len(channels) > 1 and not probes:
+        extra.extend(f"Status {name}" for name in channels)
+    return extra
+
+
+def overall_status(status, passed=None):
+    """
+    Status column for the {channel: status} of the EUT monitors: the status of a single channel, otherwise
+    'Passed' or 'Failed (<failed channels>)'. Other statuses (e.g. of the uniformity mode) are kept.
+    `passed` holds the passed texts of the monitors, {channel: text}.
+    """
+    if not isinstance(status, dict):
+        return status
+    passed = passed or {}
+    failed = [name for name, st in status.items() if not is_passed(st, passed.get(name))]
+    if len(status) == 1:
+        st = next(iter(status.values()))
+        # the own passed text of a monitor is written as 'Passed', so the analysis tools recognise it
+        return st if failed or is_passed(st) else 'Passed'
+    if failed:
+        return f"Failed ({', '.join(failed)})"
+    return 'Passed'
+
+
+def channel_columns(status):
+    """
+    Values of the per channel status columns (see extra_columns).
+    """
+    if isinstance(status, dict) and len(status) > 1:
+        return {f"Status {name}": st for name, st in status.items()}
+    return {}
+
+
+def row_texts(time_text, result, status, passed=None):
+    """
+    Cell texts of the BASE_HEADER columns for a measured `result` (TestSusceptibility.FieldResult).
+    """
+    return ([time_text, str(result.f * 1e-6)] + [str(round(_cw, 2)) for _cw in result.components]
+            + [str(round(result.magnitude, 2)), str(overall_status(status, passed))])
@@ -0,0 +1,88 @@
+import json
+import os
+
+from .Setup import check_setup
+
+
+class TestPlanQueue:
+    """
+    Queue of test plans that run back-to-back on one device session.
+
+    The plan file is JSON:
+
+        {"plans": [
+            {"name": "3Vm_front", "setup": {"cw": 3, "am": 80}, "result_file": "3Vm_front.csv"},
+            {"name": "3Vm_side", "prompt": "Rotate the EUT by 90 deg and press OK", "setup": {"cw": 3}}
+        ]}
+
+    `setup` holds MainWindow setup keys (see MainWindow.SETUP_KEYS) except the graph related ones,
+    because all plans share the devices created for the first plan; the setups are checked when the file is
+    loaded (see Setup.check_setup: e.g. no subprocess or plugin EUT monitors). `prompt` (optional) is shown to the
+    operator with RF off before the plan starts. `result_file` defaults to '<name>.csv' next to the plan file.
+
+    The progress is kept in '<planfile>.state' so that an interrupted queue can be resumed with the
+    first plan that has not been completed.
+    """
+    GRAPH_KEYS = ('dotfile', 'searchpath', 'names')
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.state_path = self.path + '.state'
+        with open(self.path) as f:
+            self.plans = json.load(f)['plans']
+        for i, plan in enumerate(self.plans):
+            plan.setdefault('name', f"plan{i + 1}")
+            plan.setdefault('setup', {})
+            plan.setdefault('result_file', f"{plan['name']}.csv")
+            graph_keys = set(plan['setup']) & set(self.GRAPH_KEYS)
+            if graph_keys:
+                raise ValueError(f"plan '{plan['name']}' changes the graph ({', '.join(sorted(graph_keys))}); "
+                                 f"all plans of a queue share one device session")
+            try:
+                check_setup(plan['setup'])
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"plan '{plan['name']}': {e}") from None
+        self.done = []
+        self.current = None
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.done = json.load(f).get('done', [])
+
+    def __len__(self):
+        return len(self.plans)
+
+    @property
+    def started(self):
+        return len(self.done) > 0
+
+    @property
+    def finished(self):
+        return len(self.done) >= len(self.plans)
+
+    def reset(self):
+        self.done = []
+        self._write_state()
+
+    def next_plan(self):
+        """
+        Returns the next plan that has not been completed (and makes it the current one), or None.
+        """
+        for i, plan in enumerate(self.plans):
+            if i not in self.done:
+                self.current = i
+                return plan
+        self.current = None
+        return None
+
+    def result_path(self, plan):
+        return os.path.join(os.path.dirname(self.path), plan['result_file'])
+
+    def mark_done(self):
+        self.done.append(self.current)
+        self._write_state()
+
+    def _write_state(self):
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'done': self.done}, f)
+        os.replace(tmp, self.state_path)
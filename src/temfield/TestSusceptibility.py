@@ -1,12 +1,66 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
-from scuq import si,quantities
+from scuq import si,quantities,ucomponents
 from mpylab.tools import util, mgraph
 from mpylab.env.univers.AmplifierTest import dBm2W
 from mpylab.env.Measure import Measure
 
+from .Bands import BandIndex, band_order
+from .Dispatch import DeviceDispatcher, capability_index, graph_devices
+from . import Metrics
+from .Trace import TraceRecorder
+from .Settling import SettlingTimes
+
+def _uncertainty_as_float(q):
+    try:
+        return ucomponents.Context().uncertainty(q).get_expectation_value_as_float()
+    except (AttributeError, TypeError, ValueError):
+        return float('nan')
+
+
+class FieldResult:
+    """
+    Field at one frequency as plain floats (V/m), converted once from the scuq quantities of a probe read.
+    """
+    __slots__ = ('f', 'ex', 'ey', 'ez', 'uex', 'uey', 'uez', 'target', 'n_reads')
+
+    def __init__(self, f, ex, ey, ez, uex=float('nan'), uey=float('nan'), uez=float('nan'), target=None, n_reads=1):
+        self.f = f
+        self.ex = ex
+        self.ey = ey
+        self.ez = ez
+        self.uex = uex
+        self.uey = uey
+        self.uez = uez
+        self.target = target
+        self.n_reads = n_reads
+
+    @classmethod
+    def from_quantities(cls, f, res, target=None):
+        ex, ey, ez = (_e.get_expectation_value_as_float() for _e in res)
+        uex, uey, uez = (_uncertainty_as_float(_e) for _e in res)
+        return cls(f, ex, ey, ez, uex, uey, uez, target)
+
+    @property
+    def components(self):
+        return self.ex, self.ey, self.ez
+
+    @property
+    def magnitude(self):
+        return (self.ex * self.ex + self.ey * self.ey + self.ez * self.ez) ** 0.5
+
+    def short(self):
+        return f"Ex = {self.ex:.2f} V/m, Ey = {self.ey:.2f} V/m, Ez = {self.ez:.2f} V/m"
+
+    def __str__(self):
+        return (f"Ex = {self.ex} +- {self.uex}, Ey = {self.ey} +- {self.uey}, "
+                f"Ez = {self.ez} +- {self.uez} V/m ({self.n_reads} probe reads)")
+
+
 class TestSusceptibiliy(Measure):
     def __init__(self, parent=None):
         Measure.__init__(self, parent)
@@ -19,7 +73,14 @@ class TestSusceptibiliy(Measure):
              dotfile=None,
              SearchPath=None,
              leveler_par=None,
-             adjust_to_setting=None):
+             adjust_to_setting=None,
+             concurrent=False,
+             read_tolerance=None,
+             max_reads=None,
+             shadow_state=True,
+             trace_path=None,
+             replay=None,
+             settling_times=None):
         if names is None:
             self.names = {
                 'sg': 'sg',
@@ -37,6 +98,27 @@ class TestSusceptibiliy(Measure):
             self.adjust_to_setting = adjust_to_setting
 
         self.main_e_component = None
+        self.f = None
+        self.band_index = None
+        self.band = None
+        self.capabilities = {}
+        # last known state per device of the active graph nodes: {name: {'rf': bool, 'am': bool, 'freq': Hz, 'level': ...}}
+        self.shadow = {}
+        self.suppressed = 0
+        self._freq_range = None
+        # with shadow_state False every command is sent (e.g. instruments that are also operated manually)
+        self.shadow_state = shadow_state
+        # learned settling times {key: [s, n]} (see Settling.py); None: no settling after changes
+        self.settling = None if settling_times is None else SettlingTimes(settling_times)
+        # instrument traffic: record into `trace_path` and/or replace the devices by a Trace.ReplayBackend
+        self.trace_path = trace_path
+        self.replay = replay
+        self.close_trace()
+        # opt-in: send per-frequency commands to independent instruments in parallel (see Dispatch.py)
+        self.concurrent = concurrent
+        if getattr(self, 'dispatcher', None) is not None:
+            self.dispatcher.shutdown()
+        self.dispatcher = None
 
         def __datafunc(data):
             if self.adjust_to_setting == 'x':
@@ -66,6 +148,11 @@ class TestSusceptibiliy(Measure):
         else:
             self.pin = [quantities.Quantity(si.WATT, dBm2W(_dBm)) for _dBm in pin]
 
+        # probe reads after leveling: stop when the running mean of the datafunc component changes
+        # by less than read_tolerance (relative), but after max_reads reads at the latest
+        self.read_tolerance = 0.01 if read_tolerance is None else read_tolerance
+        self.max_reads = 1 if max_reads is None else max(1, int(max_reads))
+
         if dwell_time is None:
             self.dwell_time = 1
         else:
@@ -100,8 +187,51 @@ class TestSusceptibiliy(Measure):
         #self.ddict = self.mg.CreateDevices()
         return 0
 
+    def configure(self, dwell_time=None, e_target=None, am=None, adjust_to_setting=None, read_tolerance=None,
+                  max_reads=None, shadow_state=None, concurrent=None, settling_times=None):
+        """
+        Changes the test settings without re-creating the graph and the devices (arguments as for Init,
+        None keeps the setting).
+        """
+        if dwell_time is not None:
+            self.dwell_time = dwell_time
+        if e_target is not None:
+            self.e_target = quantities.Quantity(si.VOLT / si.METER, e_target)
+        if adjust_to_setting is not None:
+            self.adjust_to_setting = adjust_to_setting
+            self.main_e_component = None
+        if read_tolerance is not None:
+            self.read_tolerance = read_tolerance
+        if max_reads is not None:
+            self.max_reads = max(1, int(max_reads))
+        if shadow_state is not None and shadow_state != self.shadow_state:
+            self.shadow_state = shadow_state
+            self.invalidate()
+        if settling_times is not None:
+            self.settling = SettlingTimes(settling_times)
+        if concurrent is not None and concurrent != self.concurrent:
+            self.concurrent = concurrent
+            if self.dispatcher is not None:
+                self.dispatcher.shutdown()
+                self.dispatcher = None
+            if concurrent:
+                self.dispatcher = DeviceDispatcher.from_graph(self.mg, capabilities=self.capabilities)
+        if am is not None:
+            stat = self.cmd_devices('ConfAM', 'INT1',1e3,am*1e-2,'SINE','OFF')
+
     def init_measurement(self, am):
-        err = self.mg.CreateDevices()
+        if self.replay is not None:
+            self.replay.install(self.mg)
+        else:
+            err = self.mg.CreateDevices()
+        if self.trace_path:
+            self.recorder = TraceRecorder(self.trace_path)
+            self.recorder.attach(self.mg)
+        self.invalidate()
+        # which device implements which command; broadcast commands only go to these devices
+        self.capabilities = capability_index(graph_devices(self.mg))
+        if self.concurrent:
+            self.dispatcher = DeviceDispatcher.from_graph(self.mg, capabilities=self.capabilities)
         err = self.mg.Init_Devices()
         stat = self.mg.Zero_Devices()
         #stat = self.mg.CmdDevices(True, 'ConfAM', {'source': 'INT1',
@@ -109,12 +239,81 @@ class TestSusceptibiliy(Measure):
         #                                           'depth': am,
         #                                           'waveform': 'SINE',
         #                                           'LFOut': 'OFF'})
-        stat = self.mg.CmdDevices(True, 'ConfAM', 'INT1',1e3,am*1e-2,'SINE','OFF')
-        stat = self.mg.RFOn_Devices()
+        stat = self.cmd_devices('ConfAM', 'INT1',1e3,am*1e-2,'SINE','OFF')
+        self.rf_on(force=True)
+
+    def invalidate(self, key=None, cmd=None):
+        """
+        Forgets the shadow state (all keys or `key`, of all devices or the devices implementing `cmd`),
+        so the next command is sent in any case.
+        """
+        names = self.shadow.keys() if cmd is None else self.capabilities.get(cmd, ())
+        for name in list(names):
+            if key is None:
+                self.shadow.pop(name, None)
+            else:
+                self.shadow.get(name, {}).pop(key, None)
+
+    def active_devices(self, cmd):
+        """
+        Devices implementing `cmd` on the active nodes of the graph (mg.activenodes, as the *_Devices
+        methods of mgraph with IgnoreInactive=True).
+        """
+        names = self.capabilities.get(cmd, ())
+        active = getattr(self.mg, 'activenodes', None)
+        return list(names) if active is None else [name for name in names if name in active]
+
+    def _in_state(self, cmd, key, value):
+        names = self.active_devices(cmd)
+        return bool(names) and all(self.shadow.get(name, {}).get(key, None) == value for name in names)
+
+    def _suppress(self):
+        self.suppressed += 1
+        Metrics.SUPPRESSED_COMMANDS.inc()
+
+    def _shadowed(self, cmd, key, value, send, force=False):
+        """
+        Sends a state changing command only if the shadow state of the active devices implementing `cmd`
+        differs from `value` (or with `force`). Suppressed commands are counted in `suppressed`.
+        """
+        if not force and self.shadow_state and self._in_state(cmd, key, value):
+            self._suppress()
+            return 0
+        stat = send()
+        for name in self.active_devices(cmd):
+            state = self.shadow.setdefault(name, {})
+            if stat == 0:
+                state[key] = value
+            else:
+                state.pop(key, None)
+        return stat
 
-    def rf_on(self):
+    def resync(self):
+        """
+        Sends the last known RF, AM and frequency state again, e.g. after a pause where the instruments
+        may have been operated manually. The signal generator level is re-established by the next leveling.
+        """
+        rf = self._in_state('RFOn', 'rf', True)
+        am = self._in_state('AMOn', 'am', True)
+        self.invalidate()
+        if self.f is not None:
+            self.set_freq(self.f, force=True)
+        if am:
+            self.am_on(force=True)
+        else:
+            self.am_off(force=True)
+        if rf:
+            self.rf_on(force=True)
+        else:
+            self.rf_off()
+
+    def rf_on(self, force=False):
         try:
-            stat = self.mg.RFOn_Devices()
+            suppressed = self.suppressed
+            stat = self._shadowed('RFOn', 'rf', True,
+                                  lambda: self._command('RFOn') if self.dispatcher else self.mg.RFOn_Devices(), force)
+            if stat == 0 and self.suppressed == suppressed:
+                self.settle('rf', 'RFOn', time.perf_counter())
             if stat == 0:
                 return True
             else:
@@ -123,8 +322,11 @@ class TestSusceptibiliy(Measure):
             return False
 
     def rf_off(self):
+        # never suppressed: RF off is the pause and safety path
         try:
-            stat = self.mg.RFOff_Devices()
+            stat = self._shadowed('RFOff', 'rf', False,
+                                  lambda: self._command('RFOff') if self.dispatcher else self.mg.RFOff_Devices(),
+                                  force=True)
             if stat == 0:
                 return True
             else:
@@ -132,9 +334,9 @@ class TestSusceptibiliy(Measure):
         except AttributeError:
             return False
 
-    def am_on(self):
+    def am_on(self, force=False):
         try:
-            stat = self.mg.CmdDevices(True, 'AMOn')
+            stat = self._shadowed('AMOn', 'am', True, lambda: self.cmd_devices('AMOn'), force)
             if stat == 0:
                 return True
             else:
@@ -142,9 +344,9 @@ class TestSusceptibiliy(Measure):
         except AttributeError:
             return False
 
-    def am_off(self):
+    def am_off(self, force=False):
         try:
-            stat = self.mg.CmdDevices(True, 'AMOff')
+            stat = self._shadowed('AMOff', 'am', False, lambda: self.cmd_devices('AMOff'), force)
             if stat == 0:
                 return True
             else:
@@ -152,11 +354,203 @@ class TestSusceptibiliy(Measure):
         except AttributeError:
             return False
 
-    def adjust_level(self):
+    def cmd_devices(self, cmd, *args, active_only=True):
+        """
+        Sends `cmd` to the active devices that implement it (see `capabilities`) instead of broadcasting it
+        to all devices of the graph, like mg.CmdDevices(True, ...). With `active_only` False the command goes
+        to all devices implementing it, like mg.CmdDevices(False, ...), e.g. Standby at the end of a sweep.
+        Returns 0 on success, -1 if a device reported an error.
+        """
+        if self.dispatcher:
+            return self.dispatcher.status(self.dispatcher.dispatch(cmd, *args, active_only=active_only))
+        stat = 0
+        for name in self.active_devices(cmd) if active_only else list(self.capabilities.get(cmd, ())):
+            try:
+                res = getattr(self.mg.nodes[name]['inst'], cmd)(*args)
+            except AttributeError:
+                # as mg.CmdDevices: a driver failing inside the command does not stop the others
+                continue
+            err = res[0] if isinstance(res, tuple) else res
+            if isinstance(err, (int, float)) and err < 0:
+                stat = -1
+        return stat
+
+    def close_trace(self):
+        """
+        Closes the trace file of the recorder. Returns the trace path or None if nothing was recorded.
+        """
+        recorder = getattr(self, 'recorder', None)
+        self.recorder = None
+        if recorder is None:
+            return None
+        recorder.close()
+        return recorder.path
+
+    def _command(self, cmd, *args):
+        return self.dispatcher.status(self.dispatcher.dispatch(cmd, *args))
+
+    def latency_report(self):
+        return None if self.dispatcher is None else self.dispatcher.report()
+
+    def prepare_sweep(self, freqs):
+        """
+        Precomputes the graph conditions over the frequency plan (see Bands.BandIndex).
+        Returns the number of intervals or None if the conditions cannot be evaluated from the frequency alone.
+        """
+        try:
+            self.band_index = BandIndex.from_graph(freqs, self.mg)
+        except (SyntaxError, NameError, TypeError, ValueError):
+            self.band_index = None
+        self.band = None
+        return None if self.band_index is None else len(self.band_index)
+
+    def plan_order(self, freqs):
+        """
+        Orders the frequencies band by band (see Bands.band_order), starting with the band of the current
+        frequency. Needs `prepare_sweep` first. Returns (freqs, switches, ascending_switches), or the
+        unchanged plan with None counts if the graph conditions are not available.
+        """
+        if self.band_index is None:
+            return list(freqs), None, None
+        current = None if self.f is None else self.band_index.band_of(self.f)
+        return band_order(freqs, self.band_index, current)
+
+    def set_freq(self, f, force=False):
+        if not force and self.shadow_state and self._freq_range is not None and self._in_state('SetFreq', 'freq', f):
+            self._suppress()
+            return self._freq_range
+        # graph conditions first, so the frequency goes to the devices that are active at f
+        active = list(getattr(self.mg, 'activenodes', ()))
+        if self.band_index is None:
+            self.mg.EvaluateConditions(context={'f': f})
+        else:
+            band = self.band_index.lookup(f)
+            if band != self.band:
+                self.mg.EvaluateConditions(context={'f': f})
+                self.band = band
+        if list(getattr(self.mg, 'activenodes', ())) != active:
+            # band change: RF and frequency of the devices on the new path are unknown
+            self.invalidate('rf')
+            self.invalidate('freq')
+        if self.dispatcher:
+            fs = [res[1] for res in self.dispatcher.dispatch('SetFreq', f).values()
+                  if isinstance(res, tuple) and len(res) > 1]
+            minf, maxf = (min(fs), max(fs)) if fs else (f, f)
+        else:
+            minf, maxf = self.mg.SetFreq_Devices(f)
+        self.f = f
+        self._freq_range = minf, maxf
+        for name in self.active_devices('SetFreq'):
+            self.shadow.setdefault(name, {})['freq'] = f
+        if self._in_state('RFOn', 'rf', True):
+            self.settle('freq', 'SetFreq', time.perf_counter())
+        return minf, maxf
+
+    def settle(self, event, cmd, start):
+        """
+        Waits until the field has settled after `event` ('freq' or 'rf') at `start`, using the settling times
+        learned per device (all active devices implementing `cmd`) and band, see Settling.py.
+        """
+        if self.settling is None or self.f is None:
+            return
+        if self.band_index is None:
+            band = 'all'
+        else:
+            band = self.band_index.names[self.band_index.lookup(self.f)]
+        keys = [SettlingTimes.key(name, event, band) for name in self.active_devices(cmd)]
+        waited = self.settling.settle(keys, lambda: self.field_value(self.read_field(max_reads=1)), start)
+        Metrics.PHASE_SECONDS.labels(phase=f"settle_{event}").observe(waited)
+
+    def read_field(self, max_reads=None):
+        """
+        Reads the probe until the running mean of the `datafunc` component is stable within `read_tolerance`,
+        at most `max_reads` times. Returns the mean as FieldResult; `n_reads` holds the number of reads used.
+        """
+        if max_reads is None:
+            max_reads = self.max_reads
+        fp = self.mg.name.fp
+        target = self.e_target.get_expectation_value_as_float()
+        with Metrics.PROBE_READ_SECONDS.time():
+            res = self.mg.Read([fp])[fp]
+        if max_reads <= 1:
+            Metrics.PROBE_READS.observe(1)
+            return FieldResult.from_quantities(self.f, res, target)
+        sums = [_e.get_expectation_value_as_float() for _e in res]
+        n = 1
+        mean = self.datafunc(list(sums))
+        while n < max_reads:
+            with Metrics.PROBE_READ_SECONDS.time():
+                res = self.mg.Read([fp])[fp]
+            n += 1
+            sums = [_s + _e.get_expectation_value_as_float() for _s, _e in zip(sums, res)]
+            mean_prev, mean = mean, self.datafunc([_s / n for _s in sums])
+            if abs(mean - mean_prev) <= self.read_tolerance * abs(mean):
+                break
+        Metrics.PROBE_READS.observe(n)
+        last = FieldResult.from_quantities(self.f, res, target)
+        return FieldResult(self.f, *(_s / n for _s in sums), last.uex, last.uey, last.uez, target, n)
+
+    def adjust_level(self, e_target=None):
+        if e_target is not None:
+            self.e_target = quantities.Quantity(si.VOLT / si.METER, e_target)
+        Metrics.LEVELINGS.labels(mode='adjust').inc()
+        return self._level()
+
+    def _level(self):
         leveler = mgraph.Leveler(**self.leveler_par)
+        # the leveler sets the signal generator on its own
+        self.invalidate('level', 'SetLevel')
         leveler.adjust_level(self.e_target)
-        res = self.mg.Read([self.mg.name.fp])
-        return res[self.mg.name.fp]
+        return self.read_field()
+
+    def field_value(self, result):
+        """
+        Returns the field component of a FieldResult selected by `datafunc` as float (V/m).
+        """
+        return self.datafunc(list(result.components))
+
+    def scale_level(self, e_target, e_reached, tolerance=0.05):
+        """
+        Sets the signal generator for `e_target` (V/m) starting from the current level which gave `e_reached` (V/m).
+        The power is scaled by (e_target/e_reached)**2 and the result is verified with one probe read.
+        If the field is off by more than `tolerance` (relative), e.g. due to amplifier compression,
+        the full leveling is done instead.
+        """
+        sg = self.mg.nodes[self.mg.name.sg]['inst']
+        self.e_target = quantities.Quantity(si.VOLT / si.METER, e_target)
+        state = self.shadow.setdefault(self.mg.name.sg, {})
+        err, level = (0, state['level']) if self.shadow_state and 'level' in state else sg.GetLevel()
+        if err < 0 or not e_reached > 0:
+            return self.adjust_level()
+        new_level = level * (e_target / e_reached) ** 2
+        if self.shadow_state and new_level == level:
+            self._suppress()
+        else:
+            err, level = sg.SetLevel(new_level)
+        if err < 0:
+            state.pop('level', None)
+        else:
+            state['level'] = level
+        result = self.read_field(max_reads=1)
+        if err < 0 or abs(self.field_value(result) - e_target) > tolerance * e_target:
+            Metrics.LEVELINGS.labels(mode='scale_fallback').inc()
+            return self._level()
+        Metrics.LEVELINGS.labels(mode='scale').inc()
+        return result
+
+    def read_probes(self, nodes):
+        """
+        Reads several probe nodes concurrently (one thread per probe). Returns {node: (ex, ey, ez)} as floats;
+        NaN for a probe that mg.Read did not return (inactive node or failed read).
+        """
+        if getattr(self, '_probe_pool', None) is None or self._probe_pool_size < len(nodes):
+            self._probe_pool = ThreadPoolExecutor(max_workers=len(nodes), thread_name_prefix='temfield-probes')
+            self._probe_pool_size = len(nodes)
+        futures = {node: self._probe_pool.submit(self.mg.Read, [node]) for node in nodes}
+        missing = (float('nan'),) * 3
+        results = {node: future.result().get(node) for node, future in futures.items()}
+        return {node: missing if res is None else tuple(_e.get_expectation_value_as_float() for _e in res)
+                for node, res in results.items()}
 
     def get_waveform(self):
         try:
@@ -168,25 +562,29 @@ class TestSusceptibiliy(Measure):
             return -1, None, None, None, None
 
     def do_measurement(self, f):
-        minf, maxf = self.mg.SetFreq_Devices(f)
-        self.mg.EvaluateConditions()
+        minf, maxf = self.set_freq(f)
         res = self.adjust_level()
         # res = self.mg.Read([self.mg.name.fp])
-        print(f, res[self.mg.name.fp][0])
-        self.mg.CmdDevices(True, 'AMOn')
+        print(f, res.ex)
+        self.am_on()
         # wait delay seconds
         #self.messenger(util.tstamp() + " Going to sleep for %d seconds ..." % (self.dwell_time), [])
         self.wait(self.dwell_time, locals(), self.__HandleUserInterrupt)
         #self.messenger(util.tstamp() + " ... back.", [])
         # time.sleep(self.dwell_time)
-        self.mg.CmdDevices(True, 'AMOff')
+        self.am_off()
 
     def quit_measurement(self):
         try:
             stat = self.mg.RFOff_Devices()
             stat = self.mg.Quit_Devices()
+            self.invalidate()
         except AttributeError:
             pass
+        self.close_trace()
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown()
+            self.dispatcher = None
 
     def __HandleUserInterrupt(self, dct, ignorelist='', handler=None):
         if callable(handler):
@@ -206,7 +604,7 @@ class TestSusceptibiliy(Measure):
             names = self.names
             dwell_time = self.dwell_time
             self.messenger(util.tstamp() + " RF Off...", [])
-            stat = mg.RFOff_Devices()  # switch off after measure
+            self.rf_off()  # switch off after measure
             msg1 = """The measurement has been interrupted by the user.\nHow do you want to proceed?\n\nContinue: go ahead...\nSuspend: Quit devices, go ahead later after reinit...\nInteractive: Go to interactive mode...\nQuit: Quit measurement..."""
             but1 = ['Continue', 'Quit']
             answer = self.messenger(msg1, but1)
@@ -215,4 +613,4 @@ class TestSusceptibiliy(Measure):
                 self.messenger(util.tstamp() + " measurment terminated by user.", [])
                 raise UserWarning  # to reach finally statement
             self.messenger(util.tstamp() + " RF On...", [])
-            stat = mg.RFOn_Devices()  # switch on just before measure
+            self.rf_on(force=True)  # switch on just before measure
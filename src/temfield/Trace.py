@@ -0,0 +1,347 @@
+"""
+Recording and replay of the instrument traffic of a run.
+
+The recorder wraps the public methods of every driver instance in the graph (`mg.nodes[name]['inst']`).
+Since the wrappers are instance attributes, calls a driver makes on itself (e.g. `SetFreq` calling
+`query` of the SCPI driver) are recorded as well, with their nesting depth. Each call is stored with
+arguments, result, exception, start time and duration as one JSON line of a gzip compressed file. The
+stream is sync-flushed after every record, so the trace of a crashed run ends with the last completed call:
+
+    header   {'version': 2, 'created': ..., 'devices': {name: driver class}}
+    record   [seq, thread, depth, device, method, args, kwargs, result, error, t_start, duration]
+
+A trace is plain data, reading it never runs code. Tuples, dicts, complex numbers, bytes, NumPy values and
+exceptions are stored as tagged JSON objects (see `_encode`), anything else as its repr.
+
+The replay backend creates one stand-in device per recorded device. It answers the top level calls
+(depth 0) in the recorded order per device, optionally with the recorded latency, and raises
+ReplayMismatch if the code under test calls another method or passes other arguments (e.g. a different
+frequency plan). Inner calls are only informative.
+
+    python -m temfield.Trace summary run.trace.gz
+"""
+import argparse
+import base64
+import builtins
+import collections
+import gzip
+import itertools
+import json
+import sys
+import threading
+import time
+import zlib
+
+VERSION = 2
+
+
+class ReplayMismatch(RuntimeError):
+    pass
+
+
+class ReplayError(RuntimeError):
+    """
+    Replayed exception of a type that is not a builtin (the trace only holds its type name and arguments).
+    """
+
+
+class Repr(str):
+    """
+    A value that was recorded as its repr.
+    """
+    def __repr__(self):
+        return str(self)
+
+
+def _encode(value):
+    """
+    Converts a value into JSON data; types JSON cannot represent are tagged, unknown ones stored as repr.
+    """
+    if value is None or type(value) in (bool, int, float, str):
+        return value
+    if isinstance(value, Repr):
+        return {'__repr__': str(value)}
+    if type(value).__module__ == 'numpy':
+        if getattr(value, 'ndim', 0):
+            return {'__ndarray__': [str(value.dtype), _encode(value.tolist())]}
+        if hasattr(value, 'item'):
+            return _encode(value.item())
+    for base in (int, float, str):
+        if isinstance(value, base):
+            return base(value)    # e.g. an IntEnum as int
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(v) for v in value]}
+    if isinstance(value, dict):
+        return {'__dict__': [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, complex):
+        return {'__complex__': [value.real, value.imag]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, BaseException):
+        return {'__exception__': [type(value).__name__, _encode(value.args)]}
+    return {'__repr__': repr(value)}
+
+
+def _decode(data):
+    if isinstance(data, list):
+        return [_decode(v) for v in data]
+    if not isinstance(data, dict):
+        return data
+    (tag, value), = data.items()
+    if tag == '__tuple__':
+        return tuple(_decode(v) for v in value)
+    if tag == '__dict__':
+        return {_decode(k): _decode(v) for k, v in value}
+    if tag == '__complex__':
+        return complex(*value)
+    if tag == '__bytes__':
+        return base64.b64decode(value)
+    if tag == '__exception__':
+        name, args = value[0], _decode(value[1])
+        cls = getattr(builtins, name, None)
+        if isinstance(cls, type) and issubclass(cls, BaseException):
+            return cls(*args)
+        return ReplayError(f"{name}{args!r}")
+    if tag == '__ndarray__':
+        import numpy as np
+        return np.array(_decode(value[1]), dtype=value[0])
+    if tag == '__repr__':
+        return Repr(value)
+    raise ValueError(f"unknown tag {tag!r} in trace")
+
+
+def _dumps(record):
+    return (json.dumps([_encode(value) for value in record]) + '\n').encode('utf-8')
+
+
+def _loads(line):
+    return tuple(_decode(value) for value in json.loads(line))
+
+
+class TraceRecorder:
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'wb')
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._seq = itertools.count(1)
+        self._t0 = time.perf_counter()
+        self._patched = []
+        self.n_calls = 0
+
+    def attach(self, mg):
+        """
+        Wraps all public methods of the device instances of the graph. Returns the number of devices.
+        """
+        devices = {name: node['inst'] for name, node in mg.nodes.items() if node.get('inst') is not None}
+        header = {'version': VERSION,
+                  'created': time.time(),
+                  'devices': {name: f"{type(inst).__module__}.{type(inst).__name__}" for name, inst in devices.items()}}
+        with self._lock:
+            self._file.write((json.dumps(header) + '\n').encode('utf-8'))
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+        for name, inst in devices.items():
+            for method in dir(type(inst)):
+                # class level check, so properties are not evaluated
+                if method.startswith('_') or not callable(getattr(type(inst), method, None)):
+                    continue
+                setattr(inst, method, self._wrap(name, method, getattr(inst, method)))
+                self._patched.append((inst, method))
+        return len(devices)
+
+    def _wrap(self, device, method, func):
+        def traced(*args, **kwargs):
+            depth = getattr(self._local, 'depth', 0)
+            self._local.depth = depth + 1
+            start = time.perf_counter()
+            result = error = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                self._local.depth = depth
+                self._write(depth, device, method, args, kwargs, result, error, start - self._t0, duration)
+        traced.__wrapped__ = func
+        return traced
+
+    def _write(self, depth, device, method, args, kwargs, result, error, t_start, duration):
+        # encoded outside the lock; records of concurrent threads may be stored out of sequence
+        data = _dumps((next(self._seq), threading.get_ident(), depth, device, method,
+                       args, kwargs, result, error, t_start, duration))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(data)
+            # the compressed data so far is complete and readable, even if the process dies now
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+            self.n_calls += 1
+
+    def note(self, device, event, payload, t_start, duration):
+        """
+        Adds an event that is not a driver call (e.g. an event loop stall) with depth -1; it is not replayed.
+        """
+        self._write(-1, device, event, (payload,), {}, None, None, t_start - self._t0, duration)
+
+    def detach(self):
+        for inst, method in self._patched:
+            try:
+                delattr(inst, method)
+            except AttributeError:
+                pass
+        self._patched = []
+
+    def close(self):
+        self.detach()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path):
+    """
+    Returns (header, records) of a trace file, records in call sequence. A truncated file (e.g. after a crash)
+    yields the complete records; the header is None if not even the header was written.
+    """
+    records = []
+    with gzip.open(path, 'rb') as f:
+        try:
+            header = f.readline()
+        except (EOFError, OSError):
+            return None, records
+        if header and not header.startswith(b'{'):
+            raise ValueError(f"{path}: not a trace of version {VERSION}")
+        if not header.endswith(b'\n'):
+            return None, records
+        header = json.loads(header)
+        try:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                records.append(_loads(line))
+        except (EOFError, OSError, ValueError):
+            pass
+    records.sort(key=lambda record: record[0])
+    return header, records
+
+
+class ReplayDevice:
+    """
+    Stand-in for one recorded device. Subclassed per device with the recorded methods (see ReplayBackend),
+    so `dir()` and the capability index see the same commands as in the recorded run.
+    """
+    def __init__(self, name, calls, realtime=False):
+        self.name = name
+        self.calls = collections.deque(calls)
+        self.realtime = realtime
+        self._lock = threading.Lock()
+
+    def _replay(self, method, args, kwargs):
+        with self._lock:
+            if not self.calls:
+                raise ReplayMismatch(f"{self.name}.{method}(): no more calls in the trace")
+            record = self.calls[0]
+            if record[4] != method:
+                raise ReplayMismatch(f"{self.name}.{method}() called, trace has {self.name}.{record[4]}() "
+                                     f"(call {record[0]})")
+            # compared as recorded: values without a JSON form by their repr
+            recorded = (record[5], record[6])
+            if _encode((args, kwargs)) != _encode(recorded):
+                raise ReplayMismatch(f"{self.name}.{method}{_call_args(args, kwargs)} called, trace has "
+                                     f"{self.name}.{method}{_call_args(*recorded)} (call {record[0]})")
+            self.calls.popleft()
+        if self.realtime:
+            time.sleep(record[10])
+        error = record[8]
+        if error is not None:
+            raise error if isinstance(error, BaseException) else RuntimeError(error)
+        return record[7]
+
+
+def _call_args(args, kwargs):
+    return f"({', '.join([repr(a) for a in args] + [f'{k}={v!r}' for k, v in kwargs.items()])})"
+
+
+def _replay_method(method):
+    def call(self, *args, **kwargs):
+        return self._replay(method, args, kwargs)
+    call.__name__ = method
+    return call
+
+
+class ReplayBackend:
+    """
+    Replaces the device instances of a graph by ReplayDevices, instead of mg.CreateDevices().
+    With `realtime` every call takes as long as in the recorded run.
+    """
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime
+        self.header, records = read_trace(path)
+        if self.header is None:
+            raise ValueError(f"{path}: empty trace")
+        self.installed = {}
+        self.calls = collections.defaultdict(list)
+        for record in records:
+            if record[2] == 0:
+                self.calls[record[3]].append(record)
+
+    def devices(self):
+        devices = {}
+        for name in self.header['devices']:
+            methods = sorted({record[4] for record in self.calls.get(name, ())})
+            cls = type(f"Replay_{name}", (ReplayDevice,), {m: _replay_method(m) for m in methods})
+            devices[name] = cls(name, self.calls.get(name, ()), self.realtime)
+        return devices
+
+    def install(self, mg):
+        self.installed = self.devices()
+        for name, inst in self.installed.items():
+            if name in mg.nodes:
+                mg.nodes[name]['inst'] = inst
+        return self.installed
+
+    def remaining(self):
+        """
+        Number of recorded top level calls per device that have not been replayed.
+        """
+        return {name: len(inst.calls) for name, inst in self.installed.items() if inst.calls}
+
+
+def summary(path):
+    header, records = read_trace(path)
+    if header is None:
+        return f"{path}: empty trace"
+    stats = collections.defaultdict(lambda: [0, 0.0, 0.0])
+    for record in records:
+        stat = stats[(record[3], record[4], record[2])]
+        stat[0] += 1
+        stat[1] += record[10]
+        stat[2] = max(stat[2], record[10])
+    lines = [f"{path}: {len(records)} calls, {len(header['devices'])} devices, "
+             f"recorded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header['created']))}"]
+    if records:
+        lines.append(f"duration {records[-1][9] + records[-1][10] - records[0][9]:.2f} s")
+    for (device, method, depth), (n, total, longest) in sorted(stats.items()):
+        lines.append(f"{'  ' * max(0, depth)}{device}.{method}: {n} calls, mean {total / n * 1e3:.1f} ms, "
+                     f"max {longest * 1e3:.1f} ms, total {total:.2f} s")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m temfield.Trace', description='instrument traffic traces')
+    parser.add_argument('command', choices=['summary'])
+    parser.add_argument('trace')
+    args = parser.parse_args(argv)
+    print(summary(args.trace))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
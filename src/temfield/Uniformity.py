@@ -0,0 +1,62 @@
+"""
+Field uniformity evaluation for the uniform area of (G)TEM cells (IEC 61000-4-20).
+
+The field components measured at P grid points for F frequencies form an (F x P x 3) matrix.
+The criteria are evaluated for all frequencies at once:
+
+* the primary component is the component with the largest mean over the points;
+* the primary component of at least `fraction` of the points is within `window_db` (0 ... +6 dB);
+* at these points the secondary components are at least `secondary_db` below the primary one.
+
+Points that could not be measured (NaN, e.g. an inactive probe) count as points outside the window.
+"""
+import math
+import warnings
+
+import numpy as np
+
+
+def evaluate_uniformity(e, fraction=0.75, window_db=6.0, secondary_db=-6.0):
+    """
+    `e`: field components with shape (F, P, 3) in V/m.
+
+    Returns a dict of arrays with shape (F,):
+        primary       index of the primary component (0: x, 1: y, 2: z)
+        spread_db     smallest spread (dB) of the primary component over ceil(fraction*P) points
+        field_ok      spread_db <= window_db
+        secondary_ok  secondary components at least -secondary_db dB below the primary one at all points of
+                      the best window
+        uniform       field_ok & secondary_ok
+        reference     field strength (V/m) at the lower end of the best window (used to calibrate the level)
+    """
+    e = np.abs(np.asarray(e, dtype=float))
+    n_f, n_p, _ = e.shape
+    k = max(1, math.ceil(fraction * n_p))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)   # frequencies without any measured point
+        primary = np.argmax(np.nan_to_num(np.nanmean(e, axis=1), nan=-1.0), axis=1)
+    prim = np.take_along_axis(e, primary[:, None, None], axis=2)[:, :, 0]
+    # all windows of k consecutive points of the sorted primary component
+    order = np.argsort(-prim, axis=1, kind='stable')
+    s = np.take_along_axis(prim, order, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = 20 * np.log10(s[:, :n_p - k + 1] / s[:, k - 1:])
+    best = np.argmin(np.where(np.isnan(spread), np.inf, spread), axis=1)
+    spread_db = spread[np.arange(n_f), best]
+    reference = s[np.arange(n_f), best + k - 1]
+    # largest secondary component per point
+    mask = np.ones_like(e, dtype=bool)
+    np.put_along_axis(mask, primary[:, None, None].repeat(n_p, axis=1), False, axis=2)
+    secondary = np.where(mask, e, 0).max(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sec_db = 20 * np.log10(secondary / prim)
+    # points of the best window
+    window = np.take_along_axis(order, best[:, None] + np.arange(k), axis=1)
+    secondary_ok = (np.take_along_axis(sec_db, window, axis=1) <= secondary_db).all(axis=1)
+    field_ok = spread_db <= window_db
+    return {'primary': primary,
+            'spread_db': spread_db,
+            'field_ok': field_ok,
+            'secondary_ok': secondary_ok,
+            'uniform': field_ok & secondary_ok,
+            'reference': reference}
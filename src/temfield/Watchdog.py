@@ -0,0 +1,85 @@
+"""
+Event-loop latency watchdog.
+
+A precise QTimer beats every `interval` seconds on the GUI thread; how late each beat comes is the latency
+of the event loop (Metrics: temfield_event_loop_latency_seconds). While a beat is overdue by more than
+`threshold`, a sampler thread takes the Python stack of the GUI thread every `sample_interval` seconds.
+When the loop comes back, the stall is reported with its duration and the most frequent stack through the
+`stalled` signal, i.e. the code path that blocked the loop (leveling, a device call, a table update, ...).
+"""
+import collections
+import sys
+import threading
+import time
+import traceback
+
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+from . import Metrics
+
+
+class EventLoopWatchdog(QObject):
+    stalled = Signal(float, str)   # duration (s), stack report
+
+    def __init__(self, parent=None, threshold=0.2, interval=0.05, sample_interval=0.01, depth=15):
+        super().__init__(parent)
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_interval = sample_interval
+        self.depth = depth
+        self.n_stalls = 0
+        self._gui_ident = threading.get_ident()
+        self._expected = time.perf_counter() + interval
+        self._samples = collections.Counter()
+        self._n_samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._beat)
+        self._thread = threading.Thread(target=self._sample, name='temfield-watchdog', daemon=True)
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval
+        self._timer.start(int(self.interval * 1000))
+        self._thread.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+
+    def _beat(self):
+        now = time.perf_counter()
+        late = max(0.0, now - self._expected)
+        self._expected = now + self.interval
+        Metrics.EVENT_LOOP_LATENCY.observe(late)
+        with self._lock:
+            samples, n = self._samples, self._n_samples
+            self._samples = collections.Counter()
+            self._n_samples = 0
+        if late > self.threshold:
+            self.n_stalls += 1
+            Metrics.EVENT_LOOP_STALLS.observe(late)
+            self.stalled.emit(late, self._report(samples, n))
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            if time.perf_counter() - self._expected <= self.threshold:
+                continue
+            frame = sys._current_frames().get(self._gui_ident)
+            if frame is None:
+                continue
+            stack = tuple((fs.filename, fs.lineno, fs.name) for fs in traceback.extract_stack(frame)[-self.depth:])
+            del frame
+            with self._lock:
+                self._samples[stack] += 1
+                self._n_samples += 1
+
+    @staticmethod
+    def _report(samples, n):
+        if not samples:
+            return "no stack sampled"
+        stack, count = samples.most_common(1)[0]
+        lines = [f"{count} of {n} stack samples in:"]
+        lines.extend(f"  {filename}:{lineno} {name}" for filename, lineno, name in stack)
+        return '\n'.join(lines)
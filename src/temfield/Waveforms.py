@@ -0,0 +1,160 @@
+import json
+import queue
+import threading
+
+import numpy as np
+
+
+class WaveformStore:
+    """
+    Memory-mapped store of the probe waveforms captured during the dwells of a sweep.
+
+    The file holds `n_records` fixed-size records, one per frequency (and level). Each record has room for
+    `captures` waveforms of up to `samples` points with their own time base:
+
+        f, level     frequency (Hz) and target field strength (V/m)
+        n            number of captures in this record
+        length       number of valid samples per capture
+        t            time base per capture
+        e            Ex, Ey, Ez per capture
+
+    The layout is described in a JSON file next to the data ('<path>.json'), so a store can be opened with
+    `WaveformStore.open(path)` for post-processing. All accessors return NumPy views into the map.
+    """
+    def __init__(self, path, n_records, captures=8, samples=1024, mode='w+'):
+        self.path = path
+        self.captures = captures
+        self.samples = samples
+        self.dtype = np.dtype([('f', 'f8'), ('level', 'f8'), ('n', 'i4'),
+                               ('length', 'i4', (captures,)),
+                               ('t', 'f4', (captures, samples)),
+                               ('e', 'f4', (captures, 3, samples))])
+        self.mm = np.memmap(path, dtype=self.dtype, mode=mode, shape=(n_records,))
+        if mode == 'w+':
+            self.mm['n'] = 0
+            with open(path + '.json', 'w') as f:
+                json.dump({'n_records': n_records, 'captures': captures, 'samples': samples}, f)
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        with open(path + '.json') as f:
+            layout = json.load(f)
+        return cls(path, layout['n_records'], layout['captures'], layout['samples'], mode=mode)
+
+    def __len__(self):
+        # number of records up to the last one written
+        written = np.flatnonzero(self.mm['n'])
+        return int(written[-1]) + 1 if len(written) else 0
+
+    @property
+    def frequencies(self):
+        return self.mm['f'][:len(self)]
+
+    @property
+    def levels(self):
+        return self.mm['level'][:len(self)]
+
+    def waveforms(self, i):
+        """
+        Returns (t, e) of record `i` as views: t with shape (n, samples), e with shape (n, 3, samples).
+        Samples beyond `length[j]` of capture j are not valid.
+        """
+        rec = self.mm[i]
+        n = rec['n']
+        return rec['t'][:n], rec['e'][:n]
+
+    def write(self, i, f, level, t, ex, ey, ez):
+        rec = self.mm[i]
+        j = rec['n']
+        if j >= self.captures:
+            return False
+        m = min(len(t), self.samples)
+        rec['f'] = f
+        rec['level'] = level
+        rec['length'][j] = m
+        rec['t'][j, :m] = t[:m]
+        rec['e'][j, 0, :m] = ex[:m]
+        rec['e'][j, 1, :m] = ey[:m]
+        rec['e'][j, 2, :m] = ez[:m]
+        rec['n'] = j + 1
+        return True
+
+    def flush(self):
+        self.mm.flush()
+
+
+class WaveformRecorder:
+    """
+    Feeds waveforms into a WaveformStore from a writer thread.
+    `put` only queues references to the arrays, the copy into the map happens in the writer thread.
+    During a dwell, `start_capture` reads the probe periodically in a capture thread, so the instrument
+    I/O does not block the GUI; `latest` holds the last captured waveform for the live view.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.record = -1
+        self.f = None
+        self.level = None
+        self.latest = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='temfield-waveforms', daemon=True)
+        self._thread.start()
+        self._capture = None
+        self._capture_stop = None
+
+    def begin(self, f, level):
+        self.record += 1
+        self.f = f
+        self.level = level
+
+    def put(self, t, ex, ey, ez):
+        self._put(self.record, self.f, self.level, t, ex, ey, ez)
+
+    def _put(self, record, f, level, t, ex, ey, ez):
+        if 0 <= record < len(self.store.mm):
+            self._queue.put((record, f, level, t, ex, ey, ez))
+
+    @property
+    def capturing(self):
+        return self._capture is not None
+
+    def start_capture(self, read, interval):
+        """
+        Calls `read()` every `interval` seconds until `stop_capture()`; `read` returns (err, t, ex, ey, ez)
+        like TestSusceptibiliy.get_waveform. The captures go to the current record (see `begin`).
+        """
+        self.stop_capture()
+        stop = self._capture_stop = threading.Event()
+        record, f, level = self.record, self.f, self.level
+
+        def capture():
+            while not stop.wait(interval):
+                err, t, ex, ey, ez = read()
+                if err >= 0:
+                    self.latest = (t, ex, ey, ez)
+                    self._put(record, f, level, t, ex, ey, ez)
+
+        self._capture = threading.Thread(target=capture, name='temfield-waveform-capture', daemon=True)
+        self._capture.start()
+
+    def stop_capture(self):
+        """
+        Ends the captures; waits for a read in progress, so the probe is free for the next leveling.
+        """
+        if self._capture is not None:
+            self._capture_stop.set()
+            self._capture.join()
+            self._capture = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self.store.write(*item)
+
+    def close(self):
+        self.stop_capture()
+        self._queue.put(None)
+        self._thread.join()
+        self.store.flush()
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+# Qt widgets without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+CONF = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'conf')
+
+
+class FakeDevice:
+    """
+    Simulated driver: records the calls and answers like the mpylab drivers ((err, value) or err).
+    """
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+        self.freq = None
+
+    def _record(self, cmd, *args):
+        self.calls.append((self.name, cmd) + args)
+
+    def SetFreq(self, f):
+        self._record('SetFreq', f)
+        self.freq = f
+        return 0, f
+
+    def RFOn(self):
+        self._record('RFOn')
+        return 0
+
+    def RFOff(self):
+        self._record('RFOff')
+        return 0
+
+    def AMOn(self):
+        self._record('AMOn')
+        return 0
+
+    def AMOff(self):
+        self._record('AMOff')
+        return 0
+
+    def Standby(self):
+        self._record('Standby')
+        return 0
+
+
+@pytest.fixture
+def meas():
+    """
+    TestSusceptibiliy on the graph of test/conf/gtem.dot with simulated sg, amp1, amp2 and sw
+    (amp1 is active up to 1 GHz, amp2 from 800 MHz).
+    """
+    from temfield import TestSusceptibility
+    from temfield.Dispatch import capability_index, graph_devices
+
+    m = TestSusceptibility.TestSusceptibiliy()
+    m.Init(dotfile='gtem.dot', SearchPath=[CONF])
+    m.calls = []
+    for node in m.mg.nodes.values():
+        node['inst'] = None
+    for name in ('sg', 'amp1', 'amp2', 'sw'):
+        m.mg.nodes[name]['inst'] = FakeDevice(name, m.calls)
+    m.capabilities = capability_index(graph_devices(m.mg))
+    return m
+
+
+def sent(m, cmd):
+    return [call[0] for call in m.calls if call[1] == cmd]
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PySide6.QtCore import QStandardPaths
+    from PySide6.QtWidgets import QApplication
+
+    QStandardPaths.setTestModeEnabled(True)
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def window(qapp, tmp_path):
+    """
+    MainWindow with settings in a temporary ini file; no devices are created.
+    """
+    from PySide6.QtCore import QSettings
+    from temfield.TEMField import MainWindow
+
+    settings = QSettings(str(tmp_path / 'temfield.ini'), QSettings.Format.IniFormat)
+    settings.setValue("settings/table-save-dir", str(tmp_path))
+    settings.setValue("settings/results_db", str(tmp_path / 'results.sqlite'))
+    settings.setValue("settings/watchdog_threshold", 0)
+    w = MainWindow(settings)
+    yield w
+    w.deleteLater()
@@ -0,0 +1,73 @@
+import numpy as np
+
+from temfield import Analysis
+
+HEADER = ['Time', 'Frequency [MHz]', 'CW Ex [V/m]', 'CW Ey [V/m]', 'CW Ez [V/m]', 'CW |E| [V/m]', 'Status',
+          'Target [V/m]']
+
+
+def test_table_arrays_passed_statuses():
+    rows = [['t', '100', '0', '0', '10', '10', 'Passed', '10'],
+            ['t', '200', '0', '0', '10', '10', 'Uniform', '10'],
+            ['t', '300', '0', '0', '3', '3', 'Failed (EUT1)', '10']]
+    run = Analysis.table_arrays(HEADER, rows)
+    assert list(run['failed']) == [False, False, True]
+    assert np.allclose(run['f'], [100e6, 200e6, 300e6])
+    assert run['e'].shape == (3, 4)
+
+
+def write_result(path, rows, eut='GTEM test EUT'):
+    import csv
+
+    with open(path, 'w') as f:
+        f.write(f"# File saved: 2026-10-19T10:00:00\n#\n# EUT Description\n# {eut}\n")
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+def result_rows(freqs, e, failed=(), target=10):
+    return [['t', str(f), '0', '0', str(v), str(v), 'Failed (EUT)' if f in failed else 'Passed', str(target)]
+            for f, v in zip(freqs, e)]
+
+
+def test_read_result_file(tmp_path):
+    path = write_result(tmp_path / 'a.csv', result_rows([100, 200], [10, 11], failed=[200]))
+    run = Analysis.read_result_file(path)
+    assert (run['saved'], run['eut']) == ('2026-10-19T10:00:00', 'GTEM test EUT')
+    assert list(run['e'][:, 3]) == [10., 11.] and list(run['failed']) == [False, True]
+
+
+def test_stack_bands_and_deltas(tmp_path):
+    golden = write_result(tmp_path / 'golden.csv', result_rows([100, 150, 400], [10, 10, 10]))
+    other = write_result(tmp_path / 'b.csv', result_rows([100, 400], [20, 10], failed=[400]))
+    runs = Analysis.load_many([golden, other], workers=1)
+    grid, e, failed = Analysis.stack(runs)
+    assert list(grid) == [100e6, 150e6, 400e6]
+    # interpolated on a log frequency axis
+    assert e[1, 1, 3] == np.interp(np.log(150e6), np.log([100e6, 400e6]), [20., 10.])
+    # failures of the nearest measured point
+    assert list(failed[1]) == [False, False, True]
+    bands, emin, emax = Analysis.band_stats(grid, e, [100e6, 300e6, 500e6])
+    assert bands == [(100e6, 300e6), (300e6, 500e6)]
+    assert emin[1].tolist() == [e[1, 1, 3], 10.] and emax[1].tolist() == [20., 10.]
+    assert Analysis.failure_bands(grid, failed[1]) == [(400e6, 400e6)]
+    assert np.allclose(Analysis.deltas(e, 0)[1], 20 * np.log10(e[1, :, 3] / 10))
+
+
+def test_split_levels(tmp_path):
+    rows = result_rows([100, 200], [3, 3], target=3) + result_rows([100, 200], [10, 10])
+    runs = Analysis.split_levels([Analysis.read_result_file(write_result(tmp_path / 'levels.csv', rows))])
+    assert [run['path'].split('@')[1] for run in runs] == ['3V/m', '10V/m']
+    assert [list(run['e'][:, 3]) for run in runs] == [[3., 3.], [10., 10.]]
+
+
+def test_cli(tmp_path, capsys):
+    golden = write_result(tmp_path / 'golden.csv', result_rows([100, 200], [10, 10]))
+    write_result(tmp_path / 'b.csv', result_rows([100, 200], [10, 20], failed=[200]))
+    assert Analysis.main([str(tmp_path / '*.csv'), '--golden', golden, '--workers', '1']) == 0
+    out = capsys.readouterr().out
+    assert out.startswith(f"2 runs, 2 frequencies, golden run: {golden}")
+    assert "failures: 200.000-200.000 MHz" in out
+    assert "delta to golden: max +6.02 dB at 200.000 MHz" in out
@@ -0,0 +1,116 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from temfield.Automation import AutomationServer
+from temfield.Setup import searchpath_list
+
+
+@pytest.fixture
+def server(window):
+    server = AutomationServer(window, port=0)
+    yield server
+    server.shutdown()
+
+
+def call(server, method, **params):
+    return server.handle(json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params}).encode())
+
+
+def test_parse_error(server):
+    assert server.handle(b'{"jsonrpc": "2.0", "method": ')['error']['code'] == -32700
+
+
+def test_invalid_request(server):
+    assert server.handle(b'[1, 2]')['error']['code'] == -32600
+
+
+def test_set_setup_rejects_code_in_searchpath(server, window, tmp_path):
+    marker = tmp_path / 'pwned'
+    before = window.searchpath
+    reply = call(server, 'set_setup', searchpath=f"__import__('pathlib').Path({str(marker)!r}).touch()")
+    assert reply['error']['code'] == -32602
+    assert window.searchpath == before
+    with pytest.raises(ValueError):
+        searchpath_list(f"__import__('pathlib').Path({str(marker)!r}).touch()")
+    assert not marker.exists()
+    assert searchpath_list("['.', 'conf']") == ['.', 'conf']
+
+
+def test_set_setup_checks_types(server, window):
+    assert call(server, 'set_setup', cw='3')['error']['code'] == -32602
+    assert call(server, 'set_setup', levels=[1, 'x'])['error']['code'] == -32602
+    assert call(server, 'set_setup', cw=3, levels=[1, 3, 10])['result']['levels'] == [1, 3, 10]
+    assert window.cw == 3
+
+
+def test_start_checks_state_in_one_gui_call(server, window, monkeypatch):
+    started = []
+    monkeypatch.setattr(window, 'start_test', lambda ask=True: started.append(ask))
+    window.sweep_running = True
+    assert call(server, 'start')['error']['code'] == -32602
+    window.sweep_running = False
+    assert call(server, 'start')['result'] is True
+    assert started == [False]
+
+
+def test_invoke_times_out_when_gui_thread_is_busy(server):
+    # the GUI thread (this one) does not process events while it waits for the worker
+    server.invoker.timeout = 0.2
+    errors = []
+    worker = threading.Thread(target=lambda: errors.append(call(server, 'status')))
+    worker.start()
+    worker.join(5)
+    assert errors and errors[0]['error']['code'] == -32000
+    assert 'TimeoutError' in errors[0]['error']['message']
+
+
+def test_http_requires_json_content_type(server):
+    server.start()
+    request = urllib.request.Request(server.address, data=b'{}', headers={'Content-Type': 'text/plain'})
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(request, timeout=5)
+    assert e.value.code == 415
+    request = urllib.request.Request(server.address, data=b'{', headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as reply:
+        assert json.load(reply)['error']['code'] == -32700
+
+
+def test_stored_setup_passes_the_checks(window):
+    # the sweep journal and test plans hand JSON of setup_dict back to apply_setup
+    window.apply_setup(json.loads(json.dumps(window.setup_dict())))
+
+
+def test_set_waveform_setup(server):
+    reply = call(server, 'set_setup', waveform_captures=4, waveform_samples=256)
+    assert (reply['result']['waveform_captures'], reply['result']['waveform_samples']) == (4, 256)
+    assert call(server, 'set_setup', waveform_samples=2.5)['error']['code'] == -32602
+
+
+@pytest.mark.parametrize('spec', [{'type': 'subprocess', 'command': 'touch pwned'},
+                                  {'type': 'os:system'},
+                                  {'type': 'dwell', 'command': 'touch pwned'}])
+def test_set_setup_refuses_executing_monitors(server, window, spec):
+    before = window.eut_monitor_specs
+    assert call(server, 'set_setup', eut_monitor_specs=[spec])['error']['code'] == -32602
+    with pytest.raises(TypeError):
+        window.apply_setup({'eut_monitor_specs': [spec]})
+    assert window.eut_monitor_specs == before
+    window.apply_setup({'eut_monitor_specs': [spec]}, trusted=True)
+    assert window.eut_monitor_specs == [spec]
+    assert call(server, 'set_setup', eut_monitor_specs=[{'type': 'tcp', 'port': 5025}])['result']
+
+
+def test_pause_resume_stop_need_a_running_sweep(server, window):
+    label = window.ui.start_pause_pushButton.text()
+    for method in ('pause', 'resume', 'stop'):
+        assert call(server, method)['error']['code'] == -32602
+    assert window.ui.start_pause_pushButton.text() == label
+    assert not window.pause_processing
+    # the window methods ignore the calls as well (meas is not initialised)
+    window.pause_test()
+    window.continue_test()
+    assert window.ui.start_pause_pushButton.text() == label
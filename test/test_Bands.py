@@ -0,0 +1,55 @@
+import pytest
+from mpylab.tools.mgraph import MGraph
+
+from conftest import CONF
+from temfield import Bands
+
+CONDITIONS = ['f<=1e9', 'f>=800e6']
+
+
+def test_conditions_of_graph():
+    mg = MGraph('gtem.dot', SearchPaths=[CONF])
+    conditions = Bands.graph_conditions(mg)
+    assert '1e6<=f<=1e9' in conditions and '1e9<f<=18e9' in conditions
+    assert conditions == sorted(set(conditions))
+    assert Bands.node_attributes(mg)['amp1'] == {'ini': 'amp_ametek_cba_1g_030d.ini', 'condition': '1e6<=f<=1e9'}
+    assert len(Bands.BandIndex.from_graph([500e6, 1.5e9], mg)) == 2
+
+
+def test_conditions_are_not_executed():
+    with pytest.raises(ValueError):
+        Bands.BandIndex([1e6], ["__import__('os').getcwd() == f"])
+    with pytest.raises(ValueError):
+        Bands.BandIndex([1e6], ["f.real == f"])
+    with pytest.raises(NameError):
+        Bands.BandIndex([1e6], ["f < fmax"])
+
+
+def test_condition_map():
+    index = Bands.BandIndex([500e6, 2e9], ['freq<=1e9'], condition_map={'freq': 'f'})
+    assert [index.names[index.lookup(f)] for f in (500e6, 2e9)] == ['1', '0']
+
+
+def test_band_index_intervals_and_names():
+    index = Bands.BandIndex([500e6, 600e6, 900e6, 1.5e9, 2e9], CONDITIONS)
+    assert len(index) == 3
+    assert (index.starts, index.stops) == ([500e6, 900e6, 1.5e9], [600e6, 900e6, 2e9])
+    assert [index.names[index.lookup(f)] for f in (550e6, 900e6, 1.7e9)] == ['10', '11', '01']
+    # outside the plan: evaluated, same band as the planned frequencies with the same conditions
+    assert index.lookup(700e6) == index.lookup(500e6)
+    # band ids depend on the plan, names do not
+    other = Bands.BandIndex([2e9, 500e6], CONDITIONS)
+    assert other.names[other.lookup(2e9)] == index.names[index.lookup(2e9)]
+
+
+def test_band_order():
+    freqs = [500e6, 600e6, 900e6, 1.5e9, 2e9]
+    index = Bands.BandIndex(freqs, CONDITIONS)
+    upper = index.lookup(2e9)
+    lower = index.lookup(500e6)
+    assert Bands.band_order(freqs, index) == (freqs, 2, 2)
+    # starting in the topmost band: serpentine, descending
+    assert Bands.band_order(freqs, index, upper) == ([2e9, 1.5e9, 900e6, 600e6, 500e6], 2, 3)
+    ordered, switches, ascending = Bands.band_order([500e6, 2e9, 600e6], index, upper)
+    assert ordered == [2e9, 600e6, 500e6] and (switches, ascending) == (1, 2)
+    assert Bands.band_order(freqs, index, lower)[1:] == (2, 2)
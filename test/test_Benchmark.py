@@ -0,0 +1,10 @@
+from temfield import Benchmark
+
+
+def test_startup_defers_heavy_imports():
+    assert Benchmark.eager_imports() == []
+
+
+def test_startup_quits_after_show():
+    [t] = Benchmark.startup_times(runs=1)
+    assert t < 60
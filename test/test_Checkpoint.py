@@ -0,0 +1,39 @@
+from temfield.Checkpoint import SweepJournal
+
+
+def test_load_keeps_completed_frequencies(tmp_path):
+    journal = SweepJournal(str(tmp_path / 'journal' / 'sweep.jsonl'))
+    journal.begin({'cw': 3}, [1e6, 2e6, 3e6], ['Time', 'Frequency [MHz]'], extra={'plan': 1})
+    journal.add_row(1e6, ['t0', '1.0'])
+    journal.add_row(2e6, ['t1', '2.0'], done=False)
+    journal.close()
+    with open(journal.path, 'a') as f:
+        f.write('{"type": "row", "f": 3e6')   # torn last line
+    state = journal.load()
+    assert state['setup'] == {'cw': 3} and state['extra'] == {'plan': 1}
+    assert state['rows'] == [(1e6, ['t0', '1.0'])]
+    assert state['remaining_freqs'] == [2e6, 3e6]
+
+
+def test_resume_drops_incomplete_rows(tmp_path):
+    journal = SweepJournal(str(tmp_path / 'sweep.jsonl'))
+    journal.begin({}, [1e6, 2e6], [])
+    journal.add_row(1e6, ['a'])
+    journal.add_row(2e6, ['b'], done=False)
+    journal.close()
+    state = journal.resume()
+    assert state['remaining_freqs'] == [2e6]
+    journal.add_row(2e6, ['c'])
+    journal.close()
+    assert journal.load()['rows'] == [(1e6, ['a']), (2e6, ['c'])]
+    journal.clear()
+    assert not journal.exists()
+
+
+def test_not_a_journal(tmp_path):
+    import pytest
+
+    path = tmp_path / 'sweep.jsonl'
+    path.write_text('')
+    with pytest.raises(ValueError):
+        SweepJournal(str(path)).load()
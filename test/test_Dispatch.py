@@ -0,0 +1,42 @@
+import pytest
+
+from conftest import FakeDevice
+from temfield.Dispatch import DeviceDispatcher, capability_index, dispatch_stages
+
+
+def test_dispatch_stages_from_after():
+    nodes = {'amp1': {'after': 'sw'}, 'amp2': {'after': 'sw, sg'}, 'sg': {}, 'sw': {'after': 'missing'}}
+    assert dispatch_stages(['sg', 'sw', 'amp1', 'amp2'], nodes) == [['sg', 'sw'], ['amp1', 'amp2']]
+    assert dispatch_stages(['sg'], {}) == [['sg']]
+
+
+def test_dispatch_stages_cycle():
+    with pytest.raises(ValueError, match='cyclic'):
+        dispatch_stages(['a', 'b', 'c'], {'a': {'after': 'b'}, 'b': {'after': 'a'}})
+
+
+def test_dispatch_follows_stages_and_active_nodes():
+    calls = []
+    devices = {name: FakeDevice(name, calls) for name in ('sg', 'sw', 'amp1', 'amp2')}
+    active = {'sg', 'sw', 'amp1'}
+    dispatcher = DeviceDispatcher(devices, {'amp1': {'after': 'sw'}}, active=lambda: active)
+    try:
+        results = dispatcher.dispatch('RFOn')
+        assert sorted(results) == ['amp1', 'sg', 'sw']
+        assert [name for name, cmd in calls].index('amp1') > [name for name, cmd in calls].index('sw')
+        assert dispatcher.status(results) == 0
+        assert dispatcher.status({'sg': (-1, None)}) == -1
+        assert 'RFOn: 1 dispatches' in dispatcher.report()
+    finally:
+        dispatcher.shutdown()
+
+
+def test_capability_index():
+    class Meter:
+        def Read(self):
+            pass
+
+    calls = []
+    index = capability_index({'sg': FakeDevice('sg', calls), 'prb': Meter()})
+    assert index['RFOn'] == ['sg'] and index['Read'] == ['prb']
+    assert capability_index({'prb': Meter()}, commands=['Read', 'RFOn']) == {'Read': ['prb']}
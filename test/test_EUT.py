@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import pytest
+
+from temfield import EUT, Table
+
+
+class OkMonitor(EUT.EUTMonitor):
+    passed = 'OK'
+
+
+def test_monitor_names_are_unique():
+    monitors = EUT.make_monitors([{}, {}, {'name': 'EUT1'}])
+    names = [m.name for m in monitors]
+    assert len(set(names)) == 3
+    assert names[2] == 'EUT1'
+
+
+def test_status_with_own_passed_text():
+    monitors = [OkMonitor('A'), EUT.DwellMonitor('B')]
+    passed = EUT.passed_texts(monitors)
+    assert Table.overall_status({'A': 'OK', 'B': 'Passed'}, passed) == 'Passed'
+    assert Table.overall_status({'A': 'Failed: reset', 'B': 'Passed'}, passed) == 'Failed (A)'
+    assert Table.overall_status({'A': 'OK'}, passed) == 'Passed'
+    assert Table.overall_status({'A': 'Passed', 'B': 'OK'}, passed) == 'Failed (B)'
+    assert Table.overall_status({'Uniformity': 'Uniform'}) == 'Uniform'
+
+
+class FakeSerial:
+    def __init__(self, port, baudrate):
+        self.port = port
+        self.closed = False
+
+    def reset_input_buffer(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_serial_monitor_closes_its_port(monkeypatch):
+    serial = pytest.importorskip('serial')
+
+    monkeypatch.setattr(serial, 'Serial', FakeSerial)
+    with EUT.SerialMonitor(port='COM3') as monitor:
+        monitor.start(1)
+        monitor.stop()
+        port = monitor._serial
+        assert not port.closed
+    assert port.closed and monitor._serial is None
+    monitor.start(1)
+    assert monitor._serial is not port
+    EUT.close_monitors([monitor])
+    assert monitor._serial is None
+
+
+class Progress:
+    def __init__(self):
+        self.values = []
+
+    def emit(self, value):
+        self.values.append(value)
+
+
+class SlicedMonitor(EUT.EUTMonitor):
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+        self.stopped = False
+
+    def check(self, timeout):
+        self.timeouts.append(timeout)
+        return super().check(timeout)
+
+    def stop(self):
+        self.stopped = True
+
+
+def test_progress_throttled_to_display_rate():
+    progress = Progress()
+    monitor = SlicedMonitor()
+    assert EUT.monitor_eut(progress, monitor, dw=0.35, progress_interval=0.1) == 'Passed'
+    assert all(0 < t <= 0.1 for t in monitor.timeouts)
+    assert len(progress.values) == len(monitor.timeouts) <= 5
+    assert progress.values == sorted(progress.values) and progress.values[-1] >= 90
+    assert monitor.stopped
+
+
+class LineMonitor(EUT.BlockingMonitor):
+    def __init__(self, lines):
+        super().__init__(fail_pattern='FAIL')
+        self.lines = list(lines)
+
+    def read(self, timeout):
+        time.sleep(0.01)
+        return self.lines.pop(0) if self.lines else None
+
+
+class PollMonitor(EUT.PollingMonitor):
+    def __init__(self, states):
+        super().__init__(poll_interval=0.01)
+        self.states = list(states)
+
+    def poll(self):
+        return self.states.pop(0) if self.states else None
+
+
+class WatchMonitor(EUT.AsyncMonitor):
+    def __init__(self, delay, reason=None):
+        super().__init__()
+        self.delay = delay
+        self.reason = reason
+
+    async def watch(self):
+        await asyncio.sleep(self.delay)
+        if isinstance(self.reason, Exception):
+            raise self.reason
+        return self.reason
+
+
+@pytest.mark.parametrize('monitor, status', [
+    (LineMonitor(['ok', 'ok', 'FAIL: reset\n']), 'Failed: FAIL: reset'),
+    (PollMonitor([None, None, 'no answer']), 'Failed: no answer'),
+    (WatchMonitor(0.05, 'display dark'), 'Failed: display dark'),
+    (WatchMonitor(0.05, OSError('connection lost')), "Failed: OSError('connection lost')"),
+])
+def test_failure_ends_the_dwell(monitor, status):
+    progress = Progress()
+    start = time.monotonic()
+    assert EUT.monitor_eut(progress, monitor, dw=10) == status
+    assert time.monotonic() - start < 1
+    assert progress.values[-1] == 100
+
+
+@pytest.mark.parametrize('monitor', [LineMonitor(['ok'] * 5), PollMonitor([None] * 5), WatchMonitor(60)])
+def test_monitors_pass_without_failure(monitor):
+    start = time.monotonic()
+    assert EUT.monitor_eut(Progress(), monitor, dw=0.2) == 'Passed'
+    assert time.monotonic() - start >= 0.2
+
+
+def test_async_monitor_cancels_watch():
+    monitor = WatchMonitor(60)
+    EUT.monitor_eut(Progress(), monitor, dw=0.1)
+    assert monitor._task.cancelled() and monitor._loop.is_closed()
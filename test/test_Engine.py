@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from conftest import CONF, sent
+from temfield import Engine
+from temfield.RunStore import RunStore
+from temfield.TestSusceptibility import FieldResult
+
+
+def make_engine(tmp_path, meas, **setup):
+    """
+    SweepEngine on the simulated devices of the `meas` fixture; leveling returns the target field.
+    """
+    events = []
+    engine = Engine.SweepEngine('cell', dict({'start_freq': 500., 'stop_freq': 600., 'step_freq': 100.,
+                                              'log_sweep': False, 'dwell_time': 0.}, **setup),
+                                RunStore(str(tmp_path / 'runs')), emit=lambda kind, payload: events.append((kind, payload)),
+                                stop=threading.Event(), pause=threading.Event())
+    engine.events = events
+
+    def init_devices():
+        engine.meas = meas
+        meas.adjust_level = lambda level: FieldResult(meas.f, 0., 0., level, target=level)
+        meas.scale_level = lambda level, e: FieldResult(meas.f, 0., 0., level, target=level)
+    engine.init_devices = init_devices
+    return engine
+
+
+def test_rows_and_states(tmp_path, meas):
+    engine = make_engine(tmp_path, meas, levels=[2, 1])
+    engine.run()
+    rows = [payload for kind, payload in engine.events if kind == 'row']
+    assert [(row[1], row[5], row[6], row[7]) for row in rows] == \
+           [('500.0', '1.0', 'Passed', '1.0'), ('500.0', '2.0', 'Passed', '2.0'),
+            ('600.0', '1.0', 'Passed', '1.0'), ('600.0', '2.0', 'Passed', '2.0')]
+    assert engine.header()[-1] == 'Target [V/m]'
+    assert engine.events[-1] == ('state', 'finished')
+
+
+def test_pause_between_levels_switches_rf_off(tmp_path, meas):
+    engine = make_engine(tmp_path, meas, levels=[1, 2])
+    dwell = engine.dwell
+    rf_off = []
+
+    def pausing_dwell():
+        rf_off.append(sent(meas, 'RFOff').count('sg'))
+        if len(rf_off) == 1:
+            engine.pause.set()
+            threading.Timer(0.3, engine.pause.clear).start()
+        return dwell()
+    engine.dwell = pausing_dwell
+    engine.run()
+    states = [payload if kind == 'state' else kind for kind, payload in engine.events if kind in ('row', 'state')]
+    assert states[:5] == ['running', 'row', 'paused', 'running', 'row']
+    # RF was switched off for the pause before the second level of the first frequency
+    assert rf_off[0] == 0 and rf_off[1] > 0
+
+
+def test_stop_between_levels(tmp_path, meas):
+    engine = make_engine(tmp_path, meas, levels=[1, 2, 3])
+    dwell = engine.dwell
+
+    def stopping_dwell():
+        engine.stop.set()
+        return dwell()
+    engine.dwell = stopping_dwell
+    engine.run()
+    assert len([kind for kind, payload in engine.events if kind == 'row']) == 1
+    assert engine.events[-1] == ('state', 'stopped')
+
+
+def test_failed_init_is_not_hidden(tmp_path):
+    engine = Engine.SweepEngine('cell', {'dotfile': 'missing.dot', 'searchpath': str([CONF])},
+                                RunStore(str(tmp_path / 'runs')))
+    with pytest.raises(Exception) as info:
+        engine.run()
+    assert 'releasing' not in str(info.value)
+    assert not isinstance(info.value, AttributeError)
+
+
+def test_searchpath_is_not_evaluated(tmp_path):
+    engine = Engine.SweepEngine('cell', {'searchpath': "__import__('os').getcwd()"}, RunStore(str(tmp_path / 'runs')))
+    with pytest.raises(ValueError, match='searchpath'):
+        engine.init_devices()
+
+
+def test_monitors_closed_at_the_end(tmp_path, meas):
+    from temfield.EUT import DwellMonitor
+
+    class ClosingMonitor(DwellMonitor):
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    engine = make_engine(tmp_path, meas)
+    engine.monitors = [ClosingMonitor()]
+    engine.run()
+    assert engine.monitors[0].closed
+
+
+def test_all_devices_to_standby_at_the_end(tmp_path, meas):
+    engine = make_engine(tmp_path, meas)
+    engine.run()
+    # amp2 is not active at 500..600 MHz
+    assert 'amp2' in sent(meas, 'Standby')
+
+
+def test_results_in_frequency_order(tmp_path, meas):
+    from temfield.Analysis import read_result_file
+
+    engine = make_engine(tmp_path, meas, start_freq=700., stop_freq=1100., step_freq=100., levels=[1, 2])
+    # sweep starting in the upper band
+    meas.plan_order = lambda freqs: (sorted(freqs, reverse=True), 1, 2)
+    engine.run()
+    measured = [float(payload[1]) for kind, payload in engine.events if kind == 'row']
+    assert measured[0] == 1100.0
+    [run] = engine.store.runs()
+    result = read_result_file(f"{run['path']}/results.csv")
+    assert list(zip(result['f'], result['target'])) == \
+           [(f * 1e6, level) for f in (700, 800, 900, 1000, 1100) for level in (1., 2.)]
@@ -0,0 +1,33 @@
+import urllib.request
+
+from temfield import Metrics
+
+
+def test_render_text_format():
+    registry = Metrics.Registry()
+    count = Metrics.Counter('t_events_total', 'Events.', ['kind'], registry=registry)
+    gauge = Metrics.Gauge('t_level', 'Level.', registry=registry)
+    hist = Metrics.Histogram('t_seconds', 'Durations.', buckets=(0.1, 1.0), registry=registry)
+    count.labels(kind='a "b"').inc(2)
+    gauge.set(3)
+    hist.observe(0.5)
+    text = registry.render()
+    assert '# TYPE t_events_total counter' in text
+    assert 't_events_total{kind="a \\"b\\""} 2.0' in text
+    assert 't_level 3.0' in text
+    assert 't_seconds_bucket{le="0.1"} 0' in text and 't_seconds_bucket{le="+Inf"} 1' in text
+    assert 't_seconds_count 1' in text
+
+
+def test_count_row_and_server():
+    failures = Metrics.EUT_FAILURES.labels(channel='t-ch').value
+    Metrics.count_row({'t-ch': 'Failed: reset', 't-ok': 'OK'}, {'t-ok': 'OK'})
+    assert Metrics.EUT_FAILURES.labels(channel='t-ch').value == failures + 1
+    assert Metrics.EUT_FAILURES.labels(channel='t-ok').value == 0
+    server = Metrics.MetricsServer(0)
+    server.start()
+    try:
+        with urllib.request.urlopen(server.address) as response:
+            assert 'temfield_eut_failures_total{channel="t-ch"}' in response.read().decode()
+    finally:
+        server.shutdown()
@@ -0,0 +1,27 @@
+import numpy as np
+
+from temfield.Report import _figure
+
+
+def test_figure_one_line_set_per_level():
+    f = np.array([2e6, 1e6, 1e6, 3e6, 2e6, 3e6])
+    target = np.array([10., 10., 3., 10., 3., 3.])
+    e = np.repeat((f * 1e-6 + target)[:, None], 4, axis=1)
+    failed = np.array([False, False, False, True, False, False])
+    fig = _figure({'f': f, 'e': e, 'target': target, 'failed': failed})
+    lines = {line.get_label(): line for line in fig.axes[0].get_lines()}
+    assert sorted(lines) == sorted(['EUT failed'] + [f"{c} {level} V/m" for c in ('Ex', 'Ey', 'Ez', '|E|')
+                                                       for level in (3, 10)])
+    for level in (3, 10):
+        line = lines[f"|E| {level} V/m"]
+        assert list(line.get_xdata()) == [1e6, 2e6, 3e6]
+        assert list(line.get_ydata()) == [1 + level, 2 + level, 3 + level]
+    assert lines['Ex 3 V/m'].get_color() == lines['Ex 10 V/m'].get_color()
+    assert lines['Ex 3 V/m'].get_linestyle() != lines['Ex 10 V/m'].get_linestyle()
+
+
+def test_figure_without_target_column():
+    f = np.array([2e6, 1e6])
+    fig = _figure({'f': f, 'e': np.ones((2, 4)), 'target': np.full(2, np.nan), 'failed': np.zeros(2, dtype=bool)})
+    assert [line.get_label() for line in fig.axes[0].get_lines()] == ['Ex', 'Ey', 'Ez', '|E|']
+    assert list(fig.axes[0].get_lines()[0].get_xdata()) == [1e6, 2e6]
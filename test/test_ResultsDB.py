@@ -0,0 +1,54 @@
+import csv
+
+from temfield import ResultsDB
+
+HEADER = ['Frequency [MHz]', 'CW Ex [V/m]', 'CW Ey [V/m]', 'CW Ez [V/m]', 'CW |E| [V/m]', 'Status']
+
+
+def write_result(path, rows, eut='EUT family X', target=None):
+    """
+    Result file as written by MainWindow.write_table; rows are (f in MHz, |E|, status).
+    """
+    header = HEADER + (['Target [V/m]'] if target is not None else [])
+    with open(path, 'w', newline='') as f:
+        f.write("# File saved: 2024-05-02T10:00:00.000000+0200\n# EUT Description\n")
+        f.write(f"# {eut}\n")
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for mhz, e, status in rows:
+            writer.writerow([mhz, 0, 0, e, e, status] + ([target] if target is not None else []))
+    return str(path)
+
+
+def test_register_and_query(tmp_path):
+    db = ResultsDB.ResultsDB(str(tmp_path / 'results.sqlite'))
+    path = write_result(tmp_path / 'a.csv', [(100, 10, 'Passed'), (300, 9, 'Uniform'), (500, 10, 'EUT: no response')],
+                        target=10)
+    run_id = db.register(path)
+    run = db.runs()[0]
+    assert (run['id'], run['n_rows'], run['n_failed']) == (run_id, 3, 1)
+    assert [(b['f_start'], b['n_points'], b['n_failed']) for b in db.bands(run_id)] == \
+           [(80e6, 1, 0), (200e6, 1, 0), (400e6, 1, 1)]
+    [fail] = db.failures(eut='family X')
+    assert (fail['f'], fail['level'], fail['status']) == (500e6, 10, 'EUT: no response')
+    assert db.import_files([path]) == (0, 1, [])
+
+
+def test_failed_runs_use_exact_failure_frequencies(tmp_path):
+    db = ResultsDB.ResultsDB(str(tmp_path / 'results.sqlite'))
+    # failure at 450 MHz, same band (400 MHz..1 GHz) as the queried range
+    db.register(write_result(tmp_path / 'a.csv', [(420, 10, 'Passed'), (450, 10, 'EUT: no response')], target=10))
+    assert db.runs(f_min=380e6, f_max=430e6, failed=True) == []
+    assert len(db.runs(f_min=380e6, f_max=430e6, failed=False)) == 1
+    assert len(db.runs(f_min=440e6, f_max=460e6, failed=True)) == 1
+    assert db.runs(f_min=440e6, f_max=460e6, level=20, failed=True) == []
+    assert db.runs(f_min=440e6, f_max=460e6, failed=False) == []
+
+
+def test_failures_cli_without_level(tmp_path, capsys):
+    dbpath = str(tmp_path / 'results.sqlite')
+    db = ResultsDB.ResultsDB(dbpath)
+    db.register(write_result(tmp_path / 'a.csv', [(450, 10, 'EUT: no response')]))
+    db.close()
+    assert ResultsDB.main(['--db', dbpath, 'failures']) == 0
+    assert '450.000 MHz  - V/m  EUT: no response' in capsys.readouterr().out
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def test_one_line_set_per_level(qapp):
+    from PySide6.QtWidgets import QScrollArea
+    from temfield.ResultsPlot import ResultsPlot
+
+    plot = ResultsPlot(QScrollArea())
+    plot.reset(100e6, 300e6, 3)
+    plot.show()
+    for f in (100e6, 200e6, 300e6):
+        for level in (10, 20):
+            plot.add(f, 0., 0., level, level, failed=(f == 200e6 and level == 20), level=level)
+    assert sorted(plot._lines) == [10, 20]
+    for level, lines in plot._lines.items():
+        f, e = lines[3].get_data()
+        assert list(f) == [100e6, 200e6, 300e6]
+        assert np.all(np.asarray(e) == level)
+    assert lines[3].get_label() == '|E| 20 V/m'
+    assert plot.n == 6 and plot.n_failed == 1
+
+
+def test_points_before_show_are_kept(qapp):
+    from PySide6.QtWidgets import QScrollArea
+    from temfield.ResultsPlot import ResultsPlot
+
+    plot = ResultsPlot(QScrollArea())
+    plot.reset(100e6, 300e6, 1)
+    for f in (300e6, 100e6, 200e6):
+        plot.add(f, 0., 0., 5., 5.)
+    plot.show()
+    f, e = plot._lines[None][3].get_data()
+    assert list(f) == [100e6, 200e6, 300e6]
+    assert plot._lines[None][3].get_label() == '|E|'
@@ -0,0 +1,35 @@
+import itertools
+import time
+
+from temfield.Settling import SettlingTimes
+
+
+def reads(*values):
+    values = iter(values)
+    return lambda: next(values)
+
+
+def test_measure_until_two_reads_agree():
+    settling = SettlingTimes()
+    start = time.perf_counter()
+    assert settling.measure(reads(1.0, 5.0, 9.0, 9.1, 9.1), start) is not None
+    assert settling.measure(lambda: 0.0, start) < 1.0
+
+
+def test_timeout_is_not_observed():
+    settling = SettlingTimes(max_time=0.05)
+    values = itertools.cycle([1.0, 10.0])
+    assert settling.measure(lambda: next(values), time.perf_counter()) is None
+    settling.settle(['sg/freq/1'], lambda: next(values), time.perf_counter())
+    assert settling.times == {}
+
+
+def test_learn_then_wait():
+    settling = SettlingTimes({'sg/freq/1': [0.01, 3]}, margin=2.0, relearn_every=0)
+    assert not settling.needs_learning(['sg/freq/1'])
+    assert settling.needs_learning(['sg/freq/1', 'amp1/freq/1'])
+    assert settling.wait_time(['sg/freq/1']) == 0.02
+    waited = settling.settle(['sg/freq/1'], lambda: 1.0, time.perf_counter())
+    assert waited >= 0.02
+    settling.observe(['sg/freq/1'], 0.03)
+    assert settling.to_setting() == {'sg/freq/1': [0.7 * 0.01 + 0.3 * 0.03, 4]}
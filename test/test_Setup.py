@@ -0,0 +1,33 @@
+import pytest
+
+from temfield import Setup
+
+
+def test_check_setup():
+    Setup.check_setup(dict(Setup.DEFAULT_SETUP))
+    with pytest.raises(KeyError, match='unknown setup keys: bogus'):
+        Setup.check_setup({'bogus': 1})
+    with pytest.raises(KeyError):
+        Setup.check_setup({'cw': 1.}, keys=('am',))
+    for key, value in (('cw', '3'), ('log_sweep', 1), ('levels', [1, True]), ('searchpath', "__import__('os')"),
+                       ('waveform_captures', 0), ('adjust_to_setting', 'w')):
+        with pytest.raises(TypeError, match=key):
+            Setup.check_setup({key: value})
+
+
+def test_searchpath_and_levels():
+    assert Setup.searchpath_list("['.', 'conf']") == ['.', 'conf']
+    assert Setup.searchpath_list(('conf',)) == ['conf']
+    with pytest.raises(ValueError):
+        Setup.searchpath_list("conf")
+    assert Setup.field_levels([10, '3'], 1.) == [3., 10.]
+    assert Setup.field_levels([], 1.) == [1.]
+
+
+def test_sweep_frequencies():
+    assert Setup.sweep_frequencies(100., 300., 100., False) == [100e6, 200e6, 300e6]
+    freqs = Setup.sweep_frequencies(100., 200., 10., True)
+    assert freqs[0] == 100e6 and freqs[-1] == pytest.approx(200e6)
+    # equal steps of at most 10 %, ending at the stop frequency
+    ratios = [b / a for a, b in zip(freqs, freqs[1:])]
+    assert all(r == pytest.approx(ratios[0], rel=1e-3) and 1 < r <= 1.1 for r in ratios)
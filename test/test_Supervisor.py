@@ -0,0 +1,29 @@
+import multiprocessing
+import time
+
+import pytest
+
+
+def test_close_terminates_hanging_cell(qapp, tmp_path):
+    from temfield.Supervisor import Supervisor
+
+    w = Supervisor([{'name': 'A'}], str(tmp_path))
+    w.close_timeout = 0.5
+    # a cell that does not react to Stop
+    process = multiprocessing.get_context('spawn').Process(target=time.sleep, args=(60,))
+    process.start()
+    w.processes['A'] = process
+    w.panels['A'].set_running(True)
+    start = time.monotonic()
+    w.close()
+    assert not process.is_alive()
+    assert time.monotonic() - start < 10
+    assert 'failed' in w.panels['A'].state_label.text()
+    w.deleteLater()
+
+
+def test_cell_setups_are_checked(qapp, tmp_path):
+    from temfield.Supervisor import Supervisor
+
+    with pytest.raises(ValueError, match="cell 'A'"):
+        Supervisor([{'name': 'A', 'setup': {'searchpath': "__import__('os')"}}], str(tmp_path))
@@ -0,0 +1,95 @@
+import pytest
+
+from conftest import sent
+
+
+@pytest.mark.parametrize('stored, levels', [([], []), ([10.0], [10.0]), ([3, 1.5, 10], [3.0, 1.5, 10.0]),
+                                            ('5', [5.0]), (['1', 'x'], [1.0])])
+def test_levels_from_settings(qapp, tmp_path, stored, levels):
+    from PySide6.QtCore import QSettings
+    from temfield.TEMField import MainWindow
+
+    path = str(tmp_path / 'temfield.ini')
+    settings = QSettings(path, QSettings.Format.IniFormat)
+    settings.setValue("fieldstrength/levels", stored)
+    settings.sync()
+    # read back from the file, as after a restart
+    w = MainWindow(QSettings(path, QSettings.Format.IniFormat))
+    try:
+        assert w.levels == levels
+        assert w.previous_level is None
+        assert w.field_levels() == (sorted(levels) or [w.cw])
+    finally:
+        w.deleteLater()
+
+
+def plan_queue(tmp_path):
+    import json
+    from temfield.TestPlan import TestPlanQueue
+
+    path = tmp_path / 'plans.json'
+    path.write_text(json.dumps({'plans': [{'name': 'front', 'setup': {'cw': 3}}, {'name': 'side'}]}))
+    queue = TestPlanQueue(str(path))
+    queue.next_plan()
+    return queue
+
+
+def test_stop_aborts_plan_queue(window, meas, tmp_path):
+    from temfield.TestPlan import TestPlanQueue
+
+    window._meas = meas
+    window.plan_queue = queue = plan_queue(tmp_path)
+    window.sweep_running = True
+    window.remaining_freqs = [100e6, 200e6]
+    window.stop_test()
+    window.finish_sweep()
+    assert window.plan_queue is None
+    assert not window.sweep_running
+    assert queue.done == []
+    assert TestPlanQueue(queue.path).next_plan()['name'] == 'front'
+
+
+def test_finished_plan_is_marked_done(window, meas, tmp_path):
+    window._meas = meas
+    window.plan_queue = queue = plan_queue(tmp_path)
+    window.sweep_running = True
+    window.finish_sweep()
+    assert queue.done == [0]
+    assert window.plan_queue is queue and queue.current == 1
+
+
+def test_finish_sweep_closes_monitors(window, meas):
+    from temfield.EUT import DwellMonitor
+
+    class ClosingMonitor(DwellMonitor):
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    window._meas = meas
+    window.eut_monitors = [ClosingMonitor()]
+    window.sweep_running = True
+    window.finish_sweep()
+    assert window.eut_monitors[0].closed
+
+
+def test_finish_sweep_puts_all_devices_to_standby(window, meas):
+    window._meas = meas
+    meas.set_freq(500e6)
+    window.sweep_running = True
+    window.finish_sweep()
+    assert sorted(sent(meas, 'Standby')) == ['amp1', 'amp2', 'sg', 'sw']
+
+
+def test_plan_settings_reach_the_measurement(window, meas, tmp_path, monkeypatch):
+    window._meas = meas
+    window.plan_queue = queue = plan_queue(tmp_path)
+    monkeypatch.setattr(window, 'start_sweep', lambda: None)
+    window.start_plan({'name': 'fast', 'setup': {'read_tolerance': 0.2, 'max_reads': 4, 'shadow_state': False,
+                                                 'concurrent_devices': True,
+                                                 'settling_times': {'sg/freq/0': [0.1, 3]}}})
+    meas.dispatcher.shutdown()
+    assert (meas.read_tolerance, meas.max_reads, meas.shadow_state) == (0.2, 4, False)
+    assert meas.settling.times == {'sg/freq/0': [0.1, 3]}
+    assert queue.current == 0
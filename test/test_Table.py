@@ -0,0 +1,17 @@
+from temfield import Table
+from temfield.TestSusceptibility import FieldResult
+
+
+def test_extra_columns():
+    assert Table.extra_columns(1, ['EUT']) == []
+    assert Table.extra_columns(2, ['A', 'B']) == ['Target [V/m]', 'Status A', 'Status B']
+    assert Table.extra_columns(1, ['A', 'B'], probes=('p1',)) == ['|E| p1 [V/m]']
+
+
+def test_row_texts_and_channels():
+    result = FieldResult(100e6, 1.234, 0., 0., target=1.)
+    texts = Table.row_texts('t', result, {'A': 'Passed', 'B': 'Failed: reset'})
+    assert texts == ['t', '100.0', '1.23', '0.0', '0.0', str(round(result.magnitude, 2)), 'Failed (B)']
+    assert Table.BASE_HEADER[:2] == ['Time', 'Frequency [MHz]'] and len(Table.BASE_HEADER) == len(texts)
+    assert Table.channel_columns({'A': 'Passed', 'B': 'x'}) == {'Status A': 'Passed', 'Status B': 'x'}
+    assert Table.is_passed('Uniform') and not Table.is_passed('OK') and Table.is_passed('OK', 'OK')
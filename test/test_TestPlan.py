@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from temfield import TestPlan
+
+
+def write_plans(tmp_path, plans):
+    path = tmp_path / 'plans.json'
+    path.write_text(json.dumps({'plans': plans}))
+    return str(path)
+
+
+def test_defaults_and_progress(tmp_path):
+    path = write_plans(tmp_path, [{'name': 'front', 'setup': {'cw': 3}}, {'result_file': 'side.csv'}])
+    queue = TestPlan.TestPlanQueue(path)
+    assert len(queue) == 2 and not queue.started
+    assert queue.plans[1]['name'] == 'plan2'
+    assert queue.result_path(queue.plans[0]) == str(tmp_path / 'front.csv')
+    assert queue.next_plan()['name'] == 'front'
+    queue.mark_done()
+    # the progress survives a restart
+    queue = TestPlan.TestPlanQueue(path)
+    assert queue.started and not queue.finished
+    assert queue.next_plan()['name'] == 'plan2'
+    queue.mark_done()
+    assert queue.finished and queue.next_plan() is None and queue.current is None
+    queue.reset()
+    assert TestPlan.TestPlanQueue(path).next_plan()['name'] == 'front'
+
+
+def test_plans_must_not_change_the_graph(tmp_path):
+    path = write_plans(tmp_path, [{'name': 'a'}, {'name': 'b', 'setup': {'dotfile': 'other.dot'}}])
+    with pytest.raises(ValueError, match="plan 'b' changes the graph"):
+        TestPlan.TestPlanQueue(path)
+
+
+def test_plans_must_not_run_commands(tmp_path):
+    path = write_plans(tmp_path, [{'name': 'a', 'setup': {'eut_monitor_specs': [{'type': 'subprocess',
+                                                                                 'command': 'reboot'}]}}])
+    with pytest.raises(ValueError, match="plan 'a': setup key 'eut_monitor_specs'"):
+        TestPlan.TestPlanQueue(path)
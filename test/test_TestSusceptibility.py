@@ -0,0 +1,210 @@
+import pytest
+
+from conftest import sent
+
+
+def test_rf_on_reaches_amplifier_of_new_band(meas):
+    meas.prepare_sweep([500e6, 1.5e9])
+    meas.set_freq(500e6)
+    meas.rf_on()
+    assert sorted(sent(meas, 'RFOn')) == ['amp1', 'sg', 'sw']
+    meas.calls.clear()
+    meas.set_freq(1.5e9)
+    meas.rf_on()
+    assert 'amp2' in sent(meas, 'RFOn')
+    assert 'amp1' not in sent(meas, 'SetFreq')
+
+
+def test_rf_on_suppressed_within_band(meas):
+    meas.prepare_sweep([500e6, 600e6])
+    meas.set_freq(500e6)
+    meas.rf_on()
+    meas.calls.clear()
+    meas.set_freq(600e6)
+    meas.rf_on()
+    assert sent(meas, 'RFOn') == []
+    assert meas.suppressed == 1
+
+
+def test_rf_off_never_suppressed(meas):
+    meas.set_freq(500e6)
+    meas.rf_off()
+    meas.rf_off()
+    assert sent(meas, 'RFOff').count('sg') == 2
+
+
+def test_concurrent_dispatch_reaches_active_nodes_only(meas):
+    from temfield.Dispatch import DeviceDispatcher
+
+    meas.dispatcher = DeviceDispatcher.from_graph(meas.mg, capabilities=meas.capabilities)
+    try:
+        meas.prepare_sweep([500e6, 1.5e9])
+        meas.set_freq(500e6)
+        meas.rf_on()
+        assert 'amp2' not in sent(meas, 'SetFreq') + sent(meas, 'RFOn')
+        meas.set_freq(1.5e9)
+        meas.rf_on()
+        assert sent(meas, 'RFOn').count('amp2') == 1
+    finally:
+        meas.dispatcher.shutdown()
+
+
+def test_cmd_devices_active_nodes_and_driver_errors(meas):
+    def broken():
+        raise AttributeError('no instrument session')
+
+    meas.mg.nodes['sw']['inst'].Standby = broken
+    meas.set_freq(500e6)
+    assert meas.cmd_devices('Standby') == 0
+    assert sorted(sent(meas, 'Standby')) == ['amp1', 'sg']
+
+
+def test_settle_keys_of_active_devices_and_band(meas):
+    from temfield.Settling import SettlingTimes
+
+    meas.settling = SettlingTimes()
+    meas.read_field = lambda max_reads=None: None
+    meas.field_value = lambda result: 1.0
+    meas.prepare_sweep([500e6, 1.5e9])
+    meas.set_freq(500e6)
+    meas.rf_on()
+    band = meas.band_index.names[meas.band_index.lookup(500e6)]
+    assert sorted(meas.settling.times) == [f"{name}/rf/{band}" for name in ('amp1', 'sg', 'sw')]
+
+
+def test_suppressed_commands_counter(meas):
+    from temfield import Metrics
+
+    before = Metrics.SUPPRESSED_COMMANDS.labels().value
+    meas.prepare_sweep([500e6, 600e6])
+    meas.set_freq(500e6)
+    meas.rf_on()
+    meas.set_freq(600e6)
+    meas.rf_on()
+    meas.rf_on()
+    assert meas.suppressed == 2
+    assert Metrics.SUPPRESSED_COMMANDS.labels().value - before == 2
+
+
+class Leveler:
+    def __init__(self, **par):
+        pass
+
+    def adjust_level(self, e_target):
+        pass
+
+
+def test_scale_fallback_counted_once(meas, monkeypatch):
+    from temfield import Metrics, TestSusceptibility
+
+    meas.mg.nodes['sg']['inst'].GetLevel = lambda: (0, 1e-3)
+    meas.mg.nodes['sg']['inst'].SetLevel = lambda level: (0, level)
+    monkeypatch.setattr(TestSusceptibility.mgraph, 'Leveler', Leveler)
+    meas.read_field = lambda max_reads=None: 'field'
+    meas.field_value = lambda result: 5.0
+    modes = {mode: Metrics.LEVELINGS.labels(mode=mode).value for mode in ('adjust', 'scale', 'scale_fallback')}
+    meas.set_freq(500e6)
+    assert meas.scale_level(10.0, 5.0) == 'field'
+    assert {mode: Metrics.LEVELINGS.labels(mode=mode).value - value for mode, value in modes.items()} == \
+           {'adjust': 0, 'scale': 0, 'scale_fallback': 1}
+
+
+def test_standby_reaches_inactive_devices(meas):
+    from temfield.Dispatch import DeviceDispatcher
+
+    meas.set_freq(500e6)
+    assert meas.cmd_devices('Standby', active_only=False) == 0
+    assert sorted(sent(meas, 'Standby')) == ['amp1', 'amp2', 'sg', 'sw']
+    meas.calls.clear()
+    meas.dispatcher = DeviceDispatcher.from_graph(meas.mg, capabilities=meas.capabilities)
+    try:
+        assert meas.cmd_devices('Standby', active_only=False) == 0
+        assert sorted(sent(meas, 'Standby')) == ['amp1', 'amp2', 'sg', 'sw']
+    finally:
+        meas.dispatcher.shutdown()
+
+
+class Value:
+    def __init__(self, value):
+        self.value = value
+
+    def get_expectation_value_as_float(self):
+        return self.value
+
+
+def test_read_probes_with_inactive_probe(meas):
+    import math
+
+    # mg.Read leaves out inactive nodes and failed reads
+    meas.mg.Read = lambda nodes: {node: (Value(1.), Value(2.), Value(3.)) for node in nodes if node != 'prb2'}
+    fields = meas.read_probes(['prb', 'prb2'])
+    assert fields['prb'] == (1., 2., 3.)
+    assert all(math.isnan(v) for v in fields['prb2'])
+
+
+def test_conditions_evaluated_with_explicit_context(meas):
+    # no caller-frame lookup: the frequency is passed to the graph as context
+    meas.mg.allow_legacy_condition_context = False
+    meas.set_freq(1.5e9)
+    assert 'amp2' in meas.mg.activenodes
+    assert 'amp1' not in meas.mg.activenodes
+
+
+def test_configure_applies_per_sweep_settings(meas):
+    meas.shadow['sg'] = {'rf': True}
+    meas.configure(read_tolerance=0.1, max_reads=5, shadow_state=False, concurrent=True,
+                   settling_times={'sg/freq/0': [0.05, 3]})
+    try:
+        assert (meas.read_tolerance, meas.max_reads, meas.shadow_state) == (0.1, 5, False)
+        assert meas.shadow == {}
+        assert meas.settling.times == {'sg/freq/0': [0.05, 3]}
+        assert meas.dispatcher is not None
+        meas.set_freq(500e6)
+        assert sorted(sent(meas, 'SetFreq')) == ['amp1', 'sg', 'sw']
+    finally:
+        dispatcher = meas.dispatcher
+        meas.configure(concurrent=False)
+    assert meas.dispatcher is None and dispatcher.pool._shutdown
+    meas.configure(dwell_time=2)
+    assert (meas.read_tolerance, meas.max_reads, meas.settling.times) == (0.1, 5, {'sg/freq/0': [0.05, 3]})
+
+
+def test_field_result_from_probe_quantities(meas):
+    import math
+    from scuq import quantities, si
+    from temfield.TestSusceptibility import FieldResult
+
+    res = [quantities.Quantity(si.VOLT / si.METER, v) for v in (3., 4., 0.)]
+    result = FieldResult.from_quantities(100e6, res, target=5.)
+    assert (result.f, result.components, result.target) == (100e6, (3., 4., 0.), 5.)
+    assert result.magnitude == 5. and math.isnan(result.uex)
+    assert result.short() == "Ex = 3.00 V/m, Ey = 4.00 V/m, Ez = 0.00 V/m"
+    assert not hasattr(result, '__dict__')
+    for setting, value in (('x', 3.), ('mag', 5.), ('largest', 4.), ('auto', 4.)):
+        meas.adjust_to_setting = setting
+        assert meas.field_value(result) == value
+    assert meas.main_e_component == 1
+
+
+def probe_reads(meas, values):
+    reads = iter(values)
+    meas.mg.Read = lambda nodes: {nodes[0]: tuple(Value(v) for v in next(reads))}
+
+
+@pytest.mark.parametrize('values, n_reads, ez', [
+    ([10., 10.05, 11., 12.], 2, 10.025),      # stable after the second read
+    ([10., 12., 8., 14., 6.], 5, 10.),       # not stable: max_reads
+])
+def test_read_field_until_mean_is_stable(meas, values, n_reads, ez):
+    meas.adjust_to_setting = 'z'
+    meas.read_tolerance = 0.01
+    probe_reads(meas, [(0., 0., v) for v in values])
+    result = meas.read_field(max_reads=5)
+    assert result.n_reads == n_reads
+    assert result.ez == pytest.approx(ez)
+
+
+def test_read_field_single_read(meas):
+    probe_reads(meas, [(1., 2., 3.)])
+    result = meas.read_field(max_reads=1)
+    assert (result.n_reads, result.components) == (1, (1., 2., 3.))
@@ -0,0 +1,146 @@
+import gzip
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from temfield import Trace
+
+
+class Graph:
+    def __init__(self, **devices):
+        self.nodes = {name: {'inst': inst} for name, inst in devices.items()}
+
+
+class Generator:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def SetFreq(self, f):
+        return 0, f
+
+    def RFOn(self):
+        return 0
+
+
+def record(path, freqs):
+    sg = Generator()
+    recorder = Trace.TraceRecorder(path)
+    recorder.attach(Graph(sg=sg))
+    for f in freqs:
+        sg.SetFreq(f)
+    sg.RFOn()
+    recorder.close()
+
+
+def test_replay_answers_recorded_calls(tmp_path):
+    path = tmp_path / 'run.trace.gz'
+    record(path, [1e6, 2e6])
+    backend = Trace.ReplayBackend(path)
+    sg = backend.devices()['sg']
+    assert sg.SetFreq(1e6) == (0, 1e6)
+    assert sg.SetFreq(2e6) == (0, 2e6)
+    assert sg.RFOn() == 0
+    assert 'sg.SetFreq: 2 calls' in Trace.summary(path)
+
+
+def test_replay_compares_arguments(tmp_path):
+    path = tmp_path / 'run.trace.gz'
+    record(path, [1e6, 2e6])
+    sg = Trace.ReplayBackend(path).devices()['sg']
+    sg.SetFreq(1e6)
+    with pytest.raises(Trace.ReplayMismatch, match=r"SetFreq\(3000000.0\) called, trace has sg.SetFreq\(2000000.0\)"):
+        sg.SetFreq(3e6)
+    with pytest.raises(Trace.ReplayMismatch, match="RFOn"):
+        sg.RFOn()
+
+
+def test_unpicklable_arguments_are_compared_as_repr(tmp_path):
+    path = tmp_path / 'run.trace.gz'
+    sg = Generator()
+    recorder = Trace.TraceRecorder(path)
+    recorder.attach(Graph(sg=sg))
+    sg.SetFreq(sg.lock)
+    recorder.close()
+    replay = Trace.ReplayBackend(path).devices()['sg']
+    replay.SetFreq(sg.lock)
+    with pytest.raises(Trace.ReplayMismatch):
+        Trace.ReplayBackend(path).devices()['sg'].SetFreq(threading.Lock())
+
+
+def test_trace_of_killed_process_is_readable(tmp_path):
+    path = tmp_path / 'run.trace.gz'
+    script = f"""
+import os, sys
+sys.path[:0] = {sys.path!r}
+from test_Trace import Generator, Graph
+from temfield import Trace
+sg = Generator()
+Trace.TraceRecorder({str(path)!r}).attach(Graph(sg=sg))
+for i in range(100):
+    sg.SetFreq(float(i))
+os._exit(1)
+"""
+    subprocess.run([sys.executable, '-c', script], check=False, cwd=str(tmp_path))
+    header, records = Trace.read_trace(path)
+    assert header['devices'] == {'sg': 'test_Trace.Generator'}
+    assert [r[5] for r in records] == [(float(i),) for i in range(100)]
+
+
+def test_empty_trace(tmp_path):
+    path = tmp_path / 'empty.trace.gz'
+    gzip.open(path, 'wb').close()
+    assert Trace.read_trace(path) == (None, [])
+    assert 'empty trace' in Trace.summary(path)
+    with pytest.raises(ValueError):
+        Trace.ReplayBackend(path)
+
+
+def test_values_round_trip_as_data(tmp_path):
+    import numpy as np
+
+    path = tmp_path / 'run.trace.gz'
+    values = [(0, 1e6), {'a': [1, 2.5], 3: None}, 1 + 2j, b'\x00*', np.float64(2.5), np.arange(3.)]
+    recorder = Trace.TraceRecorder(path)
+    recorder.attach(Graph())
+    for value in values:
+        recorder._write(0, 'sg', 'Query', (value,), {'timeout': 1}, value, ValueError('bad', 1), 0.0, 0.0)
+    recorder.close()
+    header, records = Trace.read_trace(path)
+    assert header['version'] == Trace.VERSION
+    for value, record in zip(values, records):
+        assert record[6] == {'timeout': 1}
+        assert type(record[7]) is type(value) or type(value).__module__ == 'numpy'
+        assert np.all(record[7] == value) and np.all(record[5][0] == value)
+        assert type(record[8]) is ValueError and record[8].args == ('bad', 1)
+
+
+def test_trace_is_not_unpickled(tmp_path):
+    import pickle
+
+    path = tmp_path / 'evil.trace.gz'
+    marker = tmp_path / 'executed'
+    with gzip.open(path, 'wb') as f:
+        f.write(pickle.dumps(Exploit(str(marker))))
+    with pytest.raises(ValueError, match='not a trace'):
+        Trace.read_trace(path)
+    assert not marker.exists()
+
+
+class Exploit:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, 'w')
+
+
+def test_replayed_driver_error(tmp_path):
+    path = tmp_path / 'run.trace.gz'
+    recorder = Trace.TraceRecorder(path)
+    recorder.attach(Graph(sg=Generator()))
+    recorder._write(0, 'sg', 'RFOn', (), {}, None, Trace.ReplayMismatch('device error'), 0.0, 0.0)
+    recorder.close()
+    with pytest.raises(Trace.ReplayError, match='ReplayMismatch'):
+        Trace.ReplayBackend(path).devices()['sg'].RFOn()
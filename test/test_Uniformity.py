@@ -0,0 +1,43 @@
+import numpy as np
+
+from temfield.Uniformity import evaluate_uniformity
+
+
+def points(primary, secondary):
+    """
+    Field of one frequency: z is the primary component, x the secondary one.
+    """
+    return np.array([[[x, 0., z] for z, x in zip(primary, secondary)]])
+
+
+def test_uniform_field():
+    res = evaluate_uniformity(points([10, 11, 12, 13], [1, 1, 1, 1]))
+    assert res['primary'][0] == 2
+    assert res['uniform'][0]
+    assert np.isclose(res['spread_db'][0], 20 * np.log10(13 / 11))
+    assert res['reference'][0] == 11
+
+
+def test_field_spread_too_large():
+    res = evaluate_uniformity(points([1, 10, 20, 40], [0, 0, 0, 0]))
+    assert not res['field_ok'][0]
+
+
+def test_secondary_is_checked_inside_the_window():
+    # the best window is 10..12 V/m; one of its points has a strong secondary component, while
+    # the point outside the window (1 V/m) has none
+    res = evaluate_uniformity(points([10, 11, 12, 1], [0.1, 8, 0.1, 0]))
+    assert res['field_ok'][0]
+    assert not res['secondary_ok'][0]
+    res = evaluate_uniformity(points([10, 11, 12, 1], [0.1, 0.1, 0.1, 0.9]))
+    assert res['secondary_ok'][0]
+
+
+def test_missing_points_are_outside_the_window():
+    nan = float('nan')
+    res = evaluate_uniformity(points([10, 11, 12, nan], [0, 0, 0, nan]))
+    assert res['primary'][0] == 2 and res['uniform'][0]
+    assert np.isclose(res['spread_db'][0], 20 * np.log10(12 / 10))
+    # more than a quarter of the points missing
+    assert not evaluate_uniformity(points([10, 11, nan, nan], [0, 0, nan, nan]))['uniform'][0]
+    assert not evaluate_uniformity(points([nan] * 4, [nan] * 4))['uniform'][0]
@@ -0,0 +1,41 @@
+import time
+
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+
+def process_events(qapp, seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        qapp.processEvents()
+        time.sleep(0.005)
+
+
+def test_stall_reported_with_blocking_stack(qapp):
+    from temfield.Watchdog import EventLoopWatchdog
+
+    watchdog = EventLoopWatchdog(threshold=0.1, interval=0.02, sample_interval=0.01)
+    stalls = []
+    watchdog.stalled.connect(lambda duration, report: stalls.append((duration, report)))
+    watchdog.start()
+    try:
+        process_events(qapp, 0.1)
+        assert stalls == []
+        blocking_call(0.4)
+        process_events(qapp, 0.1)
+    finally:
+        watchdog.stop()
+    assert watchdog.n_stalls == len(stalls) >= 1
+    duration, report = max(stalls)
+    assert duration > 0.3
+    assert 'stack samples in:' in report and 'blocking_call' in report
+
+
+def test_report_of_most_frequent_stack():
+    import collections
+    from temfield.Watchdog import EventLoopWatchdog
+
+    samples = collections.Counter({(('a.py', 1, 'f'),): 3, (('b.py', 2, 'g'), ('c.py', 3, 'h')): 5})
+    assert EventLoopWatchdog._report(samples, 8) == "5 of 8 stack samples in:\n  b.py:2 g\n  c.py:3 h"
+    assert EventLoopWatchdog._report(collections.Counter(), 0) == "no stack sampled"
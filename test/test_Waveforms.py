@@ -0,0 +1,45 @@
+import threading
+import time
+
+import numpy as np
+
+from temfield.Waveforms import WaveformRecorder, WaveformStore
+
+
+def test_store_roundtrip(tmp_path):
+    path = str(tmp_path / 'waveforms.dat')
+    store = WaveformStore(path, 2, captures=2, samples=4)
+    t = np.arange(3.)
+    assert store.write(0, 100e6, 10., t, t, 2 * t, 3 * t)
+    assert store.write(0, 100e6, 10., t, t, t, t)
+    assert not store.write(0, 100e6, 10., t, t, t, t)
+    store.flush()
+    stored = WaveformStore.open(path)
+    assert len(stored) == 1
+    assert list(stored.frequencies) == [100e6]
+    ts, e = stored.waveforms(0)
+    assert e.shape == (2, 3, 4)
+    assert list(e[0, 2, :3]) == [0., 3., 6.]
+
+
+def test_capture_thread(tmp_path):
+    store = WaveformStore(str(tmp_path / 'waveforms.dat'), 2, captures=4, samples=8)
+    recorder = WaveformRecorder(store)
+    threads = []
+
+    def read():
+        threads.append(threading.current_thread())
+        return 0, np.arange(8.), np.ones(8), np.ones(8), np.ones(8)
+
+    recorder.begin(100e6, 10.)
+    recorder.start_capture(read, 0.01)
+    assert recorder.capturing
+    time.sleep(0.2)
+    recorder.stop_capture()
+    n = len(threads)
+    assert n > 0 and threading.main_thread() not in threads
+    time.sleep(0.05)
+    assert len(threads) == n
+    assert recorder.latest is not None
+    recorder.close()
+    assert store.mm['n'][0] == 4 and store.mm['n'][1] == 0